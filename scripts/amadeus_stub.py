@@ -0,0 +1,276 @@
+# Local stand-in for the Amadeus test API, used by the benchmark scripts.
+# Serves the token, locations, hotels-by-city, hotel-offers and flight-offers endpoints
+# with deterministic synthetic data, optional latency, request/byte/connection counters,
+# and fault injection (random 429/5xx, a server-side rate limit, or a full outage).
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CITY_CODES = {
+    "NEW YORK": "NYC", "NEW DELHI": "DEL", "DELHI": "DEL", "MUMBAI": "BOM", "BENGALURU": "BLR",
+    "LONDON": "LON", "PARIS": "PAR", "ROME": "ROM", "KYOTO": "UKY", "SYDNEY": "SYD",
+}
+CARRIERS = {"AI": "AIR INDIA", "6E": "INDIGO", "UK": "VISTARA", "BA": "BRITISH AIRWAYS", "AA": "AMERICAN AIRLINES"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients can reuse connections
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def setup(self):
+        super().setup()
+        stub = self.server.stub
+        with stub.lock:
+            stub.stats["connections"] += 1
+        if stub.connect_latency:
+            time.sleep(stub.connect_latency)  # stands in for the TCP+TLS handshake
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        stub = self.server.stub
+        with stub.lock:
+            stub.stats["bytes_sent"] += len(body)
+
+    def _dispatch(self, method):
+        stub = self.server.stub
+        parsed = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            params.update({k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode()).items()})
+        with stub.lock:
+            stub.stats["requests"] += 1
+            stub.paths[parsed.path] += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        fault = stub.fault()
+        if fault:
+            self._send(*fault)
+            return
+        route = stub.routes.get((method, parsed.path))
+        if route is None:
+            self._send(404, {"errors": [{"detail": f"no stub for {method} {parsed.path}"}]})
+            return
+        status, payload, *headers = route(params)
+        self._send(status, payload, headers[0] if headers else None)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+class AmadeusStub:
+    """
+    Run with `with AmadeusStub() as stub:` and point AMADEUS_BASE_URL at `stub.url`.
+    `latency` is added to every request, `connect_latency` to every new connection.
+    Faults: `rate_429` / `rate_5xx` fail that fraction of requests at random, `server_rps`
+    answers 429 (with Retry-After when `retry_after` is set) above that request rate, and
+    `down = True` answers 503 to everything. Every hotel/flight price is multiplied by
+    `price_factor`, which can be changed between requests to simulate price moves.
+    """
+
+    def __init__(self, latency=0.0, connect_latency=0.0, hotels_per_city=300, token_ttl=1799, seed=7,
+                 rate_429=0.0, rate_5xx=0.0, server_rps=None, retry_after=None, down=False, price_factor=1.0):
+        self.latency = latency
+        self.price_factor = price_factor
+        self.connect_latency = connect_latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.server_rps = server_rps
+        self.retry_after = retry_after
+        self.down = down
+        self._fault_rnd = random.Random(seed)
+        self._window = []
+        self.hotels_per_city = hotels_per_city
+        self.token_ttl = token_ttl
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.paths = Counter()
+        self.routes = {
+            ("POST", "/v1/security/oauth2/token"): self.token,
+            ("GET", "/v1/reference-data/locations"): self.locations,
+            ("GET", "/v1/reference-data/locations/hotels/by-city"): self.hotels_by_city,
+            ("GET", "/v3/shopping/hotel-offers"): self.hotel_offers,
+            ("GET", "/v2/shopping/flight-offers"): self.flight_offers,
+        }
+        self._hotel_lists = {}
+        self._server = None
+        self._thread = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+            self.paths.clear()
+
+    # ---------- faults ----------
+    def fault(self):
+        with self.lock:
+            if self.down:
+                self.stats["faults_503"] += 1
+                return 503, {"errors": [{"status": 503, "detail": "stub is down"}]}
+            if self.server_rps:
+                now = time.monotonic()
+                self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) >= self.server_rps:
+                    self.stats["faults_429"] += 1
+                    headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+                    return 429, {"errors": [{"status": 429, "code": 38194, "title": "Too many requests"}]}, headers
+                self._window.append(now)
+            roll = self._fault_rnd.random()
+            if roll < self.rate_429:
+                self.stats["faults_429"] += 1
+                return 429, {"errors": [{"status": 429, "code": 38194, "title": "Too many requests"}]}
+            if roll < self.rate_429 + self.rate_5xx:
+                self.stats["faults_5xx"] += 1
+                return 500, {"errors": [{"status": 500, "code": 141, "title": "SYSTEM ERROR HAS OCCURRED"}]}
+        return None
+
+    # ---------- endpoints ----------
+    def token(self, params):
+        with self.lock:
+            self.stats["tokens_issued"] += 1
+            n = self.stats["tokens_issued"]
+        return 200, {"access_token": f"stub-token-{n}", "token_type": "Bearer", "expires_in": self.token_ttl}
+
+    def locations(self, params):
+        kw = (params.get("keyword") or "").strip().upper()
+        code = CITY_CODES.get(kw) or (kw[:3] if len(kw) >= 3 else None)
+        data = [{"type": "location", "subType": "CITY", "name": kw, "iataCode": code}] if code else []
+        return 200, {"data": data}
+
+    def _hotels(self, city_code):
+        with self.lock:
+            if city_code not in self._hotel_lists:
+                rnd = random.Random(f"{self.seed}:{city_code}")
+                self._hotel_lists[city_code] = [
+                    {"hotelId": f"{city_code[:2]}{city_code}{i:04d}", "name": f"{city_code} HOTEL {i}",
+                     "iataCode": city_code, "rating": rnd.randint(1, 5)}
+                    for i in range(self.hotels_per_city)
+                ]
+            return self._hotel_lists[city_code]
+
+    def hotels_by_city(self, params):
+        hotels = self._hotels(params.get("cityCode", "XXX"))
+        if params.get("ratings"):
+            wanted = {int(r) for r in params["ratings"].split(",") if r.strip().isdigit()}
+            hotels = [h for h in hotels if h["rating"] in wanted]
+        return 200, {"data": hotels}
+
+    def hotel_offers(self, params):
+        data = []
+        for hid in (params.get("hotelIds") or "").split(","):
+            if not hid:
+                continue
+            rnd = random.Random(f"{self.seed}:{hid}")
+            city = hid[2:5]
+            idx = int(hid[-4:])
+            hotels = self._hotels(city)
+            rating = hotels[idx]["rating"] if idx < len(hotels) else None
+            if rnd.random() < 0.2:
+                continue  # no availability
+            price = round(rnd.uniform(80, 900) * self.price_factor, 2)
+            data.append({
+                "type": "hotel-offers",
+                "hotel": {"hotelId": hid, "name": f"{city} HOTEL {hid[-4:]}", "rating": str(rating),
+                          "cityCode": city, "address": {"lines": [f"{int(hid[-4:])} MAIN ST"], "cityName": city}},
+                "available": True,
+                "offers": [{
+                    "id": f"OFF{hid}",
+                    "checkInDate": params.get("checkInDate"),
+                    "checkOutDate": params.get("checkOutDate"),
+                    "room": {"typeEstimated": {"category": "STANDARD_ROOM", "beds": 1, "bedType": "KING"},
+                             "description": {"text": "Standard room, free wifi, breakfast not included." * 3}},
+                    "price": {"currency": params.get("currency", "USD"), "total": f"{price:.2f}"},
+                    "urls": {"booking": f"https://example.invalid/book/{hid}"},
+                }],
+            })
+        return 200, {"data": data}
+
+    def flight_offers(self, params):
+        orig, dest = params.get("originLocationCode"), params.get("destinationLocationCode")
+        date_from, date_to = params.get("departureDate"), params.get("returnDate")
+        rnd = random.Random(f"{self.seed}:{orig}:{dest}:{date_from}:{date_to}:{params.get('travelClass')}")
+        nonstop = params.get("nonStop") == "true"
+        max_price = float(params["maxPrice"]) if params.get("maxPrice") else None
+        allowed = set(params["includedAirlineCodes"].split(",")) if params.get("includedAirlineCodes") else None
+        codes = sorted(allowed or CARRIERS)
+
+        def itinerary(a, b, day):
+            stops = 0 if nonstop else rnd.choice([0, 0, 1, 2])
+            hops = [a] + [rnd.choice(["DXB", "DOH", "HYD", "FRA"]) for _ in range(stops)] + [b]
+            segs = []
+            for i in range(len(hops) - 1):
+                code = rnd.choice(codes)
+                hour = 6 + 3 * i
+                segs.append({
+                    "departure": {"iataCode": hops[i], "at": f"{day}T{hour:02d}:00:00"},
+                    "arrival": {"iataCode": hops[i + 1], "at": f"{day}T{hour + 2:02d}:15:00"},
+                    "carrierCode": code, "number": str(rnd.randint(100, 999)), "duration": "PT2H15M",
+                })
+            return {"duration": f"PT{2 * len(segs)}H", "segments": segs}
+
+        data = []
+        for i in range(int(params.get("max", 250))):
+            its = [itinerary(orig, dest, date_from)]
+            if date_to:
+                its.append(itinerary(dest, orig, date_to))
+            price = round(rnd.uniform(60, 1200) * (1.8 if date_to else 1.0) * self.price_factor, 2)
+            if max_price is not None and price > max_price:
+                continue
+            data.append({"type": "flight-offer", "id": str(i + 1), "itineraries": its,
+                         "price": {"currency": params.get("currencyCode", "USD"), "total": f"{price:.2f}"}})
+        data.sort(key=lambda o: float(o["price"]["total"]))  # Amadeus returns the cheapest offers first
+        return 200, {"meta": {"count": len(data)}, "data": data,
+                     "dictionaries": {"carriers": {c: CARRIERS[c] for c in codes if c in CARRIERS}}}
+
+
+if __name__ == "__main__":
+    with AmadeusStub(latency=0.02) as stub:
+        print(f"Amadeus stub listening on {stub.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,105 @@
+# Per-call latency of the shared pooled Amadeus client vs. the old bare requests.get path,
+# against the local stub (scripts/amadeus_stub.py). Run from the project root:
+#   python -m scripts.bench_amadeus_client --calls 200 --latency 0.005 --connect-latency 0.03
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import requests
+
+from scripts.amadeus_stub import AmadeusStub
+from tools.amadeus_client import AmadeusClient, get_client, reset_client
+from tools.resilience import EndpointLimits, ResiliencePolicy
+
+PATH = "/v1/reference-data/locations"
+
+
+def _summary(samples):
+    s = sorted(samples)
+    return {
+        "mean_ms": round(1000 * statistics.fmean(s), 2),
+        "p50_ms": round(1000 * s[len(s) // 2], 2),
+        "p95_ms": round(1000 * s[int(len(s) * 0.95) - 1], 2),
+    }
+
+
+def bench_bare(stub, calls):
+    """Old behaviour: one token per module, then a fresh connection for every call."""
+    tok = requests.post(stub.url + "/v1/security/oauth2/token",
+                        data={"grant_type": "client_credentials"}, timeout=20).json()["access_token"]
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        requests.get(stub.url + PATH, headers={"Authorization": f"Bearer {tok}"},
+                     params={"subType": "CITY", "keyword": "Paris"}, timeout=20).raise_for_status()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench_pooled(stub, calls):
+    """Shared session and token, without the default client-side rate limit (this measures pooling)."""
+    client = AmadeusClient(base_url=stub.url, policy=ResiliencePolicy(limits=EndpointLimits({"default": 0})))
+    client.access_token()  # warm token + first connection
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        client.get(PATH, params={"subType": "CITY", "keyword": "Paris"}).raise_for_status()
+        samples.append(time.perf_counter() - t0)
+    client.close()
+    return samples
+
+
+def bench_token_herd(stub, threads):
+    """Cold cache, `threads` callers at once: how many token requests reach the server?"""
+    reset_client()
+    stub.reset_stats()
+    client = get_client()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        client.access_token()
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return stub.stats["tokens_issued"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.005, help="server time per request (s)")
+    ap.add_argument("--connect-latency", type=float, default=0.03, help="simulated handshake per connection (s)")
+    ap.add_argument("--threads", type=int, default=32)
+    args = ap.parse_args()
+
+    os.environ.setdefault("AMADEUS_CLIENT_ID", "bench")
+    os.environ.setdefault("AMADEUS_CLIENT_SECRET", "bench")
+    with AmadeusStub(latency=args.latency, connect_latency=args.connect_latency) as stub:
+        os.environ["AMADEUS_BASE_URL"] = stub.url
+        reset_client()
+
+        stub.reset_stats()
+        bare = _summary(bench_bare(stub, args.calls))
+        bare_conns = stub.stats["connections"]
+
+        stub.reset_stats()
+        pooled = _summary(bench_pooled(stub, args.calls))
+        pooled_conns = stub.stats["connections"]
+
+        herd = bench_token_herd(stub, args.threads)
+        reset_client()
+
+    print(f"bare requests.get : {bare}  connections={bare_conns}")
+    print(f"pooled client     : {pooled}  connections={pooled_conns}")
+    print(f"token requests for {args.threads} concurrent cold callers: {herd}")
+
+
+if __name__ == "__main__":
+    main()
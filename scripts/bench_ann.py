@@ -0,0 +1,91 @@
+# Recall / latency / memory of the guide index types (tools/guide_store.py index_spec) on a
+# synthetic corpus far larger than the bundled guides, to pick --index-type / --nlist / --pq /
+# --nprobe / --ef-search for scripts/build_guide_index.py by measurement. Vectors are topic
+# centres plus variation in a low-dimensional subspace (real text embeddings have low intrinsic
+# dimension, which is what PQ exploits), normalised like real embeddings. Recall@k is measured
+# against the exact Flat results, latency per single query (how retrieve_tips searches); PQ
+# training dominates build time on few cores. Run from the project root:
+#   python -m scripts.bench_ann --passages 50000 --dim 256 --k 5
+#   python -m scripts.bench_ann --configs flat,ivf,hnsw,ivf+pq32 --nprobe 1,8,32 --ef-search 16,64
+
+import argparse
+import statistics
+import time
+
+import faiss
+import numpy as np
+
+from tools.guide_store import build_index, index_spec, set_search_params
+
+
+def corpus(n: int, dim: int, queries: int, topics: int = 200, latent: int = 32, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    basis = rng.standard_normal((latent, dim)).astype(np.float32) / np.sqrt(latent)
+
+    def sample(m):
+        x = (centers[rng.integers(0, topics, m)] + rng.standard_normal((m, latent)).astype(np.float32) @ basis
+             + 0.05 * rng.standard_normal((m, dim)).astype(np.float32))
+        return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+    return sample(n), sample(queries)
+
+
+def measure(index, queries: np.ndarray, k: int, truth: np.ndarray):
+    times, hits = [], 0
+    for q, gold in zip(queries, truth):
+        t0 = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        times.append(time.perf_counter() - t0)
+        hits += len(set(ids[0].tolist()) & set(gold.tolist()))
+    return hits / (k * len(queries)), 1000 * statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--passages", type=int, default=50_000)
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--configs", default="flat,ivf,hnsw,ivf+pq32,hnsw+pq32",
+                    help="comma-separated index types, '+pqM' adds product quantization")
+    ap.add_argument("--nlist", type=int, default=0)
+    ap.add_argument("--hnsw-m", type=int, default=32)
+    ap.add_argument("--nprobe", default="1,4,16,64")
+    ap.add_argument("--ef-search", default="16,64,256")
+    ap.add_argument("--threads", type=int, default=1, help="FAISS threads (1 = per-request serving)")
+    args = ap.parse_args()
+    faiss.omp_set_num_threads(args.threads)
+
+    data, queries = corpus(args.passages, args.dim, args.queries)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(data)
+    _, truth = exact.search(queries, args.k)
+    raw_mb = data.nbytes / 2 ** 20
+    print(f"{args.passages} passages x {args.dim}d ({raw_mb:.0f} MB float32), {args.queries} queries, "
+          f"recall@{args.k} vs exact Flat")
+    print(f"{'index':<18} {'params':<14} {'build':>8} {'memory':>9} {'recall':>7} {'p50/query':>10}")
+
+    for config in args.configs.split(","):
+        kind, _, pq = config.partition("+pq")
+        spec = index_spec(kind, args.passages, nlist=args.nlist, hnsw_m=args.hnsw_m, pq_m=int(pq or 0))
+        t0 = time.perf_counter()
+        index, spec = build_index(data, spec)
+        build = time.perf_counter() - t0
+        memory = len(faiss.serialize_index(index)) / 2 ** 20
+        if spec.startswith("IVF"):
+            sweep = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+        elif spec.startswith("HNSW"):
+            sweep = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+        else:
+            sweep = [(None, None)]
+        for name, value in sweep:
+            if name:
+                set_search_params(index, {name: value})
+            recall, p50 = measure(index, queries, args.k, truth)
+            print(f"{spec:<18} {(f'{name}={value}' if name else '-'):<14} {build:7.1f}s {memory:7.1f}MB "
+                  f"{recall:7.3f} {p50:8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
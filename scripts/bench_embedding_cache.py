@@ -0,0 +1,85 @@
+# Query-embedding cache (tools/embedding_cache.py) on an agent-like query stream: repeated and
+# near-identical queries, a fake embedding model with remote-call latency, and a second process
+# reading what the first one persisted. Run from the project root:
+#   python -m scripts.bench_embedding_cache --queries 500 --embed-latency 0.15
+
+import argparse
+import hashlib
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools.embedding_cache import CachedQueryEmbeddings, EmbeddingCache
+
+CITIES = ["Paris", "Kyoto", "London", "Rome", "Sydney", "Marrakech", "New York"]
+TOPICS = ["hidden gems", "best food", "museums", "day trip", "parks", "markets", "where to stay"]
+
+
+class SlowFakeEmbeddings(Embeddings):
+    """Deterministic vectors with a fixed per-call delay standing in for the remote round trip."""
+
+    def __init__(self, latency: float, dim: int = 1536):
+        self.latency, self.dim, self.calls = latency, dim, 0
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        time.sleep(self.latency)
+        seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32).tolist()
+
+
+def query_stream(n: int, seed: int = 3):
+    """Zipf-ish popularity over city x topic, with casing/spacing variants of the same query."""
+    rnd = random.Random(seed)
+    pool = [f"{t} {c}" for c in CITIES for t in TOPICS]
+    weights = [1 / (i + 1) for i in range(len(pool))]
+    for _ in range(n):
+        q = rnd.choices(pool, weights)[0]
+        yield rnd.choice([q, q.title(), f"  {q.upper()} ", q.replace(" ", "  ")])
+
+
+def run(n, latency, cache_dir, maxsize):
+    inner = SlowFakeEmbeddings(latency)
+    cache = EmbeddingCache("fake-1536", maxsize=maxsize, path=cache_dir)
+    emb = CachedQueryEmbeddings(inner, cache)
+    t0 = time.perf_counter()
+    for q in query_stream(n):
+        emb.embed_query(q)
+    return time.perf_counter() - t0, inner.calls, cache.snapshot()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--embed-latency", type=float, default=0.15)
+    ap.add_argument("--maxsize", type=int, default=1024)
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:  # second process: same stream, fresh memory, shared disk store
+        secs, calls, stats = run(args.queries, args.embed_latency, args.child, args.maxsize)
+        print(f"second process     {1000 * secs / args.queries:8.2f} ms/query  remote calls={calls:<4} {stats}")
+        return
+
+    no_cache = args.queries * args.embed_latency
+    print(f"no cache           {1000 * args.embed_latency:8.2f} ms/query  remote calls={args.queries}")
+    secs, calls, stats = run(args.queries, args.embed_latency, None, args.maxsize)
+    print(f"memory LRU         {1000 * secs / args.queries:8.2f} ms/query  remote calls={calls:<4} {stats}")
+    with tempfile.TemporaryDirectory() as d:
+        secs, calls, stats = run(args.queries, args.embed_latency, d, args.maxsize)
+        print(f"LRU + disk         {1000 * secs / args.queries:8.2f} ms/query  remote calls={calls:<4} {stats}")
+        subprocess.run([sys.executable, "-m", "scripts.bench_embedding_cache", "--queries", str(args.queries),
+                        "--embed-latency", str(args.embed_latency), "--child", d], check=True)
+    print(f"(uncached total would be {no_cache:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
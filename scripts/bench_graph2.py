@@ -0,0 +1,336 @@
+# End-to-end latency of a turn through graph2's graph, with a scripted fake chat model,
+# stub tools (canned stub-API results behind the real tool schemas) and an in-memory
+# preference store, so it runs offline and deterministically. Reports p50/p95/p99 per node
+# (including react_agent's inner agent/tools steps and each tool) and per turn, throughput
+# under N concurrent threads and N concurrent graph.ainvoke calls on one event loop, and
+# allocations per turn. Run from the project root:
+#   python -m scripts.bench_graph2 --turns 200 --threads 1,4,8 --tool-latency 0.005
+#   python -m scripts.bench_graph2 --compare bench_results/graph2-<old>.json
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+# graph2 reads these at import; nothing here talks to OpenAI, Redis or LangSmith
+for var, value in (("LANGCHAIN_API_KEY", "bench"), ("OPENAI_API_KEY", "sk-bench"), ("REDIS_URL", "redis://localhost:6379/0")):
+    os.environ.setdefault(var, value)
+with contextlib.redirect_stdout(io.StringIO()):
+    import graph2
+os.environ["LANGSMITH_TRACING"] = "false"
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+from scripts.amadeus_stub import AmadeusStub
+from tools.flight_api import _parse_flight_offers
+from tools.hotel_api import _TopByPrice
+
+RESULTS_DIR = Path("bench_results")
+PROMPTS = [
+    "I prefer 4-star hotels and a $2000 budget. Find hotels in NYC for 2030-05-10 to 2030-05-12, "
+    "find flights from DEL to BOM on 2030-05-09 and show me hidden gems from the guide.",
+    "Find 5-star hotels in Paris under 1500 and search flights from London to Paris on 2030-06-01.",
+    "Show me flights from Tokyo to Sydney on 2030-07-15 and recommend local guide tips for Sydney.",
+]
+
+
+# ---------- fakes ----------
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the chat model. Stateless, so one instance serves every thread:
+    a turn's first call asks for tools based on the last user message, the call after the
+    tool results answers from them.
+    """
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if isinstance(messages[-1], ToolMessage):
+            n = sum(1 for m in messages if isinstance(m, ToolMessage))
+            msg = AIMessage(content=f"Here is your plan, based on {n} tool results: Hotels, Flights, Hidden Gems.")
+        else:
+            text = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "").lower()
+            calls = []
+            if "hotel" in text:
+                calls.append(("search_hotels", {"city": "NYC", "checkin": "2030-05-10", "checkout": "2030-05-12",
+                                                "hotel_class": "4-star", "max_price": 2000}))
+            if "flight" in text:
+                calls.append(("search_flights", {"origin": "DEL", "destination": "BOM", "date_from": "2030-05-09",
+                                                 "nonstop_only": True, "max_price": 900}))
+            if "guide" in text or "gems" in text:
+                calls.append(("retrieve_tips", {"query": "hidden gems", "k": 3}))
+            msg = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{i}"}
+                                                    for i, (name, args) in enumerate(calls)])
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+
+class MemoryPrefsStore:
+    """The slice of RedisStore the preference nodes use, in a dict."""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, str]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def get(self, thread_id, key, default=None):
+        return self._data[thread_id].get(key, default)
+
+    def put(self, thread_id, key, value):
+        with self._lock:
+            self._data[thread_id][key] = str(value)
+
+    def list_keys(self, thread_id):
+        return list(self._data[thread_id])
+
+    def get_all(self, thread_id):
+        return dict(self._data[thread_id])
+
+    def batch(self, thread_id, mapping):
+        with self._lock:
+            self._data[thread_id].update({k: str(v) for k, v in mapping.items()})
+
+    async def aget_all(self, thread_id):
+        return self.get_all(thread_id)
+
+    async def abatch(self, thread_id, mapping):
+        self.batch(thread_id, mapping)
+
+
+def canned_results() -> Dict[str, Any]:
+    stub = AmadeusStub(hotels_per_city=200)
+    _, flights = stub.flight_offers({"originLocationCode": "DEL", "destinationLocationCode": "BOM",
+                                     "departureDate": "2030-05-09", "max": "50"})
+    ids = ",".join(h["hotelId"] for h in stub._hotels("NYC")[:60])
+    _, hotels = stub.hotel_offers({"hotelIds": ids, "checkInDate": "2030-05-10", "checkOutDate": "2030-05-12"})
+    top = _TopByPrice(20, max_price=2000)
+    top.merge(hotels)
+    return {
+        "search_flights": [o.to_dict() for o in _parse_flight_offers(flights, None, 10)],
+        "search_hotels": top.finish(1),
+        "retrieve_tips": [f"Tip {i}: a quiet courtyard cafe worth the detour." for i in range(3)],
+        "search_flight_calendar": {},
+        "search_flights_batch": {"legs": []},
+        "retrieve_tips_batch": {"hidden gems": [f"Tip {i}: a quiet courtyard cafe worth the detour." for i in range(3)]},
+    }
+
+
+def stub_tools(latency: float) -> List[StructuredTool]:
+    """graph2's tools with their real names and argument schemas, returning canned results."""
+    results = canned_results()
+    out = []
+    for real in graph2.tools:
+        real = real if isinstance(real, StructuredTool) else StructuredTool.from_function(real)
+        canned = results[real.name]
+
+        def run(_canned=canned, **kwargs):
+            if latency:
+                time.sleep(latency)
+            return _canned
+
+        out.append(StructuredTool.from_function(func=run, name=real.name, description=real.description,
+                                                args_schema=real.args_schema))
+    return out
+
+
+# ---------- timing ----------
+class NodeTimer(BaseCallbackHandler):
+    """Wall time of every graph node (nested ones as parent/child) and every tool call."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._open: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            ns = metadata.get("langgraph_checkpoint_ns", node)
+            label = "/".join(part.split(":")[0] for part in ns.split("|"))
+            with self._lock:
+                self._open[run_id] = (label, time.perf_counter())
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        with self._lock:
+            self._open[run_id] = (f"tool:{kwargs.get('name') or serialized.get('name')}", time.perf_counter())
+
+    def _end(self, run_id):
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+            if opened:
+                self.samples[opened[0]].append(time.perf_counter() - opened[1])
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+
+def percentiles(xs: List[float]) -> Dict[str, float]:
+    xs = sorted(xs)
+    pick = lambda q: xs[min(len(xs) - 1, int(q * len(xs)))]
+    return {"n": len(xs), "mean_ms": round(1000 * statistics.fmean(xs), 3), "p50_ms": round(1000 * pick(0.50), 3),
+            "p95_ms": round(1000 * pick(0.95), 3), "p99_ms": round(1000 * pick(0.99), 3)}
+
+
+def turn(graph, i: int, config) -> None:
+    out = graph.invoke({"messages": [HumanMessage(content=PROMPTS[i % len(PROMPTS)])], "thread_id": f"bench-{i % 50}"},
+                       config=config)
+    assert isinstance(out["messages"][-1], AIMessage) and out["messages"][-1].content
+
+
+def run_latency(graph, turns: int) -> Dict[str, Any]:
+    timer = NodeTimer()
+    config = {"callbacks": [timer]}
+    totals = []
+    for i in range(turns):
+        t0 = time.perf_counter()
+        turn(graph, i, config)
+        totals.append(time.perf_counter() - t0)
+    return {"turn": percentiles(totals), "nodes": {k: percentiles(v) for k, v in sorted(timer.samples.items())}}
+
+
+def run_throughput(graph, threads: int, turns: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda i: turn(graph, i, {}), range(turns)))
+    elapsed = time.perf_counter() - t0
+    return {"threads": threads, "turns": turns, "seconds": round(elapsed, 3), "turns_per_s": round(turns / elapsed, 2)}
+
+
+def run_async_throughput(graph, concurrency: int, turns: int) -> Dict[str, Any]:
+    async def run():
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with sem:
+                out = await graph.ainvoke({"messages": [HumanMessage(content=PROMPTS[i % len(PROMPTS)])],
+                                           "thread_id": f"bench-{i % 50}"})
+                assert isinstance(out["messages"][-1], AIMessage) and out["messages"][-1].content
+
+        await asyncio.gather(*(one(i) for i in range(turns)))
+
+    t0 = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - t0
+    return {"concurrency": concurrency, "turns": turns, "seconds": round(elapsed, 3),
+            "turns_per_s": round(turns / elapsed, 2)}
+
+
+def run_allocations(graph, turns: int) -> Dict[str, Any]:
+    gc.collect()
+    gen0_before = gc.get_stats()[0]["collections"]
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    for i in range(turns):
+        turn(graph, i, {})
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gen0 = gc.get_stats()[0]["collections"] - gen0_before
+    gc.collect()
+    return {
+        "turns": turns,
+        "peak_kib": round(peak / 1024, 1),
+        "traced_kib_retained": round(current / 1024, 1),
+        "gen0_collections_per_turn": round(gen0 / turns, 2),
+        "blocks_retained_per_turn": round((sys.getallocatedblocks() - blocks_before) / turns, 1),
+    }
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    print(f"\ncompared with {old['meta']['commit']} ({old['meta']['timestamp']}):")
+    rows = [("turn", old["latency"]["turn"], new["latency"]["turn"])]
+    rows += [(k, old["latency"]["nodes"][k], v) for k, v in new["latency"]["nodes"].items() if k in old["latency"]["nodes"]]
+    for name, a, b in rows:
+        d = 100 * (b["p50_ms"] - a["p50_ms"]) / a["p50_ms"] if a["p50_ms"] else 0.0
+        print(f"  {name:<28} p50 {a['p50_ms']:8.3f} -> {b['p50_ms']:8.3f} ms ({d:+6.1f}%)   "
+              f"p99 {a['p99_ms']:8.3f} -> {b['p99_ms']:8.3f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=200)
+    ap.add_argument("--threads", default="1,4,8", help="comma-separated thread counts for the throughput runs")
+    ap.add_argument("--concurrency", default="8", help="comma-separated graph.ainvoke concurrency for the async runs")
+    ap.add_argument("--tool-latency", type=float, default=0.0, help="simulated seconds per stub tool call")
+    ap.add_argument("--alloc-turns", type=int, default=20)
+    ap.add_argument("--out", help="JSON results path (default bench_results/graph2-<commit>.json)")
+    ap.add_argument("--compare", help="earlier results JSON to diff against")
+    args = ap.parse_args()
+
+    graph2.store = MemoryPrefsStore()
+    graph = graph2.build_graph(ScriptedChatModel(), stub_tools(args.tool_latency))
+
+    with contextlib.redirect_stdout(io.StringIO()):  # the nodes and tools print debug lines
+        for i in range(5):
+            turn(graph, i, {})  # warm-up
+        latency = run_latency(graph, args.turns)
+        throughput = [run_throughput(graph, int(n), args.turns) for n in args.threads.split(",")]
+        async_throughput = [run_async_throughput(graph, int(n), args.turns) for n in args.concurrency.split(",")]
+        allocations = run_allocations(graph, args.alloc_turns)
+
+    results = {
+        "meta": {"commit": git_rev(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "turns": args.turns, "tool_latency": args.tool_latency},
+        "latency": latency,
+        "throughput": throughput,
+        "async_throughput": async_throughput,
+        "allocations": allocations,
+    }
+
+    print(f"turn: {latency['turn']}")
+    for name, p in latency["nodes"].items():
+        print(f"  {name:<28} p50 {p['p50_ms']:8.3f}  p95 {p['p95_ms']:8.3f}  p99 {p['p99_ms']:8.3f} ms  (n={p['n']})")
+    for t in throughput:
+        print(f"threads={t['threads']:<3} {t['turns_per_s']:8.2f} turns/s")
+    for t in async_throughput:
+        print(f"async concurrency={t['concurrency']:<3} {t['turns_per_s']:8.2f} turns/s")
+    print(f"allocations: {allocations}")
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"graph2-{results['meta']['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"saved {out}")
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Cold-import cost of tools/guide_api.py: the old eager module (FAISS + OpenAIEmbeddings loaded at
+# import) vs. the lazy one, each measured in fresh interpreters, plus what the first
+# retrieve_tips-equivalent call (warmup()) now pays. Run from the project root:
+#   python -m scripts.bench_guide_import --runs 5
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+EAGER = """
+import time; t0 = time.perf_counter()
+from langchain_community.vectorstores import FAISS
+from langchain_openai import OpenAIEmbeddings
+_store = FAISS.load_local("data/guide_index", OpenAIEmbeddings(), allow_dangerous_deserialization=True)
+print(time.perf_counter() - t0)
+"""
+
+LAZY = """
+import time; t0 = time.perf_counter()
+import tools.guide_api
+print(time.perf_counter() - t0)
+"""
+
+LAZY_WARMUP = """
+import time
+import tools.guide_api
+t0 = time.perf_counter()
+tools.guide_api.warmup()
+print(time.perf_counter() - t0)
+"""
+
+
+def measure(code: str, runs: int, env) -> float:
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return 1000 * statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-bench"), "PYTHONPATH": os.getcwd()}
+    print(f"eager import (old)   {measure(EAGER, args.runs, env):8.1f} ms")
+    env_nokey = {k: v for k, v in env.items() if k != "OPENAI_API_KEY"}
+    print(f"lazy import (no key) {measure(LAZY, args.runs, env_nokey):8.1f} ms")
+    print(f"lazy warmup()        {measure(LAZY_WARMUP, args.runs, env):8.1f} ms  (paid once, on first use)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Memory and load time of N worker processes holding the same guide index: LangChain's pickle
+# format (index.faiss + index.pkl, loaded into each process' heap) vs the mmap format of
+# tools/guide_store.py (pages shared through the page cache). A synthetic index stands in for a
+# large guide collection. Workers load, run queries, then all measure /proc/self/smaps_rollup
+# at the same time: PSS splits shared pages between the processes that map them, so the PSS
+# sum is what the group really costs. Run from the project root:
+#   python -m scripts.bench_guide_memory --passages 100000 --dim 384 --workers 4
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+WORDS = ("temple garden market museum street cafe river bridge tower palace gallery square harbour "
+         "beach park station church noodle bakery wine tapas gelato souk tram ferry alley rooftop").split()
+
+
+def smaps() -> dict:
+    """RSS / PSS / USS (private pages) of this process, in MB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def make_corpus(n: int, dim: int, seed: int = 7):
+    rnd = random.Random(seed)
+    texts = [" ".join(rnd.choices(WORDS, k=60)) for _ in range(n)]
+    metas = [{"city": rnd.choice(["Paris", "Kyoto", "Rome"]), "topic": "synthetic", "source": f"g{i % 50}.md"}
+             for i in range(n)]
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"p{i}" for i in range(n)], texts, metas, vectors
+
+
+def worker(fmt, path, dim, queries, barrier, results):
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import FakeEmbeddings
+    from tools.guide_store import GuideStore
+    t0 = time.perf_counter()  # imports are excluded: the "imports" row is the floor every worker pays anyway
+    if fmt == "pickle":
+        store = FAISS.load_local(path, FakeEmbeddings(size=dim), allow_dangerous_deserialization=True)
+    elif fmt == "mmap":
+        store = GuideStore(path)
+    else:
+        store = None
+    load = time.perf_counter() - t0
+    rng = np.random.default_rng(os.getpid())
+    t0 = time.perf_counter()
+    for _ in range(queries if store is not None else 0):
+        store.similarity_search_by_vector(rng.standard_normal(dim).astype(np.float32).tolist(), k=5)
+    search = (time.perf_counter() - t0) / max(queries, 1)
+    barrier.wait()  # everyone loaded: shared pages are now mapped by all workers
+    results.put({"load": load, "search": search, **smaps()})
+    barrier.wait()  # stay alive until every worker has measured
+
+
+def run(fmt, path, dim, workers, queries):
+    ctx = mp.get_context("spawn")  # no pages inherited from this process
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(fmt, path, dim, queries, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    out = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--passages", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--queries", type=int, default=50)
+    args = ap.parse_args()
+
+    import warnings
+    warnings.filterwarnings("ignore")
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import FakeEmbeddings
+    from tools.guide_store import GuideStore
+
+    with tempfile.TemporaryDirectory() as root:
+        ids, texts, metas, vectors = make_corpus(args.passages, args.dim)
+        legacy, mapped = os.path.join(root, "pickle"), os.path.join(root, "mmap")
+        FAISS.from_embeddings(list(zip(texts, vectors.tolist())), FakeEmbeddings(size=args.dim),
+                              metadatas=metas, ids=ids).save_local(legacy)
+        GuideStore.write(mapped, ids, texts, metas, vectors, "synthetic")
+        del ids, texts, metas, vectors
+        size = lambda d: sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d)) / 2 ** 20
+        print(f"{args.passages} passages x {args.dim}d, {args.workers} workers; "
+              f"on disk: pickle {size(legacy):.0f} MB, mmap {size(mapped):.0f} MB")
+        print(f"{'format':<8} {'load p50':>10} {'search':>9} {'RSS/worker':>11} {'USS/worker':>11} {'PSS total':>10}")
+        for fmt, path in (("imports", None), ("pickle", legacy), ("mmap", mapped)):
+            rows = run(fmt, path, args.dim, args.workers, args.queries)
+            print(f"{fmt:<8} {1000 * float(np.median([r['load'] for r in rows])):8.1f}ms "
+                  f"{1000 * float(np.median([r['search'] for r in rows])):7.2f}ms "
+                  f"{np.mean([r['rss'] for r in rows]):9.0f}MB {np.mean([r['uss'] for r in rows]):9.0f}MB "
+                  f"{sum(r['pss'] for r in rows):8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
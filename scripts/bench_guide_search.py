@@ -0,0 +1,95 @@
+# Recall@k and latency of retrieve_tips' dense, lexical (BM25) and hybrid (RRF) modes on the
+# bundled guides. Builds a throwaway index with scripts/build_guide_index.py first.
+# --embedder picks the backend (tools/embedders.py): the default local "hashing" one needs no
+# network; "openai" needs OPENAI_API_KEY and pays the remote round trip per query. Also reports
+# build time and query-embedding throughput. Run from the project root:
+#   python -m scripts.bench_guide_search --k 3 [--embedder openai]
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# (query, city or None, substring the right passage contains)
+EVAL = [
+    ("Fushimi Inari torii gates", None, "Fushimi Inari"),
+    ("Golden Pavilion", None, "Kinkaku-ji"),
+    ("Ryoan-ji rock garden", None, "Ryoan-ji"),
+    ("Speaker's Corner and the Serpentine", None, "Hyde Park"),
+    ("free-roaming deer", None, "Richmond Park"),
+    ("swimming ponds near Parliament Hill", None, "Hampstead Heath"),
+    ("Jemaa el-Fnaa snake charmers", None, "Jemaa el-Fnaa"),
+    ("souk for spices and perfumes", None, "Souk el Attarine"),
+    ("crafts at fixed prices", None, "Ensemble Artisanal"),
+    ("Roosevelt Island tram", None, "Roosevelt Island"),
+    ("medieval art that feels like a castle", None, "The Cloisters"),
+    ("Bloody Angle speakeasies", None, "Doyers Street"),
+    ("Mona Lisa", None, "Louvre"),
+    ("Impressionist art in a former railway station", None, "Orsay"),
+    ("Monet Water Lilies", None, "Orangerie"),
+    ("carbonara with guanciale", None, "Carbonara"),
+    ("fried rice balls with mozzarella", None, "Suppl"),
+    ("Pizzarium Bonci", None, "Pizza al Taglio"),
+    ("Bondi to Coogee coastal walk", None, "Bondi"),
+    ("ferry from Circular Quay", None, "Manly"),
+    ("natural rock pool for families", "Sydney", "Bronte"),
+    ("calm water for kayaking", "Sydney", "Balmoral"),
+    ("where to get ice cream", "Rome", "Gelato"),
+    ("best time to avoid crowds at temples", "Kyoto", "fewer crowds"),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--embedder", default="hashing")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    out = tempfile.mkdtemp(prefix="guide_index_")
+    os.environ["GUIDE_INDEX_DIR"] = out
+    os.environ["EMBED_CACHE_DIR"] = ""
+    os.environ["EMBED_CACHE_SIZE"] = "0"  # measure the embedding round trip every time
+    os.environ["GUIDE_EMBEDDER"] = args.embedder
+
+    import scripts.build_guide_index as builder
+    from tools import guide_api
+    from tools.embedders import make_embedder
+    sys.argv = ["build_guide_index", "--out", out, "--embedder", args.embedder]
+    builder.main()
+    guide_api.warmup()
+
+    queries = [q for q, _, _ in EVAL] * args.repeat
+    embedder = make_embedder(args.embedder)
+    t0 = time.perf_counter()
+    for q in queries:
+        embedder.embed_query(q)
+    one = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    embedder.embed_documents(queries)
+    batch = time.perf_counter() - t0
+    print(f"\n{args.embedder}: {len(queries) / one:,.0f} embeddings/s one at a time, "
+          f"{len(queries) / batch:,.0f}/s in one batch")
+
+    print(f"\n{len(EVAL)} queries, recall@{args.k} = right passage among the top {args.k}")
+    for mode in ("dense", "lexical", "hybrid"):
+        hits, times = 0, []
+        for query, city, gold in EVAL:
+            for _ in range(args.repeat):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    t0 = time.perf_counter()
+                    passages = guide_api.retrieve_tips(query, k=args.k, city=city, mode=mode)
+                    times.append(time.perf_counter() - t0)
+            hits += any(gold in p for p in passages)
+        print(f"  {mode:<8} recall@{args.k} {hits / len(EVAL):5.2f}   "
+              f"p50 {1000 * statistics.median(times):8.3f} ms   max {1000 * max(times):8.3f} ms")
+    shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
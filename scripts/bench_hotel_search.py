@@ -0,0 +1,61 @@
+# Bytes downloaded and latency of a "4-star" search_hotels query, old path vs. current,
+# against the local stub (scripts/amadeus_stub.py). Run from the project root:
+#   python -m scripts.bench_hotel_search --hotels 600 --runs 5
+
+import argparse
+import os
+import statistics
+import time
+
+from scripts.amadeus_stub import AmadeusStub
+from tools.amadeus_client import get_client, reset_client
+import tools.hotel_api as hotel_api
+
+CHECKIN, CHECKOUT = "2030-05-10", "2030-05-12"
+
+
+def legacy_search(city_code, hotel_class):
+    """The pre-cache flow: full by-city list every time, first 20 IDs, star filter after download."""
+    client = get_client()
+    r = client.get("/v1/reference-data/locations/hotels/by-city", params={"cityCode": city_code})
+    ids = [h["hotelId"] for h in r.json().get("data", [])]
+    r = client.get("/v3/shopping/hotel-offers", params={
+        "hotelIds": ",".join(ids[:20]), "checkInDate": CHECKIN, "checkOutDate": CHECKOUT,
+        "adults": 1, "roomQuantity": 1, "currency": "USD", "bestRateOnly": "true",
+    })
+    want = "".join(ch for ch in hotel_class if ch.isdigit())
+    return [item for item in r.json().get("data", []) if str(item["hotel"].get("rating")) == want]
+
+
+def run(stub, label, fn, runs):
+    stub.reset_stats()
+    times, found = [], 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        found = len(fn())
+        times.append(time.perf_counter() - t0)
+    print(f"{label:<8} bytes/query={stub.stats['bytes_sent'] // runs:>8}  "
+          f"mean={1000 * statistics.fmean(times):7.2f} ms  first={1000 * times[0]:7.2f} ms  "
+          f"matches={found}  requests={dict(stub.paths)}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hotels", type=int, default=600, help="hotels per city in the stub")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.01)
+    args = ap.parse_args()
+
+    os.environ.setdefault("AMADEUS_CLIENT_ID", "bench")
+    os.environ.setdefault("AMADEUS_CLIENT_SECRET", "bench")
+    with AmadeusStub(latency=args.latency, hotels_per_city=args.hotels) as stub:
+        os.environ["AMADEUS_BASE_URL"] = stub.url
+        reset_client()
+        get_client().access_token()
+        run(stub, "before", lambda: legacy_search("NYC", "4-star"), args.runs)
+        run(stub, "after", lambda: hotel_api.search_hotels("NYC", CHECKIN, CHECKOUT, hotel_class="4-star"), args.runs)
+        reset_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Microbenchmark: dict-per-offer parse + full sort (old) vs. slotted models + streaming
+# filter + heap top-k (tools/models.py) over large flight/hotel payloads.
+# Payloads are synthesized with the stub's generators, or pass recorded responses:
+#   python -m scripts.bench_parse --flights recorded_flights.json --hotels recorded_hotels.json
+
+import argparse
+import json
+import timeit
+import tracemalloc
+
+from scripts.amadeus_stub import AmadeusStub
+from tools.flight_api import _parse_flight_offers
+from tools.flight_cache import OfferFilters
+from tools.hotel_api import _TopByPrice
+
+
+# ---------- the pre-model parsers, kept here as the baseline ----------
+def legacy_flights(payload, max_price, k):
+    carriers = (payload.get("dictionaries", {}) or {}).get("carriers", {}) or {}
+
+    def flatten(it):
+        out = []
+        for seg in it.get("segments", []) or []:
+            dep, arr, code = seg.get("departure", {}) or {}, seg.get("arrival", {}) or {}, seg.get("carrierCode")
+            out.append({"from": dep.get("iataCode"), "to": arr.get("iataCode"), "dep_time": dep.get("at"),
+                        "arr_time": arr.get("at"), "carrier": carriers.get(code, code), "carrierCode": code,
+                        "number": seg.get("number"), "duration": seg.get("duration")})
+        return out
+
+    out = []
+    for offer in payload.get("data", []) or []:
+        price_str = (offer.get("price", {}) or {}).get("total")
+        its = offer.get("itineraries", []) or []
+        ob = flatten(its[0]) if its else []
+        rt = flatten(its[1]) if len(its) > 1 else []
+        out.append({"price": price_str, "price_num": float(price_str),
+                    "currency": (offer.get("price", {}) or {}).get("currency"), "one_way": len(its) < 2,
+                    "outbound": ob, "return": rt, "stops_outbound": max(0, len(ob) - 1),
+                    "stops_return": max(0, len(rt) - 1)})
+    out = [r for r in out if r["price_num"] <= max_price]
+    out.sort(key=lambda r: r["price_num"])
+    return out[:k]
+
+
+def legacy_hotels(payload, max_price, k):
+    results = []
+    for item in payload.get("data", []):
+        h = item.get("hotel", {}) or {}
+        rating = h.get("rating")
+        for off in item.get("offers", []) or []:
+            price_str = (off.get("price", {}) or {}).get("total")
+            results.append({
+                "name": h.get("name"), "address": (h.get("address", {}) or {}).get("lines", []),
+                "city": (h.get("address", {}) or {}).get("cityName"),
+                "stars": int(rating) if rating and str(rating).isdigit() else None,
+                "price": price_str, "price_num": float(price_str),
+                "currency": (off.get("price", {}) or {}).get("currency"),
+                "checkInDate": off.get("checkInDate"), "checkOutDate": off.get("checkOutDate"),
+                "room": (off.get("room", {}) or {}).get("typeEstimated", {}),
+                "description": (off.get("room", {}) or {}).get("description", {}).get("text"),
+                "bookingLink": (off.get("urls", {}) or {}).get("booking"),
+            })
+    results = [r for r in results if r["price_num"] <= max_price]
+    results.sort(key=lambda r: r["price_num"])
+    return results[:k]
+
+
+def new_flights(payload, max_price, k):
+    return [o.to_dict() for o in _parse_flight_offers(payload, OfferFilters.of(max_price, False, None, k), k)]
+
+
+def new_hotels(payload, max_price, k):
+    top = _TopByPrice(k, max_price=max_price)
+    top.merge(payload)
+    return top.finish(1)
+
+
+def measure(label, fn, payload, max_price, k, number):
+    t = min(timeit.repeat(lambda: fn(payload, max_price, k), number=number, repeat=5)) / number
+    tracemalloc.start()
+    result = fn(payload, max_price, k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<7} {1000 * t:8.3f} ms/parse   peak alloc {peak / 1024:8.1f} KiB   kept {len(result)}")
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--flights", help="recorded /v2/shopping/flight-offers response (JSON)")
+    ap.add_argument("--hotels", help="recorded /v3/shopping/hotel-offers response (JSON)")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--max-price", type=float, default=1500)
+    ap.add_argument("--number", type=int, default=20)
+    args = ap.parse_args()
+
+    stub = AmadeusStub(hotels_per_city=1000)
+    if args.flights:
+        flights = json.load(open(args.flights))
+    else:
+        _, flights = stub.flight_offers({"originLocationCode": "DEL", "destinationLocationCode": "LHR",
+                                         "departureDate": "2030-01-10", "returnDate": "2030-01-20", "max": "250"})
+    if args.hotels:
+        hotels = json.load(open(args.hotels))
+    else:
+        ids = ",".join(h["hotelId"] for h in stub._hotels("PAR"))
+        _, hotels = stub.hotel_offers({"hotelIds": ids, "checkInDate": "2030-01-10", "checkOutDate": "2030-01-12"})
+
+    print(f"flight-offers: {len(flights['data'])} offers")
+    old = measure("before", legacy_flights, flights, args.max_price, args.k, args.number)
+    new = measure("after", new_flights, flights, args.max_price, args.k, args.number)
+    assert [o["price"] for o in old] == [o["price"] for o in new]
+
+    print(f"hotel-offers: {len(hotels['data'])} hotels")
+    old = measure("before", legacy_hotels, hotels, args.max_price, args.k, args.number)
+    new = measure("after", new_hotels, hotels, args.max_price, args.k, args.number)
+    assert [o["price"] for o in old] == [o["price"] for o in new]
+
+
+if __name__ == "__main__":
+    main()
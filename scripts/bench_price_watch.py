@@ -0,0 +1,78 @@
+# Upstream cost of the price-watch scheduler (tools/price_watch.py) as subscribers grow, against
+# the local stub. Subscribers are spread over a fixed set of routes/stays with different filters
+# and thresholds; the stub's prices are moved between polls to trigger threshold crossings.
+# Run from the project root:
+#   python -m scripts.bench_price_watch --subscribers 10,100,1000
+
+import argparse
+import os
+import random
+import time
+
+from scripts.amadeus_stub import AmadeusStub
+from tools.amadeus_client import get_client, reset_client
+from tools.price_watch import PriceWatcher
+
+FLIGHTS = [
+    dict(origin="DEL", destination="BOM", date_from="2030-01-10"),
+    dict(origin="DEL", destination="BOM", date_from="2030-01-10", nonstop_only=True),
+    dict(origin="DEL", destination="BOM", date_from="2030-01-10", carriers=["AI"]),
+    dict(origin="NYC", destination="LON", date_from="2030-02-01", date_to="2030-02-08"),
+    dict(origin="NYC", destination="LON", date_from="2030-02-01", date_to="2030-02-08", nonstop_only=True),
+    dict(origin="PAR", destination="ROM", date_from="2030-03-15"),
+]
+HOTELS = [
+    dict(city="NYC", checkin="2030-05-10", checkout="2030-05-12"),
+    dict(city="NYC", checkin="2030-05-10", checkout="2030-05-12", hotel_class="4-star"),
+    dict(city="NYC", checkin="2030-05-10", checkout="2030-05-12", hotel_class="5-star"),
+    dict(city="PAR", checkin="2030-06-01", checkout="2030-06-04", hotel_class="3-star"),
+]
+PRICE_MOVES = [1.0, 1.0, 0.6, 0.6, 1.4]  # stub price factor before each poll
+
+
+def run(stub, subscribers, seed=1):
+    rnd = random.Random(seed)
+    notes = []
+    watcher = PriceWatcher(notify=notes.append)
+    for i in range(subscribers):
+        if i % 3 == 2:
+            q = HOTELS[i % len(HOTELS)]
+            watcher.add_hotel_watch(f"user{i}", threshold=rnd.uniform(60, 150), **q)
+        else:
+            q = FLIGHTS[i % len(FLIGHTS)]
+            watcher.add_flight_watch(f"user{i}", threshold=rnd.uniform(60, 200), **q)
+    stats = watcher.snapshot()
+    print(f"subscribers={subscribers:<5} watches={stats['watches']} distinct queries={stats['groups']}")
+    for factor in PRICE_MOVES:
+        stub.price_factor = factor
+        stub.reset_stats()
+        notes.clear()
+        t0 = time.perf_counter()
+        watcher.poll_once()
+        ms = 1000 * (time.perf_counter() - t0)
+        print(f"  price x{factor:<4} upstream flight-offers={stub.paths['/v2/shopping/flight-offers']:<3} "
+              f"hotel-offers={stub.paths['/v3/shopping/hotel-offers']:<3} "
+              f"notified below={sum(n.direction == 'below' for n in notes):<4} "
+              f"above={sum(n.direction == 'above' for n in notes):<4} {ms:7.1f} ms")
+    print(f"  stats {watcher.snapshot()}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subscribers", default="10,100,1000")
+    ap.add_argument("--latency", type=float, default=0.005)
+    args = ap.parse_args()
+
+    os.environ.setdefault("AMADEUS_CLIENT_ID", "bench")
+    os.environ.setdefault("AMADEUS_CLIENT_SECRET", "bench")
+    with AmadeusStub(latency=args.latency, hotels_per_city=120) as stub:
+        os.environ["AMADEUS_BASE_URL"] = stub.url
+        reset_client()
+        get_client().access_token()
+        for n in args.subscribers.split(","):
+            run(stub, int(n))
+        reset_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Preference load/save in Redis: the old layout (one string key per preference, loaded with
+# KEYS <ns>:<thread>:* plus one GET per key) vs store/redis_store.py's hash per thread (HGETALL /
+# one HSET of the changed fields), on a keyspace with millions of unrelated keys. Also times the
+# once-per-process migrate_all() on first use and the flag check that replaces it afterwards.
+# Uses fakeredis unless --url points at a real server (use a scratch database: the benchmark
+# flushes it). fakeredis has no network, so also
+# look at round trips (each costs an RTT against a real server), and its KEYS/SCAN are much slower
+# than Redis', so keep --keys small there; measure millions of keys against a real server:
+#   python -m scripts.bench_redis_prefs
+#   python -m scripts.bench_redis_prefs --url redis://localhost:6379/15 --keys 2000000 --threads 100000
+
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import time
+
+from store.redis_store import RedisStore
+
+PREFS = {"hotel_class": "4-star", "budget": "2000", "airline": "any", "seat": "aisle", "meal": "veg"}
+
+
+def count_round_trips(client):
+    """Count commands sent outside a pipeline (a pipeline's execute() is one more round trip)."""
+    client.round_trips = 0
+    inner = client.execute_command
+
+    def counted(*args, **kwargs):
+        client.round_trips += 1
+        return inner(*args, **kwargs)
+
+    client.execute_command = counted
+    return client
+
+
+# ---------- the layout RedisStore used before ----------
+def old_load(client, ns, thread_id):
+    keys = client.keys(f"{ns}:{thread_id}:*")
+    return {k.decode().split(":", 2)[-1]: client.get(k).decode() for k in keys}
+
+
+def old_save(client, ns, thread_id, prefs):
+    for k, v in prefs.items():
+        client.set(f"{ns}:{thread_id}:{k}", str(v))
+
+
+def populate(client, ns, keys, threads, seed=5):
+    rnd = random.Random(seed)
+    pipe = client.pipeline(transaction=False)
+    for i in range(keys):  # unrelated keyspace: caches, sessions, queues
+        pipe.set(f"{rnd.choice(['cache', 'session', 'rate', 'job'])}:{i}", "x")
+        if i % 10_000 == 9_999:
+            pipe.execute()
+    for t in range(threads):
+        for k in rnd.sample(sorted(PREFS), 3):
+            pipe.set(f"{ns}:thread{t}:{k}", PREFS[k])
+        if t % 3_000 == 2_999:
+            pipe.execute()
+    pipe.execute()
+
+
+def timed(fn, samples):
+    times = []
+    for s in samples:
+        t0 = time.perf_counter()
+        fn(s)
+        times.append(time.perf_counter() - t0)
+    return 1000 * statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", help="real Redis URL (flushed!); default: in-process fakeredis")
+    ap.add_argument("--keys", type=int, default=50_000, help="unrelated keys in the keyspace")
+    ap.add_argument("--threads", type=int, default=2_000, help="conversation threads with preferences")
+    ap.add_argument("--samples", type=int, default=20)
+    args = ap.parse_args()
+
+    if args.url:
+        import redis
+        client = redis.from_url(args.url)
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis()
+    client.flushdb()
+    ns = "prefs"
+    t0 = time.perf_counter()
+    populate(client, ns, args.keys, args.threads)
+    count_round_trips(client)
+    print(f"keyspace: {client.dbsize():,} keys ({args.threads:,} threads x 3 preferences), "
+          f"populated in {time.perf_counter() - t0:.1f}s")
+
+    rnd = random.Random(1)
+    sample = [f"thread{t}" for t in rnd.sample(range(args.threads), 2 * args.samples)]
+    old_s, new_s = sample[:args.samples], sample[args.samples:]
+
+    def report(label, ms, trips):
+        print(f"  {label:<38} {ms:10.3f} ms  {trips:5.1f} round trips")
+
+    print("old layout (string keys)")
+    client.round_trips = 0
+    ms = timed(lambda t: old_load(client, ns, t), old_s)
+    report("load: KEYS + GET per key", ms, client.round_trips / len(old_s))
+    client.round_trips = 0
+    ms = timed(lambda t: old_save(client, ns, t, {"budget": "2500", "hotel_class": "5-star", "seat": "aisle"}),
+               old_s)
+    report("save: SET per key", ms, client.round_trips / len(old_s))
+
+    def make_store():
+        store = RedisStore("redis://localhost", namespace=ns)  # redis-py connects lazily: swap the client in
+        store.client = client
+        return store
+
+    store = make_store()
+    print("hash per thread")
+    client.round_trips = 0
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # migration log lines
+        store.get_all(new_s[0])
+    report("first call in a process: migrate_all", 1000 * (time.perf_counter() - t0), client.round_trips)
+    client.round_trips = 0
+    ms = timed(lambda t: make_store().get_all(t), new_s)
+    report("first call, flag already set", ms, client.round_trips / len(new_s))
+    client.round_trips = 0
+    ms = timed(store.get_all, new_s)
+    report("load: HGETALL", ms, client.round_trips / len(new_s))
+    client.round_trips = 0
+    ms = timed(lambda t: store.batch(t, {"budget": "2500"}), new_s)
+    report("save changed fields: HSET", ms, client.round_trips / len(new_s))
+    client.round_trips = 0
+    ms = timed(lambda t: store.batch(t, {}), new_s)
+    report("save, nothing changed", ms, client.round_trips / len(new_s))
+    assert store.get_all(old_s[0]) and store.get_all(new_s[0]), "migrated preferences missing"
+
+
+if __name__ == "__main__":
+    main()
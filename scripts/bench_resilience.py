@@ -0,0 +1,92 @@
+# Throughput and error rate of Amadeus calls with and without the resilience policy
+# (tools/resilience.py), against the local stub injecting 429s, 5xxs and an outage.
+# Run from the project root:
+#   python -m scripts.bench_resilience --threads 8 --seconds 5
+
+import argparse
+import os
+import threading
+import time
+from collections import Counter
+
+from scripts.amadeus_stub import AmadeusStub
+from tools.amadeus_client import AmadeusClient
+from tools.resilience import CircuitBreaker, CircuitOpenError, EndpointLimits, ResiliencePolicy
+
+PATH = "/v2/shopping/flight-offers"
+PARAMS = {"originLocationCode": "DEL", "destinationLocationCode": "BOM", "departureDate": "2030-01-10",
+          "adults": 1, "max": 5}
+
+
+def naive_policy():
+    """No client-side limit, no retries, breaker effectively off: the old raise_for_status behaviour."""
+    return ResiliencePolicy(limits=EndpointLimits({"default": 0, PATH: 0}),
+                            breaker=CircuitBreaker(threshold=10 ** 9), max_retries=0)
+
+
+def hammer(stub, policy, threads, seconds, **faults):
+    client = AmadeusClient(base_url=stub.url, policy=policy)
+    client.access_token()
+    stub.reset_stats()
+    for k, v in faults.items():
+        setattr(stub, k, v)
+    outcomes = Counter()
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def worker():
+        while time.monotonic() < stop:
+            try:
+                status = client.get(PATH, params=PARAMS).status_code
+                key = "ok" if status < 400 else f"http_{status}"
+            except CircuitOpenError:
+                key = "circuit_open"
+            except Exception as e:
+                key = type(e).__name__
+            with lock:
+                outcomes[key] += 1
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.monotonic()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    elapsed = time.monotonic() - t0
+    for k in faults:
+        setattr(stub, k, AmadeusStub().__dict__[k])
+    client.close()
+    calls = sum(outcomes.values())
+    return {
+        "calls": calls,
+        "ok_per_s": round(outcomes["ok"] / elapsed, 1),
+        "error_rate": round(1 - outcomes["ok"] / calls, 3) if calls else 0.0,
+        "upstream_requests": stub.stats["requests"],
+        "outcomes": dict(outcomes),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5)
+    args = ap.parse_args()
+    os.environ.setdefault("AMADEUS_CLIENT_ID", "bench")
+    os.environ.setdefault("AMADEUS_CLIENT_SECRET", "bench")
+
+    scenarios = [
+        ("server limit 10 rps, Retry-After: 1", dict(server_rps=10, retry_after=1)),
+        ("10% 429 + 10% 500 at random", dict(rate_429=0.1, rate_5xx=0.1)),
+        ("upstream down (503)", dict(down=True)),
+    ]
+    with AmadeusStub(latency=0.01) as stub:
+        for title, faults in scenarios:
+            print(f"== {title}")
+            for label, policy in (("naive", naive_policy()),
+                                  ("policy", ResiliencePolicy(limits=EndpointLimits({"default": 10, PATH: 10}),
+                                                              breaker=CircuitBreaker(threshold=5, cooldown=2)))):
+                print(f"  {label:<7} {hammer(stub, policy, args.threads, args.seconds, **faults)}")
+
+
+if __name__ == "__main__":
+    main()
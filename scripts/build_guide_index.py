@@ -1,31 +1,324 @@
-# using LangChain, OpenAI, and FAISS to build and persist a local vector store (a vector index)
+# using an embedding backend (tools/embedders.py) and FAISS to build and persist a local vector store (a vector index)
 # from a directory of documents (ie:data/guides)
+#
+# Every build writes a new version, GUIDE_INDEX_DIR/versions/<version>/, then atomically points
+# GUIDE_INDEX_DIR/CURRENT at it; running workers pick it up without a restart (see guide_api).
+# The last --keep-versions versions are kept. Layout of a version:
+#   index.faiss, passages.*, metadata.*, store.json
+#                                    every chunk of every guide, with city/topic metadata, in the
+#                                    pickle-free mmap format of tools/guide_store.py
+#   cities/<city_slug>/...           one shard per city (same format), searched by retrieve_tips(city=...)
+#   manifest.json                    build settings (incl. the embedder identity retrieve_tips must
+#                                    query with) + content hash of every file and chunk
+#   bm25.json                        BM25 inverted index over the same chunks (lexical search)
+#
+# Guides are split on Markdown headings into chunks of at most --chunk-size characters.
+# Re-runs are incremental: unchanged files are skipped by hash, only new chunks are embedded
+# (in batches), chunks that disappeared are deleted, and only the affected city shards are
+# rewritten (the others are hard-linked from the previous version). Nothing changed, nothing is
+# published. A change of chunking settings or embedder, or --full, rebuilds from scratch.
+# --embedder (GUIDE_EMBEDDER) is "openai[:model]" (default) or "hashing[:dim]", which runs locally
+# with NumPy alone: no API key, no network.
+# --index-type (GUIDE_INDEX_TYPE) picks the FAISS index: "flat" (exact, default), "ivf" or "hnsw"
+# (approximate, for thousands of guides), optionally with --pq product quantization; any other
+# value is taken as a faiss.index_factory string. Changing it re-indexes without re-embedding.
+# Stores too small to train the requested index (e.g. most city shards) stay Flat.
+# scripts/bench_ann.py measures recall/latency/memory of these settings.
+#   python -m scripts.build_guide_index [--embedder hashing --chunk-size 600 --chunk-overlap 80 --batch-size 64 --full]
 
+import argparse
+import hashlib
+import json
 import os
+import re
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
 from dotenv import load_dotenv
 # Load environment variables from the .env file (in project root)
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-from langchain_core.documents import Document as LCDocument
-from llama_index.core import SimpleDirectoryReader
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+import numpy as np
 
+from tools.bm25 import BM25Index
+from tools.embedders import embedder_identity, make_embedder, normalize_identity
+from tools.guide_api import (CITY_SHARDS_DIR, GUIDE_INDEX_DIR, INDEX_CURRENT, INDEX_MANIFEST, INDEX_VERSIONS_DIR,
+                             city_slug, resolve_index_dir)
+from tools.guide_store import GuideStore, is_store
 
-# Load LlamaIndex docs
-llama_docs = SimpleDirectoryReader("data/guides").load_data()
+GUIDES_DIR = "data/guides"
+MANIFEST = INDEX_MANIFEST
+MANIFEST_VERSION = 1
 
-# Convert LlamaIndex docs to LangChain-compatible documents
-docs = [LCDocument(page_content=doc.get_content(), metadata={}) for doc in llama_docs]
+HEADING_RE = re.compile(r"^#{1,6}\s")
 
-# Initialize OpenAI embedding model (uses OPENAI_API_KEY from env)
-embedding_model = OpenAIEmbeddings()
 
-# Create FAISS vector store from documents
-store = FAISS.from_documents(docs, embedding_model)
+def guide_metadata(path: Path) -> dict:
+    """'New_York_hidden_gems.md' -> city 'New York', topic 'hidden gems' (city words are capitalized)."""
+    parts = path.stem.split("_")
+    split = next((i for i, p in enumerate(parts) if not p[:1].isupper()), len(parts))
+    city = " ".join(parts[:split]) or path.stem
+    return {"city": city, "topic": " ".join(parts[split:]), "source": path.name}
 
-# Saving the vector store locally so that we don't need to recompute embeddings everytime
-store.save_local("data/guide_index")
 
+def sha(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 
+# ---------- chunking ----------
+def split_sections(text: str) -> List[str]:
+    """Split Markdown into sections, each starting at a heading line (text before the first heading is its own)."""
+    sections, current = [], []
+    for line in text.splitlines():
+        if HEADING_RE.match(line) and current:
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current).strip())
+    return [s for s in sections if s]
+
+
+def _windows(text: str, size: int, overlap: int) -> List[str]:
+    """Line-packed windows of at most `size` chars; each repeats up to `overlap` chars of the previous one."""
+    lines = []
+    for line in text.splitlines():
+        while len(line) > size:  # a single overlong line is hard-split
+            lines.append(line[:size])
+            line = line[size - overlap:] if overlap < size else line[size:]
+        lines.append(line)
+    out, cur = [], []
+    for line in lines:
+        if cur and len("\n".join(cur + [line])) > size:
+            out.append("\n".join(cur))
+            tail, n = [], 0
+            for prev in reversed(cur):
+                if n + len(prev) + 1 > overlap:
+                    break
+                tail.insert(0, prev)
+                n += len(prev) + 1
+            cur = tail
+        cur.append(line)
+    if cur:
+        out.append("\n".join(cur))
+    return out
+
+
+def chunk_markdown(text: str, size: int, overlap: int) -> List[str]:
+    """
+    Heading-aware chunks: whole sections are packed together up to `size` chars, a section
+    longer than that is windowed with `overlap`. Chunks after the first repeat the document
+    title so every passage still says which guide it is from.
+    """
+    sections = split_sections(text)
+    title = sections[0].splitlines()[0] if sections and sections[0].startswith("# ") else ""
+    chunks, cur = [], ""
+    for section in sections:
+        for piece in (_windows(section, size, overlap) if len(section) > size else [section]):
+            if cur and len(cur) + 2 + len(piece) > size:
+                chunks.append(cur)
+                cur = ""
+            cur = f"{cur}\n\n{piece}" if cur else piece
+    if cur:
+        chunks.append(cur)
+    return [c if not title or c.startswith(title) else f"{title}\n\n{c}" for c in chunks]
+
+
+# ---------- embedding ----------
+def embed_batched(model, texts: List[str], batch_size: int) -> Tuple[List[List[float]], int]:
+    """Embed `texts` in requests of up to `batch_size`; returns (vectors, number of requests)."""
+    vectors, calls = [], 0
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(model.embed_documents(texts[i:i + batch_size]))
+        calls += 1
+    return vectors, calls
+
+
+# ---------- index ----------
+def load_previous(index_dir: str, settings: dict):
+    """(rows, manifest) of the last build if it can be updated in place, else ({}, None); rows: id -> (text, meta, vector)."""
+    try:
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}, None
+    if manifest.get("model"):  # older manifests hold the bare OpenAI model name
+        manifest["model"] = normalize_identity(manifest["model"])
+    if {k: manifest.get(k) for k in settings} != settings:
+        print("[build] chunking settings or embedder changed; rebuilding from scratch")
+        return {}, None
+    if not is_store(index_dir):
+        print("[build] previous index is in the old pickle format; rebuilding from scratch "
+              "(scripts/migrate_guide_index.py converts it without re-embedding)")
+        return {}, None
+    store = GuideStore(index_dir)
+    vectors = store.vectors()
+    rows = {}
+    for i in range(len(store)):
+        doc = store.document(i)
+        rows[doc.id] = (doc.page_content, doc.metadata, vectors[i])
+    return rows, manifest
+
+
+def write_store(path: str, rows: Dict[str, tuple], ids: List[str], model: str, index: dict) -> str:
+    """index: index_type / index_params / search arguments of GuideStore.write; returns the spec used."""
+    return GuideStore.write(path, ids, [rows[i][0] for i in ids], [rows[i][1] for i in ids],
+                            np.array([rows[i][2] for i in ids], dtype=np.float32), model, **index)
+
+
+def write_shard(rows: Dict[str, tuple], index_dir: str, city: str, ids: List[str], model: str, index: dict) -> None:
+    """Write one city's shard from vectors already computed (no re-embedding)."""
+    if ids:
+        write_store(os.path.join(index_dir, CITY_SHARDS_DIR, city_slug(city)), rows, ids, model, index)
+
+
+def link_shard(prev_dir: str, index_dir: str, city: str) -> None:
+    """Carry an unchanged shard over from the previous version: hard links, no copy."""
+    src = os.path.join(prev_dir, CITY_SHARDS_DIR, city_slug(city))
+    dst = os.path.join(index_dir, CITY_SHARDS_DIR, city_slug(city))
+    if not os.path.isdir(src):
+        return
+    os.makedirs(dst)
+    for name in os.listdir(src):
+        try:
+            os.link(os.path.join(src, name), os.path.join(dst, name))
+        except OSError:  # e.g. a filesystem without hard links
+            shutil.copy2(os.path.join(src, name), os.path.join(dst, name))
+
+
+# ---------- versions ----------
+def publish(root: str, version: str) -> None:
+    """Point CURRENT at `version` in one rename: readers see the old or the new name, never a partial one."""
+    tmp = os.path.join(root, INDEX_CURRENT + ".tmp")
+    with open(tmp, "w") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, INDEX_CURRENT))
+
+
+def prune_versions(root: str, keep: int) -> None:
+    """Delete all but the newest `keep` versions (never the current one). Workers that still have
+    an old version mapped keep reading it: unlinked files live on until they are unmapped."""
+    _, current = resolve_index_dir(root)
+    versions = sorted(os.listdir(os.path.join(root, INDEX_VERSIONS_DIR)))
+    for version in versions[:-max(1, keep)]:
+        if version != current:
+            shutil.rmtree(os.path.join(root, INDEX_VERSIONS_DIR, version), ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--guides", default=GUIDES_DIR)
+    ap.add_argument("--out", default=GUIDE_INDEX_DIR)
+    ap.add_argument("--embedder", default=os.getenv("GUIDE_EMBEDDER") or "openai",
+                    help="openai[:model] or hashing[:dim]")
+    ap.add_argument("--chunk-size", type=int, default=int(os.getenv("GUIDE_CHUNK_SIZE", 600)))
+    ap.add_argument("--chunk-overlap", type=int, default=int(os.getenv("GUIDE_CHUNK_OVERLAP", 80)))
+    ap.add_argument("--batch-size", type=int, default=int(os.getenv("GUIDE_EMBED_BATCH", 64)))
+    ap.add_argument("--index-type", default=os.getenv("GUIDE_INDEX_TYPE", "flat"),
+                    help="flat, ivf, hnsw, or a faiss.index_factory string")
+    ap.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = about 4*sqrt(passages))")
+    ap.add_argument("--hnsw-m", type=int, default=32, help="HNSW links per node")
+    ap.add_argument("--pq", type=int, default=0, help="product-quantize vectors to this many bytes (0 = float32)")
+    ap.add_argument("--nprobe", type=int, default=8, help="IVF lists visited per query")
+    ap.add_argument("--ef-search", type=int, default=64, help="HNSW candidate list size per query")
+    ap.add_argument("--keep-versions", type=int, default=int(os.getenv("GUIDE_KEEP_VERSIONS", 3)))
+    ap.add_argument("--full", action="store_true", help="ignore the previous build")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+
+    # the OpenAI backend uses OPENAI_API_KEY from env; the hashing one needs nothing
+    embedding_model = make_embedder(args.embedder)
+    settings = {"version": MANIFEST_VERSION, "model": embedder_identity(embedding_model),
+                "chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap}
+    index = {"index_type": args.index_type,
+             "index_params": {"nlist": args.nlist, "hnsw_m": args.hnsw_m, "pq_m": args.pq},
+             "search": {"nprobe": args.nprobe, "efSearch": args.ef_search}}
+    prev_dir, prev_version = resolve_index_dir(args.out)
+    rows, old = ({}, None) if args.full else load_previous(prev_dir, settings)
+    old_files: Dict[str, dict] = old["files"] if old else {}
+
+    # ---- diff the guides against the manifest ----
+    files: Dict[str, dict] = {}
+    new_chunks: Dict[str, Tuple[str, dict]] = {}  # chunk id -> (text, metadata), only chunks to embed
+    touched_cities = set()
+    for path in sorted(Path(args.guides).glob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        meta = guide_metadata(path)
+        digest = sha(text)
+        prev = old_files.get(path.name)
+        if prev and prev["sha"] == digest:
+            files[path.name] = prev
+            continue
+        touched_cities.add(meta["city"])
+        if prev:
+            touched_cities.add(prev["city"])
+        ids = []
+        for chunk in chunk_markdown(text, args.chunk_size, args.chunk_overlap):
+            chunk_id = sha(f"{path.name}\0{chunk}")[:20]
+            while chunk_id in ids:  # the same text twice in one file
+                chunk_id = sha(chunk_id)[:20]
+            ids.append(chunk_id)
+            new_chunks[chunk_id] = (chunk, dict(meta))
+        files[path.name] = {"sha": digest, "city": meta["city"], "chunks": ids}
+
+    removed_files = set(old_files) - set(files)
+    touched_cities.update(old_files[name]["city"] for name in removed_files)
+    old_ids = {cid for f in old_files.values() for cid in f["chunks"]}
+    keep_ids = {cid for f in files.values() for cid in f["chunks"]}
+    to_delete = sorted(old_ids - keep_ids)
+    to_add = [cid for cid in new_chunks if cid not in old_ids]
+
+    if old is not None and {**settings, "index": index, "files": files} == old:
+        print(f"[build] index is up to date (version {prev_version}); nothing published")
+        return
+
+    # ---- embed only what is new, in batches ----
+    texts = [new_chunks[cid][0] for cid in to_add]
+    vectors, calls = embed_batched(embedding_model, texts, args.batch_size)
+
+    if old is None:
+        if not to_add:
+            print(f"[build] no guides found in {args.guides}")
+            return
+        touched_cities = {f["city"] for f in files.values()}
+    for cid in to_delete:
+        del rows[cid]
+    for cid, vector in zip(to_add, vectors):
+        rows[cid] = (*new_chunks[cid], vector)
+
+    # Saving the vector store locally so that we don't need to recompute embeddings everytime
+    version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    out = os.path.join(args.out, INDEX_VERSIONS_DIR, version)
+    os.makedirs(out)
+    model = settings["model"]
+    spec = write_store(out, rows, [cid for f in files.values() for cid in f["chunks"]], model, index)
+    if old is not None and old.get("index") != index:  # new index settings apply to every shard, not only touched ones
+        touched_cities = {f["city"] for f in files.values()}
+    for city in sorted({f["city"] for f in files.values()}):
+        if city in touched_cities:
+            write_shard(rows, out, city, [cid for f in files.values() if f["city"] == city for cid in f["chunks"]],
+                        model, index)
+        else:
+            link_shard(prev_dir, out, city)
+    # the lexical index is cheap (no embeddings), so it is simply rebuilt from the final chunk set
+    BM25Index.build((cid, rows[cid][0], city_slug(f["city"])) for f in files.values() for cid in f["chunks"]) \
+        .save(out)
+    with open(os.path.join(out, MANIFEST), "w") as f:
+        json.dump({**settings, "index": index, "files": files}, f, indent=1)
+    publish(args.out, version)
+    prune_versions(args.out, args.keep_versions)
+
+    added = [name for name in files if name not in old_files]
+    changed = [name for name in files if name in old_files and files[name] is not old_files[name]]
+    print(f"[build] {len(files)} guides ({len(added)} new, {len(changed)} changed, {len(removed_files)} removed), "
+          f"{len(keep_ids)} chunks: +{len(to_add)} -{len(to_delete)}; "
+          f"{calls} embedding requests ({settings['model']}); {spec} index; {len(touched_cities)} city shards rewritten; "
+          f"published {version}; {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Async preference loads on a Redis that still holds the old string-key layout behind a large
+# keyspace: concurrent aget_all / abatch calls (what aload_prefs_node / asave_prefs_node do) must
+# wait for the one-off migration instead of timing out, with a per-call timeout far shorter than
+# the migration. Fails (exit 1) if a call errors, returns a thread's preferences incomplete, the
+# namespace is migrated more than once, or calls after the migration are slower than the timeout.
+# Also reports the longest event-loop stall while the migration runs. Uses fakeredis; run from
+# the project root:
+#   python -m scripts.check_redis_async_migration --keys 200000 --threads 500
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+
+import fakeredis
+
+from store.redis_store import RedisStore
+
+PREFS = {"hotel_class": "4-star", "budget": "2000", "seat:window": "yes"}
+
+
+def populate(client, keys: int, threads: int) -> None:
+    pipe = client.pipeline(transaction=False)
+    for i in range(keys):
+        pipe.set(f"cache:{i}", "x")
+        if i % 10_000 == 9_999:
+            pipe.execute()
+    for t in range(threads):
+        for k, v in PREFS.items():
+            pipe.set(f"prefs:thread{t}:{k}", v)
+    pipe.execute()
+
+
+async def main_async(args) -> bool:
+    server = fakeredis.FakeServer()
+    sync = fakeredis.FakeRedis(server=server)
+    populate(sync, args.keys, args.threads)
+
+    store = RedisStore("redis://localhost", namespace="prefs", timeout=args.timeout)
+    store.client = sync  # redis-py connects lazily: swap both clients for fakeredis on one server
+    store.aclient = lambda: fakeredis.FakeAsyncRedis(server=server)
+    runs = []
+    migrate_all = store.migrate_all
+    store.migrate_all = lambda: runs.append(1) or migrate_all()
+
+    stalls = []
+
+    async def ticker(stop: asyncio.Event):
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - t0 - 0.01)
+
+    async def load(t: int):
+        prefs = await store.aget_all(f"thread{t}")
+        await store.abatch(f"thread{t}", {"budget": "2500"})
+        return prefs
+
+    errors, incomplete = [], 0
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(stop))
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # migration log lines
+        results = await asyncio.gather(*(load(t) for t in range(args.concurrency)), return_exceptions=True)
+    first = time.perf_counter() - t0
+    stop.set()
+    await tick
+    for r in results:
+        if isinstance(r, BaseException):
+            errors.append(repr(r))
+        elif r != PREFS:
+            incomplete += 1
+
+    after = []
+    for t in range(args.concurrency, min(args.threads, args.concurrency + 50)):
+        t1 = time.perf_counter()
+        if await store.aget_all(f"thread{t}") != PREFS:
+            incomplete += 1
+        after.append(time.perf_counter() - t1)
+
+    print(f"keyspace {sync.dbsize():,} keys; per-call timeout {1000 * args.timeout:.0f} ms; "
+          f"{args.concurrency} concurrent loads during the migration took {first:.2f}s")
+    print(f"migrations run {len(runs)}, errors {len(errors)}, incomplete preferences {incomplete}, "
+          f"slowest call after migration {1000 * max(after):.2f} ms, "
+          f"longest event-loop stall {1000 * max(stalls, default=0):.1f} ms")
+    for e in errors[:5]:
+        print("  error:", e)
+    return not errors and not incomplete and len(runs) == 1 and max(after) < args.timeout
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keys", type=int, default=200_000, help="unrelated keys in front of the old layout")
+    ap.add_argument("--threads", type=int, default=500, help="threads with old-layout preferences")
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--timeout", type=float, default=0.2, help="RedisStore per-call timeout (s)")
+    args = ap.parse_args()
+    ok = asyncio.run(main_async(args))
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Convert a guide index saved by LangChain's FAISS.save_local (index.faiss + index.pkl) into the
+# pickle-free mmap format of tools/guide_store.py, for the main index and every city shard.
+# Vectors are copied out of the existing FAISS index, so nothing is re-embedded. index.pkl is
+# unpickled one last time here (it is our own file); --keep-pickle leaves it on disk.
+#   python -m scripts.migrate_guide_index [--index data/guide_index] [--keep-pickle]
+
+import argparse
+import os
+import shutil
+from pathlib import Path
+
+from tools.guide_api import CITY_SHARDS_DIR, GUIDE_INDEX_DIR, index_embedder
+from tools.guide_store import LEGACY_PICKLE, GuideStore, is_store
+
+
+def migrate(index_dir: str, model: str, keep_pickle: bool) -> int:
+    """Rewrite one LangChain FAISS directory in place; returns the number of passages."""
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import FakeEmbeddings
+
+    pickle_path = os.path.join(index_dir, LEGACY_PICKLE)
+    backup = pickle_path + ".bak"
+    if keep_pickle:
+        shutil.copy2(pickle_path, backup)  # GuideStore.write removes the superseded pickle
+    # embeddings are never called here: the vectors come out of the index itself
+    store = FAISS.load_local(index_dir, FakeEmbeddings(size=1), allow_dangerous_deserialization=True)
+    order = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+    docs = [store.docstore.search(doc_id) for doc_id in order]
+    vectors = store.index.reconstruct_n(0, store.index.ntotal)
+    GuideStore.write(index_dir, order, [d.page_content for d in docs], [d.metadata for d in docs], vectors, model,
+                     dim=store.index.d)
+    if keep_pickle:
+        os.replace(backup, pickle_path)
+    return len(order)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index", default=GUIDE_INDEX_DIR)
+    ap.add_argument("--keep-pickle", action="store_true", help="leave index.pkl next to the new files")
+    args = ap.parse_args()
+
+    model = index_embedder(args.index)  # from the build manifest; pre-manifest indexes are OpenAI
+    shards = sorted(p for p in (Path(args.index) / CITY_SHARDS_DIR).glob("*") if p.is_dir())
+    for path in [Path(args.index)] + shards:
+        if is_store(str(path)):
+            print(f"[migrate] {path}: already converted")
+        elif (path / LEGACY_PICKLE).exists():
+            print(f"[migrate] {path}: {migrate(str(path), model, args.keep_pickle)} passages ({model})")
+        else:
+            print(f"[migrate] {path}: no index found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Record a fixed set of flight/hotel searches through the record/replay transport (tools/replay.py),
+# then replay them offline and check the tools return exactly what they returned when recorded.
+# Run from the project root:
+#   python -m scripts.record_replay record            # against the local stub
+#   python -m scripts.record_replay record --live     # against AMADEUS_BASE_URL with real credentials
+#   python -m scripts.record_replay replay --latency 0.05 --runs 5
+# Location/flight caches are disabled so every run makes the same upstream calls.
+
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+os.environ["IATA_CACHE_PATH"] = ""
+os.environ["IATA_SEED_PATH"] = ""
+os.environ["FLIGHT_CACHE_TTL"] = "0"
+os.environ["HOTEL_IDS_TTL"] = "0"
+
+from scripts.amadeus_stub import AmadeusStub
+from tools.amadeus_client import reset_client
+from tools.flight_api import search_flights
+from tools.hotel_api import search_hotels
+from tools.replay import DEFAULT_REPLAY_DIR
+
+QUERIES = [
+    ("flights", dict(origin="Delhi", destination="London", date_from="2030-01-10", date_to="2030-01-20")),
+    ("flights", dict(origin="NYC", destination="PAR", date_from="2030-02-01", nonstop_only=True, max_price=900)),
+    ("flights", dict(origin="Tokyo", destination="Sydney", date_from="2030-03-05", max_results=5)),
+    ("hotels", dict(city="Paris", checkin="2030-01-10", checkout="2030-01-12")),
+    ("hotels", dict(city="NYC", checkin="2030-05-10", checkout="2030-05-12", hotel_class="4-star", max_price=400)),
+]
+TOOLS = {"flights": search_flights, "hotels": search_hotels}
+
+
+def run_queries():
+    results, times = [], []
+    for tool, kwargs in QUERIES:
+        t0 = time.perf_counter()
+        results.append(TOOLS[tool](**kwargs))
+        times.append(time.perf_counter() - t0)
+    return results, times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("mode", choices=["record", "replay"])
+    ap.add_argument("--dir", default=str(DEFAULT_REPLAY_DIR))
+    ap.add_argument("--live", action="store_true", help="record against AMADEUS_BASE_URL instead of the stub")
+    ap.add_argument("--latency", type=float, default=0.0, help="simulated seconds per replayed response")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    os.environ["AMADEUS_REPLAY_MODE"] = args.mode
+    os.environ["AMADEUS_REPLAY_DIR"] = args.dir
+    os.environ["AMADEUS_REPLAY_LATENCY"] = str(args.latency)
+    expected_path = Path(args.dir) / "expected_results.json"
+
+    if args.mode == "record":
+        if args.live:
+            results, _ = run_queries()
+        else:
+            os.environ.setdefault("AMADEUS_CLIENT_ID", "stub")
+            os.environ.setdefault("AMADEUS_CLIENT_SECRET", "stub")
+            with AmadeusStub(latency=0.01) as stub:
+                os.environ["AMADEUS_BASE_URL"] = stub.url
+                reset_client()
+                results, _ = run_queries()
+                reset_client()
+        expected_path.parent.mkdir(parents=True, exist_ok=True)
+        expected_path.write_text(json.dumps(results))
+        pairs = sum(1 for _ in Path(args.dir).glob("*/*.json"))
+        print(f"recorded {pairs} request/response pairs for {len(QUERIES)} queries into {args.dir}")
+        return
+
+    expected = json.loads(expected_path.read_text())
+    per_query = [[] for _ in QUERIES]
+    for _ in range(args.runs):
+        reset_client()
+        results, times = run_queries()
+        assert results == expected, "replayed results differ from the recorded ones"
+        for i, t in enumerate(times):
+            per_query[i].append(t)
+    reset_client()
+    for (tool, kwargs), ts in zip(QUERIES, per_query):
+        print(f"  {tool:<8} {kwargs}: mean {1000 * statistics.fmean(ts):7.2f} ms")
+    print(f"replayed {args.runs} x {len(QUERIES)} queries offline; results identical to the recording")
+
+
+if __name__ == "__main__":
+    main()
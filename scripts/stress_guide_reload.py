@@ -0,0 +1,130 @@
+# Stress test for guide index hot reload: reader threads call retrieve_tips / retrieve_tips_batch
+# (hybrid mode, so every answer touches FAISS, BM25 and a city shard) while a writer publishes
+# new index versions with scripts/build_guide_index.py. Each version carries a different
+# "release marker" guide; the test fails (exit 1) if a query errors, one answer mixes two
+# versions, a thread ever sees an older version after a newer one, or the readers do not end
+# on the last version. Also compares query latency before and during the swaps (no cold-start
+# spike expected). Uses the local hashing embedder; run from the project root:
+#   python -m scripts.stress_guide_reload --readers 8 --swaps 10
+
+import argparse
+import contextlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+MARKER_RE = re.compile(r"release marker number (\d+)")
+QUERY = "testville release marker number"
+
+
+def write_marker(guides: str, n: int) -> None:
+    with open(os.path.join(guides, "Testville_release.md"), "w", encoding="utf-8") as f:
+        f.write(f"# Testville release notes\n\nThis is release marker number {n}.\n")
+
+
+def build(guides: str, root: str) -> None:
+    import scripts.build_guide_index as builder
+    argv, sys.argv = sys.argv, ["build_guide_index", "--guides", guides, "--out", root, "--embedder", "hashing"]
+    try:
+        builder.main()
+    finally:
+        sys.argv = argv
+
+
+def pct(values, p):
+    values = sorted(values)
+    return 1000 * values[min(len(values) - 1, int(p * len(values)))] if values else float("nan")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--swaps", type=int, default=10)
+    ap.add_argument("--interval", type=float, default=0.3, help="seconds between publishes")
+    ap.add_argument("--reload-interval", type=float, default=0.05)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="guide_reload_")
+    guides, root = os.path.join(tmp, "guides"), os.path.join(tmp, "index")
+    shutil.copytree("data/guides", guides)
+    os.environ.update(GUIDE_INDEX_DIR=root, GUIDE_RELOAD_INTERVAL=str(args.reload_interval), EMBED_CACHE_DIR="")
+
+    from tools import guide_api
+
+    errors, mixed, regressions = [], [], []
+    latencies = []  # (start time, seconds)
+    seen = set()
+    stop = threading.Event()
+
+    def reader(i: int):
+        last = -1
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                if i % 2:
+                    passages = [p for ps in guide_api.retrieve_tips_batch([QUERY, "Golden Pavilion"], k=3,
+                                                                          mode="hybrid").values() for p in ps]
+                else:
+                    passages = guide_api.retrieve_tips(QUERY, k=3, city="Testville", mode="hybrid")
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            latencies.append((t0, time.perf_counter() - t0))
+            markers = {int(m) for p in passages for m in MARKER_RE.findall(p)}
+            if len(markers) > 1:
+                mixed.append(sorted(markers))
+            if markers:
+                n = markers.pop()
+                seen.add(n)
+                if n < last:
+                    regressions.append((last, n))
+                last = max(last, n)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        write_marker(guides, 0)
+        build(guides, root)
+        guide_api.warmup()
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        for t in threads:
+            t.start()
+        time.sleep(1.0)  # steady-state latency before the first swap
+        swaps_from = time.perf_counter()
+        for n in range(1, args.swaps + 1):
+            write_marker(guides, n)
+            build(guides, root)
+            time.sleep(args.interval)
+        deadline = time.time() + 10
+        final = guide_api.resolve_index_dir()[1]
+        while guide_api.current_index().version != final and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)  # let every reader answer from the final version
+        stop.set()
+        for t in threads:
+            t.join()
+        last_answer = guide_api.retrieve_tips(QUERY, k=1, city="Testville", mode="lexical")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    before = [d for t0, d in latencies if t0 < swaps_from]
+    during = [d for t0, d in latencies if t0 >= swaps_from]
+    ended_on_last = bool(last_answer) and MARKER_RE.findall(last_answer[0]) == [str(args.swaps)]
+    print(f"{len(latencies)} queries from {args.readers} threads across {args.swaps} published versions; "
+          f"versions seen by readers: {len(seen)}/{args.swaps + 1}")
+    print(f"latency before swaps  p50 {pct(before, .5):7.2f} ms  p99 {pct(before, .99):7.2f} ms  "
+          f"max {1000 * max(before, default=0):7.2f} ms")
+    print(f"latency during swaps  p50 {pct(during, .5):7.2f} ms  p99 {pct(during, .99):7.2f} ms  "
+          f"max {1000 * max(during, default=0):7.2f} ms")
+    print(f"errors {len(errors)}, mixed-version answers {len(mixed)}, version regressions {len(regressions)}, "
+          f"ended on the last version: {ended_on_last}")
+    for e in errors[:5]:
+        print("  error:", e)
+    ok = not errors and not mixed and not regressions and ended_on_last
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,221 @@
 
 
 # store/redis_store.py
+# Preferences live in one Redis hash per thread, <namespace>:<thread_id>, field = preference name:
+# loading a thread is one HGETALL and saving is one HSET of the changed fields, with no KEYS
+# scan and no GET per key. The old layout (one string key per preference,
+# <namespace>:<thread_id>:<key>) is moved by migrate_all(), one SCAN pass over the keyspace that
+# then sets <namespace>:__layout__ = "hash". Deploy step: run python -m store.redis_store
+# [namespace] before starting workers. Otherwise each process runs migrate_all() once, on first
+# use, unless the flag is already set; no request ever walks the keyspace for a single thread.
+# Sync and async (redis.asyncio: aget/aput/alist/abatch) clients draw from bounded connection
+# pools shared by every store on the same URL, with REDIS_TIMEOUT applied to connecting, to
+# waiting for a free connection and to each call. The one-off migration is not a call: async
+# callers await it in its worker thread under REDIS_MIGRATE_TIMEOUT instead.
+import asyncio
 import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import weakref
 import redis
+import redis.asyncio as aioredis
 from langgraph.store.base import BaseStore
 
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))  # per process (and per event loop)
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "2.0"))  # seconds
+REDIS_MIGRATE_TIMEOUT = float(os.getenv("REDIS_MIGRATE_TIMEOUT", "300"))  # seconds an async caller waits for it
+
+# the once-per-process migration runs here, so async callers can wait on it without blocking the loop
+_MIGRATOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="redis-migrate")
+
+_POOLS: dict = {}
+_POOLS_LOCK = threading.Lock()
+# redis.asyncio connections are bound to the event loop that opened them, so keep pools per loop
+_ASYNC_POOLS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+def _pool_kwargs() -> dict:
+    return {"max_connections": REDIS_MAX_CONNECTIONS, "timeout": REDIS_TIMEOUT,
+            "socket_timeout": REDIS_TIMEOUT, "socket_connect_timeout": REDIS_TIMEOUT}
+
+def get_pool(url: str) -> redis.BlockingConnectionPool:
+    """Process-wide bounded pool for `url`; callers wait up to REDIS_TIMEOUT for a free connection."""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(url)
+        if pool is None:
+            pool = _POOLS[url] = redis.BlockingConnectionPool.from_url(url, **_pool_kwargs())
+    return pool
+
+def get_async_pool(url: str) -> aioredis.BlockingConnectionPool:
+    """Bounded redis.asyncio pool for `url` on the running event loop (created on first use)."""
+    pools = _ASYNC_POOLS.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(url)
+    if pool is None:
+        pool = pools[url] = aioredis.BlockingConnectionPool.from_url(url, **_pool_kwargs())
+    return pool
+
+def glob_escape(s: str) -> str:
+    """Escape Redis glob metacharacters, so a namespace or thread id only matches itself."""
+    return re.sub(r"([*?\[\]\\])", r"\\\1", s)
+
 class RedisStore(BaseStore):
-    def __init__(self, url, namespace="default"):
-        self.client = redis.from_url(url)
+    SCAN_COUNT = 10_000  # keys per SCAN step while looking for old-layout keys
+    MIGRATED_FLAG = "__layout__"  # <namespace>:__layout__ = "hash" once migrate_all() has finished
+
+    def __init__(self, url, namespace="default", timeout: float = REDIS_TIMEOUT):
+        self.url = url
+        self.client = redis.Redis(connection_pool=get_pool(url))
+        self.timeout = timeout
         self.ns = namespace + ":"
+        self._all_migrated = False
+        self._migration: "Future | None" = None
+        self._migration_lock = threading.Lock()
 
     @classmethod
     def from_url(cls, url, namespace="default"):
         return cls(url, namespace)
 
-    def _key(self, thread_id, key):
-        return f"{self.ns}{thread_id}:{key}"
+    def _hash(self, thread_id):
+        return f"{self.ns}{thread_id}"
+
+    def aclient(self) -> aioredis.Redis:
+        """redis.asyncio client on the shared pool of the running event loop."""
+        return aioredis.Redis(connection_pool=get_async_pool(self.url))
+
+    # ---------- migration from string keys ----------
+    def _move_string_keys(self, keys) -> int:
+        """Move old string keys into their threads' hashes; fields already in a hash are newer and win."""
+        keys = [k.decode() if isinstance(k, bytes) else k for k in keys]
+        values = self.client.mget(keys) if keys else []
+        pipe = self.client.pipeline()  # MULTI/EXEC: readers never see a preference in both layouts
+        moved = 0
+        for k, v in zip(keys, values):
+            if v is None:  # deleted meanwhile, or not a string (another thread's hash matched the pattern)
+                continue
+            # a field may itself contain ':', so split once after the namespace, like the old list_keys
+            thread_id, _, field = k[len(self.ns):].partition(":")
+            pipe.hsetnx(self._hash(thread_id), field, v)
+            pipe.delete(k)
+            moved += 1
+        if moved:
+            pipe.execute()
+        return moved
+
+    def _migrate_if_needed(self) -> int:
+        if self.client.get(self.ns + self.MIGRATED_FLAG) == b"hash":
+            self._all_migrated = True
+            return 0
+        print(f"[RedisStore] {self.ns}{self.MIGRATED_FLAG} not set, migrating old string keys "
+              f"(run python -m store.redis_store at deploy to skip this)")
+        moved = self.migrate_all()
+        print(f"[RedisStore] migrated {moved} keys to per-thread hashes")
+        return moved
+
+    def migration(self) -> Future:
+        """The single in-process migration check/run; a failed one is retried by the next caller."""
+        with self._migration_lock:
+            if self._migration is None or (self._migration.done() and self._migration.exception()):
+                self._migration = _MIGRATOR.submit(self._migrate_if_needed)
+            return self._migration
+
+    def _ensure_migrated(self):
+        if not self._all_migrated:
+            self.migration().result()
 
+    def migrate_all(self) -> int:
+        """Move every old-layout key into per-thread hashes in one SCAN pass; returns the keys moved."""
+        moved, chunk = 0, []
+        # SCAN walks the keyspace in small steps instead of blocking the server like KEYS did
+        for k in self.client.scan_iter(match=f"{glob_escape(self.ns)}*:*", count=self.SCAN_COUNT):
+            chunk.append(k)
+            if len(chunk) >= self.SCAN_COUNT:
+                moved += self._move_string_keys(chunk)
+                chunk = []
+        moved += self._move_string_keys(chunk)
+        self.client.set(self.ns + self.MIGRATED_FLAG, "hash")
+        self._all_migrated = True
+        return moved
+
+    # ---------- preferences ----------
     def get(self, thread_id, key, default=None):
-        v = self.client.get(self._key(thread_id, key))
+        self._ensure_migrated()
+        v = self.client.hget(self._hash(thread_id), key)
         return v.decode() if v else default
 
+    def get_all(self, thread_id) -> dict:
+        """Every preference of a thread in one HGETALL."""
+        self._ensure_migrated()
+        return {k.decode(): v.decode() for k, v in self.client.hgetall(self._hash(thread_id)).items()}
+
     def put(self, thread_id, key, value):
         # store everything as strings
-        self.client.set(self._key(thread_id, key), str(value))
+        self._ensure_migrated()
+        self.client.hset(self._hash(thread_id), key, str(value))
 
     def delete(self, thread_id, key):
-        self.client.delete(self._key(thread_id, key))
+        self._ensure_migrated()
+        self.client.hdel(self._hash(thread_id), key)
 
     def list_keys(self, thread_id):
-        pattern = f"{self.ns}{thread_id}:*"
-        # returns full keys, so strip namespace/thread_id
-        return [k.decode().split(":", 2)[-1] for k in self.client.keys(pattern)]
+        self._ensure_migrated()
+        return [k.decode() for k in self.client.hkeys(self._hash(thread_id))]
 
     # ← implement these two to satisfy BaseStore’s abstract interface
     def batch(self, thread_id, mapping: dict):
         """
-        Synchronously write multiple key→value pairs at once.
+        Synchronously write multiple key→value pairs at once (a single HSET).
         """
-        pipeline = self.client.pipeline()
-        for k, v in mapping.items():
-            pipeline.set(self._key(thread_id, k), str(v))
-        pipeline.execute()
+        if not mapping:
+            return
+        self._ensure_migrated()
+        self.client.hset(self._hash(thread_id), mapping={k: str(v) for k, v in mapping.items()})
+
+    # ---------- async (redis.asyncio) ----------
+    async def _aensure_migrated(self):
+        """Await the once-per-process migration in its worker thread, under its own budget."""
+        if self._all_migrated:
+            return
+        try:
+            # shield: a caller giving up must not cancel the migration other callers are waiting on
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.migration())), REDIS_MIGRATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"[RedisStore] {self.ns}* migration still running after {REDIS_MIGRATE_TIMEOUT}s; "
+                               f"run python -m store.redis_store at deploy") from None
+
+    async def _arun(self, thread_id, op):
+        """op(client, hash_key) -> awaitable, bounded by self.timeout once the namespace is migrated."""
+        await self._aensure_migrated()
+        return await asyncio.wait_for(op(self.aclient(), self._hash(thread_id)), self.timeout)
+
+    async def aget(self, thread_id, key, default=None):
+        v = await self._arun(thread_id, lambda c, h: c.hget(h, key))
+        return v.decode() if v else default
+
+    async def aget_all(self, thread_id) -> dict:
+        """Every preference of a thread in one HGETALL, without blocking the event loop."""
+        raw = await self._arun(thread_id, lambda c, h: c.hgetall(h))
+        return {k.decode(): v.decode() for k, v in raw.items()}
+
+    async def aput(self, thread_id, key, value):
+        await self._arun(thread_id, lambda c, h: c.hset(h, key, str(value)))
+
+    async def adelete(self, thread_id, key):
+        await self._arun(thread_id, lambda c, h: c.hdel(h, key))
+
+    async def alist(self, thread_id):
+        return [k.decode() for k in await self._arun(thread_id, lambda c, h: c.hkeys(h))]
 
     async def abatch(self, thread_id, mapping: dict):
         """
-        Async version of batch(). For now, just run batch() in executor.
+        Async version of batch(): one HSET on redis.asyncio.
         """
-        # If you don’t use async, you can just call the sync version:
-        return self.batch(thread_id, mapping)
+        if not mapping:
+            return
+        mapping = {k: str(v) for k, v in mapping.items()}
+        await self._arun(thread_id, lambda c, h: c.hset(h, mapping=mapping))
+
+
+if __name__ == "__main__":
+    import sys
+    ns = sys.argv[1] if len(sys.argv) > 1 else "prefs"
+    print(f"[RedisStore] moved {RedisStore.from_url(os.environ['REDIS_URL'], namespace=ns).migrate_all()} keys")
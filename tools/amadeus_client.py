@@ -0,0 +1,307 @@
+# tools/amadeus_client.py
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+import requests
+
+from tools.replay import REPLAY_TOKEN, async_transport, http_adapter, replay_mode
+from tools.resilience import ResiliencePolicy
+
+DEFAULT_BASE_URL = "https://test.api.amadeus.com"
+TOKEN_PATH = "/v1/security/oauth2/token"
+
+# ---------- Token cache ----------
+class TokenCache:
+    """
+    Thread-safe OAuth token cache with single-flight refresh.
+
+    Only one caller fetches a new token when it expires; concurrent callers wait
+    for that fetch instead of each hitting the token endpoint. A daemon timer
+    refreshes the token `refresh_ahead` seconds before it stops being handed out,
+    so steady-state callers never wait on a refresh at all.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Tuple[str, float]],
+        expiry_margin: float = 60.0,
+        refresh_ahead: float = 60.0,
+        background: bool = True,
+    ):
+        self._fetch = fetch                  # () -> (access_token, expires_in_seconds)
+        self._expiry_margin = expiry_margin  # stop using a token this long before it really expires
+        self._refresh_ahead = refresh_ahead  # background refresh this long before that
+        self._background = background
+        self._cond = threading.Condition()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing = False
+        self._timer: Optional[threading.Timer] = None
+
+    def _valid(self, now: float) -> bool:
+        return bool(self._token) and now < self._expires_at
+
+    def peek(self) -> Optional[str]:
+        """Return the cached token if still valid, without ever blocking on a refresh."""
+        with self._cond:
+            return self._token if self._valid(time.time()) else None
+
+    def get(self) -> str:
+        with self._cond:
+            while not self._valid(time.time()):
+                if not self._refreshing:
+                    self._refreshing = True
+                    break
+                self._cond.wait()
+            else:
+                return self._token  # type: ignore[return-value]
+        return self._refresh()
+
+    def invalidate(self) -> None:
+        """Drop the cached token (e.g. after a 401) so the next get() refetches."""
+        with self._cond:
+            self._token = None
+            self._expires_at = 0.0
+
+    def close(self) -> None:
+        with self._cond:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _refresh(self) -> str:
+        # Caller owns the single-flight slot (self._refreshing is True).
+        try:
+            token, expires_in = self._fetch()
+        except BaseException:
+            with self._cond:
+                self._refreshing = False
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._token = token
+            self._expires_at = time.time() + float(expires_in) - self._expiry_margin
+            self._refreshing = False
+            self._cond.notify_all()
+            self._schedule(float(expires_in))
+        return token
+
+    def _schedule(self, expires_in: float) -> None:
+        if not self._background:
+            return
+        if self._timer:
+            self._timer.cancel()
+        delay = expires_in - self._expiry_margin - self._refresh_ahead
+        if delay <= 0:
+            return
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self) -> None:
+        with self._cond:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            self._refresh()
+        except Exception as e:
+            # Foreground callers will retry once the current token runs out.
+            print(f"[amadeus] background token refresh failed: {e}")
+
+
+# ---------- Pooled client ----------
+class AmadeusClient:
+    """
+    One keep-alive HTTP session plus one token cache, shared by every Amadeus tool.
+    Every call goes through `policy`: per-endpoint rate limits, retries with jittered
+    backoff (honouring Retry-After) on 429/5xx/connection errors, and a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        pool_maxsize: int = 20,
+        timeout: float = 20,
+        policy: Optional[ResiliencePolicy] = None,
+    ):
+        self.base_url = (base_url or os.getenv("AMADEUS_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        if policy is None:
+            # replayed answers are local and recorded once: pacing or retrying them only adds sleeps
+            policy = ResiliencePolicy.unlimited() if replay_mode() == "replay" else ResiliencePolicy.from_env()
+        self.policy = policy
+        self.session = requests.Session()
+        adapter = http_adapter(pool_maxsize)  # AMADEUS_REPLAY_MODE swaps in record/replay
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.tokens = TokenCache(self._fetch_token)
+
+    def _fetch_token(self) -> Tuple[str, float]:
+        cid = os.getenv("AMADEUS_CLIENT_ID")
+        cs  = os.getenv("AMADEUS_CLIENT_SECRET")
+        if (not cid or not cs) and replay_mode() == "replay":
+            cid = cs = REPLAY_TOKEN  # replayed token responses do not depend on credentials
+        if not cid or not cs:
+            raise ValueError("AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET must be set in environment variables.")
+        data = {"grant_type": "client_credentials", "client_id": cid, "client_secret": cs}
+        resp = self.send("POST", TOKEN_PATH, data=data)
+        resp.raise_for_status()
+        payload = resp.json()
+        return payload["access_token"], float(payload.get("expires_in", 1800))
+
+    def access_token(self) -> str:
+        return self.tokens.get()
+
+    def send(self, method: str, path: str, **kwargs) -> requests.Response:
+        """One logical request: rate-limited, retried per the policy, guarded by the breaker."""
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            wait = self.policy.before_attempt(path)
+            try:
+                if wait:
+                    time.sleep(wait)
+                resp = self.session.request(method, self.base_url + path, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self.policy.after_error(attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.policy.abandon_attempt()  # never leave the breaker's half-open trial slot taken
+                raise
+            else:
+                delay = self.policy.after_response(path, attempt, resp.status_code, resp.headers.get("Retry-After"))
+                if delay is None:
+                    return resp
+                resp.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        token: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """
+        GET an Amadeus endpoint (path like "/v1/reference-data/locations") over the pooled session.
+        Retries once with a fresh token on 401. Status handling is left to the caller.
+        """
+        for attempt in range(2):
+            headers = {"Authorization": f"Bearer {token or self.tokens.get()}"}
+            resp = self.send("GET", path, headers=headers, params=params, timeout=timeout or self.timeout)
+            if resp.status_code != 401 or attempt:
+                return resp
+            self.tokens.invalidate()
+            token = None
+        return resp
+
+    def close(self) -> None:
+        self.tokens.close()
+        self.session.close()
+
+
+class AsyncAmadeusClient:
+    """
+    httpx.AsyncClient counterpart of AmadeusClient for the async tool variants.
+    Shares the sync client's base URL and token cache, so both paths use one token.
+    """
+
+    def __init__(self, sync: AmadeusClient, max_connections: int = 20, timeout: float = 20):
+        self.base_url = sync.base_url
+        self.tokens = sync.tokens
+        self.policy = sync.policy  # one set of rate limits / breaker for both paths
+        self.timeout = timeout
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http = httpx.AsyncClient(limits=limits, timeout=timeout, transport=async_transport(limits))
+
+    async def access_token(self) -> str:
+        token = self.tokens.peek()
+        if token:
+            return token
+        # refresh is rare; run the blocking single-flight fetch off the event loop
+        return await asyncio.to_thread(self.tokens.get)
+
+    async def send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Async counterpart of AmadeusClient.send (same policy, asyncio.sleep instead of time.sleep)."""
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            wait = self.policy.before_attempt(path)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                resp = await self.http.request(method, self.base_url + path, **kwargs)
+            except httpx.TransportError:
+                delay = self.policy.after_error(attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.policy.abandon_attempt()  # e.g. CancelledError at asearch_hotels' deadline
+                raise
+            else:
+                delay = self.policy.after_response(path, attempt, resp.status_code, resp.headers.get("Retry-After"))
+                if delay is None:
+                    return resp
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        token: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """Async GET with the same 401-retry behaviour as AmadeusClient.get."""
+        for attempt in range(2):
+            headers = {"Authorization": f"Bearer {token or await self.access_token()}"}
+            resp = await self.send("GET", path, headers=headers, params=params, timeout=timeout or self.timeout)
+            if resp.status_code != 401 or attempt:
+                return resp
+            self.tokens.invalidate()
+            token = None
+        return resp
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+
+_CLIENT: Optional[AmadeusClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client() -> AmadeusClient:
+    """Process-wide shared client (created on first use)."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = AmadeusClient()
+    return _CLIENT
+
+# httpx pools are bound to the event loop that created them, so keep one per loop
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncAmadeusClient]" = weakref.WeakKeyDictionary()
+
+def get_async_client() -> AsyncAmadeusClient:
+    """Shared async client for the running event loop (created on first use)."""
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = _ASYNC_CLIENTS[loop] = AsyncAmadeusClient(get_client())
+    return client
+
+def reset_client() -> None:
+    """Close and drop the shared clients (tests/benchmarks that change AMADEUS_BASE_URL)."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+        _CLIENT = None
+        _ASYNC_CLIENTS.clear()
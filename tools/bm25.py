@@ -0,0 +1,99 @@
+# tools/bm25.py
+# In-process BM25 inverted index over the guide passages, built next to the FAISS index by
+# scripts/build_guide_index.py. Answers keyword-heavy queries (a museum, a street, a market)
+# with no embedding call, and feeds the lexical half of retrieve_tips' hybrid mode.
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+BM25_FILE = "bm25.json"
+
+_WORD_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what "
+    "where which with you your i me my we our".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, accent-folded word tokens without stopwords ('Musée d’Orsay' -> ['musee', 'd', 'orsay'])."""
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return [t for t in _WORD_RE.findall(folded) if t not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of passages; postings are term -> [(doc, term frequency), ...]."""
+
+    def __init__(self, ids: List[str], texts: List[str], cities: List[str], doc_len: List[int],
+                 postings: Dict[str, List[Tuple[int, int]]], k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.texts = texts
+        self.cities = cities
+        self.doc_len = doc_len
+        self.postings = postings
+        self.k1 = k1
+        self.b = b
+        n = len(ids)
+        self.avgdl = (sum(doc_len) / n) if n else 0.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in postings.items()}
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """docs: (id, text, city) triples."""
+        ids, texts, cities, doc_len = [], [], [], []
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for i, (doc_id, text, city) in enumerate(docs):
+            tokens = tokenize(text)
+            ids.append(doc_id)
+            texts.append(text)
+            cities.append(city)
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((i, tf))
+        return cls(ids, texts, cities, doc_len, dict(postings), k1, b)
+
+    def search(self, query: str, k: int = 5, cities: Optional[Sequence[str]] = None) -> List[Tuple[int, float]]:
+        """Top-k (doc index, score) for `query`, optionally only among docs whose city is in `cities`."""
+        allowed = set(cities) if cities else None
+        scores: Dict[int, float] = defaultdict(float)
+        k1, b, avgdl = self.k1, self.b, self.avgdl or 1.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc, tf in postings:
+                if allowed is not None and self.cities[doc] not in allowed:
+                    continue
+                norm = k1 * (1 - b + b * self.doc_len[doc] / avgdl)
+                scores[doc] += idf * tf * (k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+
+    def save(self, index_dir: str) -> None:
+        payload = {"k1": self.k1, "b": self.b, "ids": self.ids, "texts": self.texts, "cities": self.cities,
+                   "doc_len": self.doc_len, "postings": self.postings}
+        tmp = os.path.join(index_dir, BM25_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, os.path.join(index_dir, BM25_FILE))
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["BM25Index"]:
+        try:
+            with open(os.path.join(index_dir, BM25_FILE), encoding="utf-8") as f:
+                p = json.load(f)
+        except FileNotFoundError:
+            return None
+        postings = {t: [tuple(x) for x in ps] for t, ps in p["postings"].items()}
+        return cls(p["ids"], p["texts"], p["cities"], p["doc_len"], postings, p["k1"], p["b"])
+
+def rrf_fuse(rankings: Sequence[Sequence[str]], k: int, c: int = 60) -> List[str]:
+    """Reciprocal-rank fusion: each ranked list adds 1 / (c + rank) to an item's score."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (c + rank + 1)
+    return [key for key, _ in sorted(scores.items(), key=lambda kv: -kv[1])[:k]]
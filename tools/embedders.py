@@ -0,0 +1,83 @@
+# tools/embedders.py
+# Pluggable embedding backends for the guide index. A backend is named by an identity string,
+#   "openai:<model>"   OpenAIEmbeddings (remote; the original backend)
+#   "hashing:<dim>"    HashingEmbeddings (local, NumPy only, no network)
+# which the index builder stores in the index manifest. guide_api rebuilds the embedder from
+# that stored identity, so queries are always embedded the same way the index was.
+import zlib
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools.bm25 import tokenize
+
+DEFAULT_EMBEDDER = "openai"
+DEFAULT_OPENAI_MODEL = "text-embedding-ada-002"  # what OpenAIEmbeddings() used when the first index was built
+DEFAULT_HASHING_DIM = 512
+
+class HashingEmbeddings(Embeddings):
+    """
+    Feature-hashed unigrams + bigrams with signed buckets, sublinear term frequency and L2
+    normalisation. Stateless (nothing to fit or ship besides `dim`) and vectorised per batch:
+    tokens are hashed with crc32, then one np.bincount fills the whole batch matrix.
+    """
+
+    local = True
+
+    def __init__(self, dim: int = DEFAULT_HASHING_DIM):
+        self.dim = int(dim)
+        self.identity = f"hashing:{self.dim}"
+
+    def _features(self, text: str) -> List[int]:
+        tokens = tokenize(text)
+        feats = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(f.encode()) for f in feats]
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """float32 matrix of shape (len(texts), dim)."""
+        hashes = [self._features(t) for t in texts]
+        rows = np.repeat(np.arange(len(texts)), [len(h) for h in hashes])
+        h = np.fromiter((x for hs in hashes for x in hs), dtype=np.uint64, count=len(rows))
+        cols = (h % self.dim).astype(np.int64)
+        signs = np.where((h >> np.uint64(31)) & np.uint64(1), -1.0, 1.0)
+        flat = np.bincount(rows * self.dim + cols, weights=signs, minlength=len(texts) * self.dim)
+        m = flat.reshape(len(texts), self.dim)
+        m = np.sign(m) * np.log1p(np.abs(m))
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        return (m / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_batch(texts).tolist() if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0].tolist()
+
+def normalize_identity(spec: Optional[str] = None) -> str:
+    """Canonical identity for a spec: 'openai' -> 'openai:text-embedding-ada-002', 'hashing' -> 'hashing:512'."""
+    name, _, arg = (spec or DEFAULT_EMBEDDER).strip().partition(":")
+    if name == "hashing":
+        return f"hashing:{int(arg) if arg else DEFAULT_HASHING_DIM}"
+    if name == "openai":
+        return f"openai:{arg or DEFAULT_OPENAI_MODEL}"
+    if not arg and name.startswith("text-embedding"):
+        return f"openai:{name}"  # manifests written before this module stored the bare OpenAI model name
+    raise ValueError(f"unknown embedder {spec!r}; expected 'openai[:model]' or 'hashing[:dim]'")
+
+def make_embedder(spec: Optional[str] = None) -> Embeddings:
+    """Embedder for an identity/spec string ("openai", "openai:<model>", "hashing", "hashing:<dim>")."""
+    name, _, arg = normalize_identity(spec).partition(":")
+    if name == "hashing":
+        return HashingEmbeddings(int(arg))
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=arg)
+
+def embedder_identity(embedder: Embeddings) -> str:
+    """The identity string stored with an index built by `embedder`."""
+    identity = getattr(embedder, "identity", None)
+    if identity:
+        return identity
+    model = getattr(embedder, "model", None)
+    if model:
+        return f"openai:{model}"
+    raise ValueError(f"cannot identify embedder {type(embedder).__name__}")
@@ -0,0 +1,169 @@
+# tools/embedding_cache.py
+# Query-embedding cache for retrieve_tips: an in-memory LRU in front of an optional on-disk
+# store shared by every process on the box. The disk store is, per embedding model, one
+# append-only float32 matrix (read through np.memmap) plus an append-only key index.
+import fcntl
+import json
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: case- and whitespace-insensitive."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def _model_slug(model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model) or "default"
+
+class _DiskVectors:
+    """<dir>/<model>.f32 holds rows of `dim` float32s; <dir>/<model>.keys holds one JSON [key, row] per line."""
+
+    def __init__(self, root: Path, model: str):
+        root.mkdir(parents=True, exist_ok=True)
+        slug = _model_slug(model)
+        self.vec_path = root / f"{slug}.f32"
+        self.key_path = root / f"{slug}.keys"
+        self.lock_path = root / f"{slug}.lock"
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._keys_read = 0       # bytes of the key index already loaded
+        self._mmap: Optional[np.memmap] = None
+
+    def _refresh(self) -> None:
+        """Pick up keys appended since the last look (possibly by other processes)."""
+        try:
+            size = self.key_path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= self._keys_read:
+            return
+        with open(self.key_path, "rb") as f:
+            f.seek(self._keys_read)
+            chunk = f.read(size - self._keys_read)
+        complete = chunk[:chunk.rfind(b"\n") + 1]  # ignore a line still being written
+        for line in complete.splitlines():
+            key, row, dim = json.loads(line)
+            self._rows[key] = row
+            self.dim = dim
+        self._keys_read += len(complete)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            self._refresh()
+            row = self._rows.get(key)
+            if row is None:
+                return None
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            rows = os.path.getsize(self.vec_path) // (4 * self.dim)
+            self._mmap = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return np.array(self._mmap[row])
+
+    def put(self, key: str, vec: np.ndarray) -> None:
+        vec = np.ascontiguousarray(vec, dtype=np.float32)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # one appender at a time across processes
+            try:
+                self._refresh()
+                if key in self._rows:
+                    return
+                if self.dim is not None and vec.shape[0] != self.dim:
+                    raise ValueError(f"embedding dim {vec.shape[0]} != stored dim {self.dim}")
+                with open(self.vec_path, "ab") as f:
+                    row = f.tell() // (4 * vec.shape[0])
+                    f.write(vec.tobytes())
+                # vector first, then its index line: readers never see a key without its row
+                line = json.dumps([key, row, int(vec.shape[0])]) + "\n"
+                with open(self.key_path, "ab") as f:
+                    f.write(line.encode())
+                self._refresh()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+class EmbeddingCache:
+    """LRU of query vectors for one embedding model, optionally backed by a _DiskVectors store."""
+
+    def __init__(self, model: str, maxsize: int = 1024, path: Optional[str] = None):
+        self.model = model
+        self.maxsize = maxsize
+        self.stats: Counter = Counter()
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk = _DiskVectors(Path(path), model) if path else None
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = normalize_query(text)
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vec
+            if self._disk is not None:
+                vec = self._disk.get(key)
+                if vec is not None:
+                    self._remember(key, vec)
+                    self.stats["disk_hits"] += 1
+                    return vec
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, text: str, vec) -> None:
+        key = normalize_query(text)
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vec)
+            if self._disk is not None:
+                try:
+                    self._disk.put(key, vec)
+                except OSError as e:
+                    print(f"[embedding_cache] disk write failed: {e}")
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            s = dict(self.stats)
+            s["entries"] = len(self._lru)
+        hits = s.get("memory_hits", 0) + s.get("disk_hits", 0)
+        total = hits + s.get("misses", 0)
+        s["hit_rate"] = round(hits / total, 4) if total else 0.0
+        return s
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wraps an Embeddings model so embed_query goes through an EmbeddingCache; documents pass through."""
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """embed_query for several texts; the cache misses go out as one embed_documents request."""
+        vecs = [self.cache.get(t) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vecs) if v is None))
+        if missing:
+            fresh = dict(zip(missing, np.asarray(self.inner.embed_documents(missing), dtype=np.float32)))
+            for t, v in fresh.items():
+                self.cache.put(t, v)
+            vecs = [fresh[t] if v is None else v for t, v in zip(texts, vecs)]
+        return [v.tolist() for v in vecs]
+
+    def embed_query(self, text: str) -> List[float]:
+        vec = self.cache.get(text)
+        if vec is None:
+            vec = np.asarray(self.inner.embed_query(text), dtype=np.float32)
+            self.cache.put(text, vec)
+        return vec.tolist()
@@ -1,40 +1,51 @@
 # tools/flight_api.py
+import asyncio
 import os
-import time
-import requests
-from typing import List, Dict, Any, Optional, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional, Iterable, Tuple
 
 try:
     from dotenv import load_dotenv
 except ImportError:
     load_dotenv = None
 
-# ---------- Amadeus token cache ----------
-_TOKEN: Dict[str, Any] = {"access_token": None, "expires_at": 0.0}
+from tools.amadeus_client import get_async_client, get_client
+from tools.flight_cache import OfferFilters, OfferKey, flight_offer_cache, offer_key
+from tools.location_cache import CITY_OR_AIRPORT, get_location_cache
+from tools.models import FlightOffer, Segment, TopK, num
 
+# ---------- Amadeus token ----------
 def get_amadeus_access_token() -> str:
     """
-    Get (and cache) an Amadeus OAuth token. Reuses it until expiry.
+    Get the shared, cached Amadeus OAuth token (see tools/amadeus_client.py).
     Requires AMADEUS_CLIENT_ID / AMADEUS_CLIENT_SECRET in the environment.
     """
-    now = time.time()
-    if _TOKEN["access_token"] and now < _TOKEN["expires_at"]:
-        return _TOKEN["access_token"]
-
-    cid = os.getenv("AMADEUS_CLIENT_ID")
-    cs  = os.getenv("AMADEUS_CLIENT_SECRET")
-    if not cid or not cs:
-        raise ValueError("AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET must be set in environment variables.")
-    url = "https://test.api.amadeus.com/v1/security/oauth2/token"
-    data = {"grant_type": "client_credentials", "client_id": cid, "client_secret": cs}
-    resp = requests.post(url, data=data, timeout=20)
-    resp.raise_for_status()
-    payload = resp.json()
-    _TOKEN["access_token"] = payload["access_token"]
-    _TOKEN["expires_at"]   = now + float(payload.get("expires_in", 1800)) - 60  # refresh a minute early
-    return _TOKEN["access_token"]
+    return get_client().access_token()
+
+async def aget_amadeus_access_token() -> str:
+    return await get_async_client().access_token()
 
 # ---------- Helpers ----------
+LOCATIONS_PATH = "/v1/reference-data/locations"
+FLIGHT_OFFERS_PATH = "/v2/shopping/flight-offers"
+
+def _cached_loc_code(term: str) -> Optional[str]:
+    """IATA code for `term` without a network call (literal code or cache hit), else None."""
+    t = term.strip().upper()
+    if len(t) == 3 and t.isalpha():
+        return t  # already code
+    return get_location_cache().lookup(CITY_OR_AIRPORT, term)
+
+def _loc_code_from(term: str, payload: Dict[str, Any]) -> Optional[str]:
+    data = payload.get("data", [])
+    if not data:
+        return None
+    code = data[0].get("iataCode")
+    if code:
+        get_location_cache().store(CITY_OR_AIRPORT, term, code)
+    return code
+
 def resolve_loc_code(term: str, token: str) -> Optional[str]:
     """
     Accepts a city/airport NAME (e.g., 'New York', 'JFK') or CODE ('NYC', 'JFK').
@@ -42,42 +53,130 @@ def resolve_loc_code(term: str, token: str) -> Optional[str]:
     """
     if not term:
         return None
-    t = term.strip().upper()
-    if len(t) == 3 and t.isalpha():
-        return t  # already code
-    url = "https://test.api.amadeus.com/v1/reference-data/locations"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"subType": "CITY,AIRPORT", "keyword": term}
-    r = requests.get(url, headers=headers, params=params, timeout=20)
+    code = _cached_loc_code(term)
+    if code:
+        return code
+    params = {"subType": CITY_OR_AIRPORT, "keyword": term}
+    r = get_client().get(LOCATIONS_PATH, params=params, token=token)
     r.raise_for_status()
-    data = r.json().get("data", [])
-    if not data:
-        return None
-    return data[0].get("iataCode")
+    return _loc_code_from(term, r.json())
 
-def _num(x) -> Optional[float]:
-    try:
-        return float(x)
-    except Exception:
+async def aresolve_loc_code(term: str, token: str) -> Optional[str]:
+    """Async variant of resolve_loc_code."""
+    if not term:
         return None
+    code = _cached_loc_code(term)
+    if code:
+        return code
+    params = {"subType": CITY_OR_AIRPORT, "keyword": term}
+    r = await get_async_client().get(LOCATIONS_PATH, params=params, token=token)
+    r.raise_for_status()
+    return _loc_code_from(term, r.json())
+
+def _flight_params(
+    orig: str,
+    dest: str,
+    date_from: str,
+    date_to: Optional[str],
+    nonstop_only: bool,
+    cabin: Optional[str],
+    max_price: Optional[float],
+    preferred_carriers: Optional[Iterable[str]],
+    adults: int,
+    currency: str,
+    max_results: int,
+) -> Dict[str, Any]:
+    params = {
+        "originLocationCode": orig,
+        "destinationLocationCode": dest,
+        "departureDate": date_from,
+        "adults": adults,
+        "currencyCode": currency,
+        "max": max_results,
+    }
+    if date_to:
+        params["returnDate"] = date_to
+    if nonstop_only:
+        params["nonStop"] = "true"
+    if cabin:
+        params["travelClass"] = cabin.upper()
+    if max_price is not None:
+        # Amadeus supports maxPrice as query param
+        params["maxPrice"] = int(max_price)
+    if preferred_carriers:
+        # params["includedCarriers"] = ",".join([c.upper() for c in preferred_carriers])
+        params["includedAirlineCodes"] = ",".join([c.upper() for c in preferred_carriers])
+
+    return params
+
+def _parse_flight_offers(payload: Dict[str, Any], want: Optional[OfferFilters] = None,
+                         k: Optional[int] = None) -> List[FlightOffer]:
+    """
+    Parse offers into FlightOffer models, cheapest first. Filters in `want` are applied
+    per offer as it is read (price before anything else), and only the `k` cheapest
+    are kept, so rejected offers never get their segments built.
+    """
+    carriers = (payload.get("dictionaries", {}) or {}).get("carriers", {}) or {}
+    data = payload.get("data", []) or []
+    max_price = want.max_price if want else None
+    top: TopK[FlightOffer] = TopK(k or len(data))
+
+    for offer in data:
+        price = offer.get("price", {}) or {}
+        price_str = price.get("total")
+        price_num = num(price_str)
+        if max_price is not None and (price_num is None or price_num > max_price):
+            continue
+        if not top.would_accept(price_num):
+            continue
+        its = offer.get("itineraries", []) or []
+        outbound = tuple(Segment.parse(seg, carriers) for seg in (its[0].get("segments", []) or [])) if its else ()
+        inbound = tuple(Segment.parse(seg, carriers) for seg in (its[1].get("segments", []) or [])) if len(its) >= 2 else ()
+        fo = FlightOffer(price_str, price_num, price.get("currency"), outbound, inbound, len(its) < 2)
+        if want and not want.matches(fo):
+            continue
+        top.push(price_num, fo)
+
+    return top.sorted()
+
+def _key_params(key: OfferKey, f: OfferFilters) -> Dict[str, Any]:
+    orig, dest, date_from, date_to, cabin, adults, currency = key
+    return _flight_params(orig, dest, date_from, date_to, f.nonstop_only, cabin, f.max_price,
+                          sorted(f.carriers) if f.carriers else None, adults, currency, f.max_results)
+
+def _check_offers(resp, f: OfferFilters) -> List[FlightOffer]:
+    if resp.status_code == 400:
+        print("Amadeus API error:", resp.text)
+    resp.raise_for_status()
+    return _parse_flight_offers(resp.json(), want=f, k=f.max_results)
 
-def _flatten_segments(itinerary: Dict[str, Any], carriers: Dict[str, str]) -> List[Dict[str, Any]]:
-    segs_out: List[Dict[str, Any]] = []
-    for seg in itinerary.get("segments", []) or []:
-        dep = seg.get("departure", {}) or {}
-        arr = seg.get("arrival", {}) or {}
-        code = seg.get("carrierCode")
-        segs_out.append({
-            "from": dep.get("iataCode"),
-            "to":   arr.get("iataCode"),
-            "dep_time": dep.get("at"),
-            "arr_time": arr.get("at"),
-            "carrier": carriers.get(code, code),
-            "carrierCode": code,
-            "number": seg.get("number"),
-            "duration": seg.get("duration"),
-        })
-    return segs_out
+def _fetch_offers(key: OfferKey, f: OfferFilters, token: Optional[str] = None) -> List[FlightOffer]:
+    """Flight-offers call for resolved codes; stores the result in the offer cache."""
+    resp = get_client().get(FLIGHT_OFFERS_PATH, params=_key_params(key, f), token=token, timeout=30)
+    offers = _check_offers(resp, f)
+    flight_offer_cache.put(key, f, offers)
+    return offers
+
+async def _afetch_offers(key: OfferKey, f: OfferFilters, token: Optional[str] = None) -> List[FlightOffer]:
+    resp = await get_async_client().get(FLIGHT_OFFERS_PATH, params=_key_params(key, f), token=token, timeout=30)
+    offers = _check_offers(resp, f)
+    flight_offer_cache.put(key, f, offers)
+    return offers
+
+def _cached_offers(key: OfferKey, f: OfferFilters) -> Optional[List[FlightOffer]]:
+    # stale hits are re-fetched in the background with the cached entry's own filters
+    return flight_offer_cache.get(key, f, refresh=lambda stale_filters: _fetch_offers(key, stale_filters))
+
+def _offers(key: OfferKey, f: OfferFilters, token: Optional[str] = None) -> List[FlightOffer]:
+    cached = _cached_offers(key, f)
+    return cached if cached is not None else _fetch_offers(key, f, token)
+
+def fetch_offers(key: OfferKey, f: OfferFilters, token: Optional[str] = None) -> List[FlightOffer]:
+    """
+    Always-fresh flight-offers call for a resolved OfferKey (skips the cache read, refreshes the
+    cache). For pollers such as tools/price_watch.py that must see current prices.
+    """
+    return _fetch_offers(key, f, token)
 
 # ---------- Main tool ----------
 def search_flights(
@@ -132,66 +231,229 @@ def search_flights(
         print(f"[flight_api] Could not resolve codes: origin={origin!r}->{orig}, destination={destination!r}->{dest}")
         return []
 
-    url = "https://test.api.amadeus.com/v2/shopping/flight-offers"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {
-        "originLocationCode": orig,
-        "destinationLocationCode": dest,
-        "departureDate": date_from,
-        "adults": adults,
-        "currencyCode": currency,
-        "max": max_results,
-    }
-    if date_to:
-        params["returnDate"] = date_to
-    if nonstop_only:
-        params["nonStop"] = "true"
-    if cabin:
-        params["travelClass"] = cabin.upper()
-    if max_price is not None:
-        # Amadeus supports maxPrice as query param
-        params["maxPrice"] = int(max_price)
-    if preferred_carriers:
-        # params["includedCarriers"] = ",".join([c.upper() for c in preferred_carriers])
-        params["includedAirlineCodes"] = ",".join([c.upper() for c in preferred_carriers])
+    # Repeat and narrowed searches (lower max_price, nonstop_only, fewer carriers) come from the cache
+    key = offer_key(orig, dest, date_from, date_to, cabin, adults, currency)
+    want = OfferFilters.of(max_price, nonstop_only, preferred_carriers, max_results)
+    return [o.to_dict() for o in _offers(key, want, token)]
 
-    resp = requests.get(url, headers=headers, params=params, timeout=30)
-    if resp.status_code == 400:
-        print("Amadeus API error:", resp.text)
-    resp.raise_for_status()
-    payload = resp.json()
-    carriers = (payload.get("dictionaries", {}) or {}).get("carriers", {}) or {}
+async def asearch_flights(
+    origin: str,
+    destination: str,
+    date_from: str,
+    date_to: Optional[str] = None,
+    nonstop_only: bool = False,
+    cabin: Optional[str] = None,
+    max_price: Optional[float] = None,
+    preferred_carriers: Optional[Iterable[str]] = None,
+    adults: int = 1,
+    currency: str = "USD",
+    max_results: int = 10,
+) -> List[Dict[str, Any]]:
+    """Async variant of search_flights (same arguments and result) on the shared httpx pool."""
+    print(f"[flight_api] (async) origin={origin!r} dest={destination!r} "
+          f"date_from={date_from} date_to={date_to} nonstop={nonstop_only} "
+          f"cabin={cabin} max_price={max_price} carriers={preferred_carriers}")
 
-    out: List[Dict[str, Any]] = []
-    for offer in payload.get("data", []) or []:
-        price_str = (offer.get("price", {}) or {}).get("total")
-        price_num = _num(price_str)
-        its = offer.get("itineraries", []) or []
+    token = await aget_amadeus_access_token()
 
-        outbound_segments: List[Dict[str, Any]] = []
-        return_segments:  List[Dict[str, Any]] = []
+    orig, dest = await asyncio.gather(aresolve_loc_code(origin, token), aresolve_loc_code(destination, token))
+    if not orig or not dest:
+        print(f"[flight_api] Could not resolve codes: origin={origin!r}->{orig}, destination={destination!r}->{dest}")
+        return []
 
-        if len(its) >= 1:
-            outbound_segments = _flatten_segments(its[0], carriers)
-        if len(its) >= 2:
-            return_segments  = _flatten_segments(its[1], carriers)
+    key = offer_key(orig, dest, date_from, date_to, cabin, adults, currency)
+    want = OfferFilters.of(max_price, nonstop_only, preferred_carriers, max_results)
+    cached = _cached_offers(key, want)
+    offers = cached if cached is not None else await _afetch_offers(key, want, token)
+    return [o.to_dict() for o in offers]
 
-        out.append({
-            "price": price_str,
-            "price_num": price_num,
-            "currency": (offer.get("price", {}) or {}).get("currency"),
-            "one_way": len(its) < 2,
-            "outbound": outbound_segments,
-            "return": return_segments,
-            "stops_outbound": max(0, len(outbound_segments) - 1) if outbound_segments else 0,
-            "stops_return":  max(0, len(return_segments)  - 1) if return_segments else 0,
-        })
+# ---------- Flexible-date calendar ----------
+CALENDAR_WORKERS = int(os.getenv("CALENDAR_WORKERS", 4))
+CALENDAR_MAX_SEARCHES = int(os.getenv("CALENDAR_MAX_SEARCHES", 49))
 
-    # sort by numeric price if present
-    out.sort(key=lambda r: (r.get("price_num") is None, r.get("price_num", 0.0)))
+def _date_window(center: str, flex_days: int, not_before: date) -> List[str]:
+    c = datetime.fromisoformat(center).date()
+    days = (c + timedelta(days=d) for d in range(-max(0, flex_days), max(0, flex_days) + 1))
+    return [d.isoformat() for d in days if d >= not_before]
 
+def search_flight_calendar(
+    origin: str,
+    destination: str,
+    date_from: str,
+    flex_days: int = 3,
+    date_to: Optional[str] = None,
+    return_flex_days: int = 0,
+    nonstop_only: bool = False,
+    cabin: Optional[str] = None,
+    max_price: Optional[float] = None,
+    preferred_carriers: Optional[Iterable[str]] = None,
+    adults: int = 1,
+    currency: str = "USD",
+) -> Dict[str, Any]:
+    """
+    Find the cheapest day(s) to fly in ONE call, instead of calling search_flights once per date.
+
+    For agents:
+    - Use this for "cheapest day to fly", "flexible dates", "the week of ..." questions.
+    - Searches every departure date within date_from ± flex_days (past dates are skipped).
+    - For a round trip, pass date_to and optionally return_flex_days to also vary the return date.
+    - Same optional filters as search_flights (nonstop_only, cabin, max_price, preferred_carriers).
+
+    Returns:
+      {
+        "origin": "DEL", "destination": "BOM", "currency": "USD",
+        "prices": {"2025-10-20": 123.4, ...}                    # one-way: departure -> min price
+                  or {"2025-10-20": {"2025-10-25": 250.0, ...}}  # round trip: departure -> return -> min price
+        "best": {"2025-10-20": <offer>, ...}                    # cheapest offer per day ("dep/ret" keys for round trips)
+        "cheapest": {"date": "2025-10-22", "price": 98.0} or null,
+        "errors": {"2025-10-21": "..."}                         # only dates whose search failed
+        "error": "..."                                          # only if date_from/date_to is not YYYY-MM-DD
+      }
+    Offers have the same fields as search_flights results. Dates without offers map to null.
+    """
+    print(f"[flight_api] calendar origin={origin!r} dest={destination!r} date_from={date_from} "
+          f"flex_days={flex_days} date_to={date_to} return_flex_days={return_flex_days}")
+    try:
+        for d in filter(None, (date_from, date_to)):
+            datetime.fromisoformat(d)
+    except (TypeError, ValueError):
+        return {"origin": origin, "destination": destination, "currency": currency, "prices": {}, "best": {},
+                "cheapest": None,
+                "error": f"dates must be YYYY-MM-DD, got date_from={date_from!r} date_to={date_to!r}"}
+
+    token = get_amadeus_access_token()
+    orig = resolve_loc_code(origin, token)
+    dest = resolve_loc_code(destination, token)
+    if not orig or not dest:
+        print(f"[flight_api] Could not resolve codes: origin={origin!r}->{orig}, destination={destination!r}->{dest}")
+        return {"origin": orig, "destination": dest, "currency": currency, "prices": {}, "best": {}, "cheapest": None}
+
+    today = date.today()
+    departures = _date_window(date_from, flex_days, today)
+    returns = _date_window(date_to, return_flex_days, today) if date_to else [None]
+    pairs: List[Tuple[str, Optional[str]]] = [(d, r) for d in departures for r in returns if r is None or r >= d]
+    if len(pairs) > CALENDAR_MAX_SEARCHES:
+        print(f"[flight_api] calendar capped at {CALENDAR_MAX_SEARCHES} of {len(pairs)} date combinations")
+        pairs = pairs[:CALENDAR_MAX_SEARCHES]
+
+    # A handful of offers per date is enough to know the minimum and the best one
+    # (upstream pacing is the client's per-endpoint rate limit)
+    want = OfferFilters.of(max_price, nonstop_only, preferred_carriers, 5)
+
+    def one(pair: Tuple[str, Optional[str]]) -> List[FlightOffer]:
+        return _offers(offer_key(orig, dest, pair[0], pair[1], cabin, adults, currency), want, token)
+
+    prices: Dict[str, Any] = {}
+    best: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    cheapest: Optional[Dict[str, Any]] = None
+    with ThreadPoolExecutor(max_workers=max(1, min(CALENDAR_WORKERS, len(pairs)))) as pool:
+        futures = [(pair, pool.submit(one, pair)) for pair in pairs]
+        for (dep, ret), fut in futures:
+            label = f"{dep}/{ret}" if ret else dep
+            try:
+                offers = fut.result()
+            except Exception as e:
+                errors[label] = str(e)
+                continue
+            top = offers[0] if offers else None
+            price = top.price_num if top else None
+            if ret:
+                prices.setdefault(dep, {})[ret] = price
+            else:
+                prices[dep] = price
+            best[label] = top.to_dict() if top else None
+            if price is not None and (cheapest is None or price < cheapest["price"]):
+                cheapest = {"date": dep, "return_date": ret, "price": price} if ret else {"date": dep, "price": price}
+
+    out = {"origin": orig, "destination": dest, "currency": currency,
+           "prices": prices, "best": best, "cheapest": cheapest}
+    if errors:
+        out["errors"] = errors
     return out
 
+# ---------- Multi-route batch ----------
+BATCH_WORKERS = int(os.getenv("FLIGHT_BATCH_WORKERS", 4))
+_LEG_FIELDS = ("origin", "destination", "date_from", "date_to", "nonstop_only", "cabin", "max_price",
+               "preferred_carriers", "adults", "currency", "max_results")
+
+def _leg_label(leg: Dict[str, Any]) -> str:
+    label = f"{leg.get('origin')}->{leg.get('destination')} {leg.get('date_from')}"
+    return label + (f"/{leg['date_to']}" if leg.get("date_to") else "")
+
+def search_flights_batch(legs: List[Dict[str, Any]], max_results: int = 5) -> Dict[str, Any]:
+    """
+    Search several flight legs/routes in ONE call (multi-city trips, comparing origins, etc.).
+
+    For agents:
+    - legs: list of objects with the same fields as search_flights, e.g.
+        [{"origin": "DEL", "destination": "BOM", "date_from": "2025-10-20"},
+         {"origin": "BLR", "destination": "BOM", "date_from": "2025-10-20", "nonstop_only": true}]
+      origin, destination and date_from are required; names or IATA codes both work.
+    - max_results: offers per leg unless a leg sets its own.
+
+    Returns a dict keyed by leg label "ORIGIN->DESTINATION DATE[/RETURN]" (in request order):
+      {"DEL->BOM 2025-10-20": {"origin": "DEL", "destination": "BOM", "offers": [...]}, ...}
+    A leg that fails carries "error" instead of "offers". Offers match search_flights results.
+    """
+    print(f"[flight_api] batch of {len(legs)} legs")
+    token = get_amadeus_access_token()
+    out: Dict[str, Any] = {}
+    labels: List[str] = []
+    for leg in legs:
+        label = _leg_label(leg)
+        n = 2
+        while label in labels:  # same route/date with different filters
+            label = f"{_leg_label(leg)} #{n}"
+            n += 1
+        labels.append(label)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_WORKERS, len(legs)))) as pool:
+        # resolve every distinct place name once, concurrently
+        names = {leg.get(f) for leg in legs for f in ("origin", "destination") if leg.get(f)}
+        futures = {name: pool.submit(resolve_loc_code, name, token) for name in names}
+        codes: Dict[str, Optional[str]] = {}
+        for name, fut in futures.items():
+            try:
+                codes[name] = fut.result()
+            except Exception as e:
+                print(f"[flight_api] could not resolve {name!r}: {e}")
+                codes[name] = None
+
+        # identical legs (after resolution) are searched once
+        searches: Dict[Tuple[OfferKey, OfferFilters], Any] = {}
+        leg_search: Dict[str, Tuple[OfferKey, OfferFilters]] = {}
+        for label, leg in zip(labels, legs):
+            unknown = set(leg) - set(_LEG_FIELDS)
+            orig, dest = codes.get(leg.get("origin")), codes.get(leg.get("destination"))
+            if unknown or not orig or not dest or not leg.get("date_from"):
+                out[label] = {"origin": orig, "destination": dest,
+                              "error": f"unknown fields {sorted(unknown)}" if unknown
+                              else "origin, destination and date_from must be given and resolvable"}
+                continue
+            key = offer_key(orig, dest, leg["date_from"], leg.get("date_to"), leg.get("cabin"),
+                            leg.get("adults", 1), leg.get("currency", "USD"))
+            want = OfferFilters.of(leg.get("max_price"), leg.get("nonstop_only", False),
+                                   leg.get("preferred_carriers"), leg.get("max_results", max_results))
+            leg_search[label] = (key, want)
+            if (key, want) not in searches:
+                cached = _cached_offers(key, want)
+                searches[(key, want)] = cached if cached is not None else pool.submit(_fetch_offers, key, want, token)
+
+        for label in labels:
+            if label not in leg_search:
+                continue
+            key, want = leg_search[label]
+            res = searches[(key, want)]
+            entry: Dict[str, Any] = {"origin": key[0], "destination": key[1]}
+            try:
+                entry["offers"] = [o.to_dict() for o in (res.result() if hasattr(res, "result") else res)]
+            except Exception as e:
+                entry["error"] = str(e)
+            out[label] = entry
+
+    return {label: out[label] for label in labels}
+
 # Local test
 if __name__ == "__main__":
     if load_dotenv:
@@ -0,0 +1,190 @@
+# tools/flight_cache.py
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from tools.models import FlightOffer
+
+OfferKey = Tuple[str, str, str, Optional[str], Optional[str], int, str]
+
+def offer_key(orig: str, dest: str, date_from: str, date_to: Optional[str], cabin: Optional[str],
+              adults: int, currency: str) -> OfferKey:
+    """Normalized identity of a flight-offers search, excluding the narrowing filters."""
+    return (orig.upper(), dest.upper(), date_from, date_to or None, cabin.upper() if cabin else None,
+            int(adults), currency.upper())
+
+@dataclass(frozen=True)
+class OfferFilters:
+    """The filters a cached result was fetched with (or that a caller wants applied)."""
+    max_price: Optional[float] = None
+    nonstop_only: bool = False
+    carriers: Optional[FrozenSet[str]] = None
+    max_results: int = 10
+
+    @classmethod
+    def of(cls, max_price: Optional[float], nonstop_only: bool, carriers: Optional[Iterable[str]],
+           max_results: int) -> "OfferFilters":
+        return cls(
+            # the API only takes a whole-number maxPrice, so that is what a result honours
+            max_price=float(int(max_price)) if max_price is not None else None,
+            nonstop_only=bool(nonstop_only),
+            carriers=frozenset(c.upper() for c in carriers) if carriers else None,
+            max_results=int(max_results),
+        )
+
+    def covers(self, want: "OfferFilters") -> bool:
+        """True if every offer matching `want` would also have matched these filters."""
+        if self.max_price is not None and (want.max_price is None or want.max_price > self.max_price):
+            return False
+        if self.nonstop_only and not want.nonstop_only:
+            return False
+        if self.carriers is not None and (want.carriers is None or not want.carriers <= self.carriers):
+            return False
+        return True
+
+    def matches(self, offer: FlightOffer) -> bool:
+        if self.max_price is not None:
+            p = offer.price_num
+            if p is None or p > self.max_price:
+                return False
+        if self.nonstop_only and (offer.stops_outbound or offer.stops_return):
+            return False
+        if self.carriers is not None:
+            if any(c not in self.carriers for c in offer.carrier_codes()):
+                return False
+        return True
+
+@dataclass
+class _Entry:
+    filters: OfferFilters
+    offers: List[FlightOffer]
+    fetched_at: float
+
+    @property
+    def complete(self) -> bool:
+        # fewer rows than asked for means the upstream had nothing more to give
+        return len(self.offers) < self.filters.max_results
+
+class FlightOfferCache:
+    """
+    Short-TTL cache of parsed flight-offer lists with stale-while-revalidate.
+
+    Entries are keyed by offer_key(); each key keeps the few filter variants it was
+    fetched with. A lookup is answered from any entry whose filters cover the
+    requested ones (e.g. a lower max_price, nonstop_only, a subset of carriers),
+    filtering locally. Entries older than `ttl` but younger than `ttl + stale_ttl`
+    are still served while one background refresh per entry brings them up to date.
+    """
+
+    def __init__(self, ttl: float = 300, stale_ttl: float = 600, maxsize: int = 256, variants_per_key: int = 4):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.variants_per_key = variants_per_key
+        self.stats: Counter = Counter()
+        self._data: "OrderedDict[OfferKey, List[_Entry]]" = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+    def _answer(self, entry: _Entry, want: OfferFilters) -> Optional[List[FlightOffer]]:
+        if not entry.filters.covers(want):
+            return None
+        rows = entry.offers if entry.filters == want else [o for o in entry.offers if want.matches(o)]
+        # cached rows are the cheapest N for the broader query, so a filtered prefix is exact
+        # as long as it is long enough, the broader result was not truncated, or everything
+        # the upstream left out costs more than the requested max_price anyway
+        if entry.complete or len(rows) >= want.max_results:
+            return rows[:want.max_results]
+        last = entry.offers[-1].price_num if entry.offers else None
+        if want.max_price is not None and last is not None and last > want.max_price:
+            return rows
+        return None
+
+    def get(self, key: OfferKey, want: OfferFilters,
+            refresh: Optional[Callable[[OfferFilters], List[FlightOffer]]] = None) -> Optional[List[FlightOffer]]:
+        """
+        Cached offers for (key, want), or None on a miss. If the answer comes from a
+        stale entry and `refresh` is given, it is re-fetched in the background with
+        that entry's filters via refresh(entry_filters), which is expected to put() the result.
+        """
+        if self.ttl <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entries = self._data.get(key) or []
+            for entry in entries:
+                age = now - entry.fetched_at
+                if age >= self.ttl + self.stale_ttl:
+                    continue
+                rows = self._answer(entry, want)
+                if rows is None:
+                    continue
+                self._data.move_to_end(key)
+                self.stats["hits" if entry.filters == want else "narrowed_hits"] += 1
+                if age >= self.ttl:
+                    self.stats["stale_hits"] += 1
+                    if refresh is not None:
+                        self._revalidate(key, entry.filters, refresh)
+                return list(rows)
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: OfferKey, filters: OfferFilters, offers: List[FlightOffer]) -> None:
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [e for e in self._data.get(key, []) if e.filters != filters
+                       and now - e.fetched_at < self.ttl + self.stale_ttl]
+            entries.insert(0, _Entry(filters, list(offers), now))
+            self._data[key] = entries[:self.variants_per_key]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _revalidate(self, key: OfferKey, filters: OfferFilters, refresh: Callable) -> None:
+        # called with self._lock held
+        token = (key, filters)
+        if token in self._refreshing:
+            return
+        self._refreshing.add(token)
+
+        def run():
+            try:
+                refresh(filters)  # the fetch path stores its result via put()
+                with self._lock:
+                    self.stats["refreshes"] += 1
+            except Exception as e:
+                print(f"[flight_cache] background refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(token)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.stats.clear()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            s = dict(self.stats)
+            s["entries"] = len(self._data)
+        hits = s.get("hits", 0) + s.get("narrowed_hits", 0)
+        total = hits + s.get("misses", 0)
+        s["hit_rate"] = round(hits / total, 4) if total else 0.0
+        return s
+
+# FLIGHT_CACHE_TTL=0 turns caching off
+flight_offer_cache = FlightOfferCache(
+    ttl=float(os.getenv("FLIGHT_CACHE_TTL", 300)),
+    stale_ttl=float(os.getenv("FLIGHT_CACHE_STALE_TTL", 600)),
+    maxsize=int(os.getenv("FLIGHT_CACHE_SIZE", 256)),
+)
+
+def flight_cache_stats() -> Dict[str, float]:
+    return flight_offer_cache.snapshot()
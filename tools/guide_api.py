@@ -1,6 +1,10 @@
 # Reloading the vector index and Creating a RAG retrieval tool
 
+import json
 import os
+import re
+import threading
+import time
 from dotenv import load_dotenv
 # load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 
@@ -8,29 +12,352 @@ from dotenv import load_dotenv
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 load_dotenv(dotenv_path=env_path)
 
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+from tools.bm25 import BM25Index, rrf_fuse
+
+GUIDE_INDEX_DIR = os.getenv("GUIDE_INDEX_DIR", "data/guide_index")
+CITY_SHARDS_DIR = "cities"  # <index version>/cities/<city_slug>/, written by scripts/build_guide_index.py
+INDEX_MANIFEST = "manifest.json"  # build settings, including the embedder identity the index was built with
+# embedder for queries: "" = whatever the index was built with; set it to fail fast if that is not this one
+GUIDE_EMBEDDER = os.getenv("GUIDE_EMBEDDER", "")
+# query-time overrides for approximate indexes (the builder saves defaults with the index); 0 = keep those
+GUIDE_NPROBE = int(os.getenv("GUIDE_NPROBE", 0))
+GUIDE_EF_SEARCH = int(os.getenv("GUIDE_EF_SEARCH", 0))
+# default retrieve_tips mode: "dense" (FAISS), "lexical" (BM25, no embedding call) or "hybrid" (both, RRF-fused)
+GUIDE_SEARCH_MODE = os.getenv("GUIDE_SEARCH_MODE", "dense")
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+# query embeddings: in-memory LRU size, and a directory shared across processes ("" = memory only)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", 1024))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "data/embedding_cache")
 
 # # Reloading the vector store - This makes our index reusable across sessions or scripts.
 # _store = FAISS.load_local("data/guide_index", OpenAIEmbeddings())
 
-_store = FAISS.load_local("data/guide_index", OpenAIEmbeddings(), allow_dangerous_deserialization=True)
+# Versioned layout written by scripts/build_guide_index.py:
+#   <GUIDE_INDEX_DIR>/versions/<version>/   a complete index (store, city shards, bm25.json, manifest.json)
+#   <GUIDE_INDEX_DIR>/CURRENT               name of the live version, replaced atomically on publish
+# A directory without CURRENT is an unversioned index from before and is used as is.
+INDEX_CURRENT = "CURRENT"
+INDEX_VERSIONS_DIR = "versions"
+# how often (seconds) retrieve_tips checks CURRENT for a newer version; 0 = never reload
+GUIDE_RELOAD_INTERVAL = float(os.getenv("GUIDE_RELOAD_INTERVAL", 5))
 
-# Retriever Tool
-def retrieve_tips(query: str, k: int = 5) -> List[str]:
+def city_slug(city: str) -> str:
+    """'New York' -> 'new_york'; the directory name of a city's shard."""
+    return re.sub(r"[^a-z0-9]+", "_", city.lower()).strip("_")
+
+def resolve_index_dir(root: str = GUIDE_INDEX_DIR) -> Tuple[str, Optional[str]]:
+    """(directory of the live index, its version name or None for an unversioned index)."""
+    try:
+        with open(os.path.join(root, INDEX_CURRENT)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return root, None
+    return os.path.join(root, INDEX_VERSIONS_DIR, version), version
+
+def index_embedder(index_dir: str = GUIDE_INDEX_DIR) -> str:
+    """Identity of the embedder an index was built with ('openai:<model>' or 'hashing:<dim>')."""
+    from tools.embedders import normalize_identity
+    for name in ("store.json", INDEX_MANIFEST):  # tools.guide_store.STORE_FILE, then the builder's manifest
+        try:
+            with open(os.path.join(index_dir, name)) as f:
+                return normalize_identity(json.load(f)["model"])
+        except FileNotFoundError:
+            continue
+    return normalize_identity("openai")  # indexes from before the manifest were all OpenAI-embedded
+
+# identity -> embeddings object, shared by every index version built with it (and its query cache)
+_embedders: Dict[str, object] = {}
+_embedders_lock = threading.Lock()
+
+def _get_embeddings(index_dir: str):
+    from tools.embedders import make_embedder, normalize_identity
+
+    identity = index_embedder(index_dir)
+    if GUIDE_EMBEDDER and normalize_identity(GUIDE_EMBEDDER) != identity:
+        raise ValueError(f"GUIDE_EMBEDDER={GUIDE_EMBEDDER!r} but {index_dir} was built with {identity!r}; "
+                         f"rebuild it with scripts/build_guide_index.py --embedder {GUIDE_EMBEDDER}")
+    with _embedders_lock:
+        if identity not in _embedders:
+            inner = make_embedder(identity)
+            if getattr(inner, "local", False):
+                _embedders[identity] = inner  # computing it is cheaper than a cache lookup
+            else:
+                from tools.embedding_cache import CachedQueryEmbeddings, EmbeddingCache
+                # repeated queries ("hidden gems Paris") skip the embedding round trip
+                cache = EmbeddingCache(identity, maxsize=EMBED_CACHE_SIZE, path=EMBED_CACHE_DIR or None)
+                _embedders[identity] = CachedQueryEmbeddings(inner, cache)
+        return _embedders[identity]
+
+def _load_index(path: str, embeddings):
+    # heavy imports stay here too: faiss/langchain_community/openai add seconds to a cold import
+    from tools.guide_store import GuideStore, is_store
+    if is_store(path):
+        overrides = {k: v for k, v in (("nprobe", GUIDE_NPROBE), ("efSearch", GUIDE_EF_SEARCH)) if v}
+        store = GuideStore(path, embeddings, overrides)  # mmap: near-instant, pages shared with other workers
+    else:
+        from langchain_community.vectorstores import FAISS
+        print(f"[RAG] {path} is in the old pickle format; convert it with scripts/migrate_guide_index.py")
+        store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    dim = getattr(embeddings, "dim", None)
+    if dim is not None and store.index.d != dim:
+        raise ValueError(f"{path} holds {store.index.d}-d vectors but the query embedder makes {dim}-d ones")
+    return store
+
+class IndexVersion:
     """
-    Search the LOCAL travel guides (not the web). Return short passages with insider tips.
-    Always pass the city name if the user asks about a specific city (e.g., Paris, Kyoto).
-    Use this for hidden gems, dining, neighborhoods, and day-by-day planning.
+    One index version's stores, each loaded on first use. A query takes the live version once
+    and uses it throughout, so a swap never mixes two versions in one answer.
     """
 
+    def __init__(self, path: str, version: Optional[str] = None):
+        self.path = path
+        self.version = version
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._store = None
+        self._shards: Dict[str, object] = {}  # city slug -> shard store, or None if the city has no shard
+        self._lexical = None
+        self._lexical_loaded = False
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = _get_embeddings(self.path)
+        return self._embeddings
+
+    def store(self):
+        """The main vector store; concurrent first callers wait for one load."""
+        if self._store is None:
+            embeddings = self.embeddings
+            with self._lock:
+                if self._store is None:
+                    self._store = _load_index(self.path, embeddings)
+                    print(f"[RAG] loaded guide index from {self.path}")
+        return self._store
+
+    def city_store(self, city: str):
+        """The shard holding only `city`'s guides (loaded on first use), or None if there is none."""
+        slug = city_slug(city)
+        if slug not in self._shards:
+            embeddings = self.embeddings
+            with self._lock:
+                if slug not in self._shards:
+                    path = os.path.join(self.path, CITY_SHARDS_DIR, slug)
+                    self._shards[slug] = _load_index(path, embeddings) if os.path.isdir(path) else None
+        return self._shards[slug]
+
+    def lexical(self):
+        """The BM25 index written next to the FAISS one, or None for an index built without it."""
+        if not self._lexical_loaded:
+            with self._lock:
+                if not self._lexical_loaded:
+                    self._lexical = BM25Index.load(self.path)
+                    self._lexical_loaded = True
+        return self._lexical
+
+    def warm(self) -> None:
+        """Load everything a query could touch, so the first queries after a swap pay no load."""
+        self.store()
+        self.lexical()
+        shards = os.path.join(self.path, CITY_SHARDS_DIR)
+        for slug in (sorted(os.listdir(shards)) if os.path.isdir(shards) else []):
+            self.city_store(slug)
+
+# Loaded on first use (or by warmup()), so importing this module (e.g. via graph2) neither
+# reads the index nor needs an OpenAI key.
+_live: Optional[IndexVersion] = None
+_live_lock = threading.Lock()
+_reloader: Optional[threading.Thread] = None
+_checked_at = 0.0
+_failed_version: Optional[str] = None  # not retried until CURRENT names another version
+
+def _swap(path: str, version: Optional[str]) -> None:
+    # runs in the background: the old version keeps answering until the new one is fully loaded
+    global _live, _failed_version
+    try:
+        fresh = IndexVersion(path, version)
+        fresh.warm()
+    except Exception as e:  # a broken publish must not take down the live index
+        _failed_version = version
+        print(f"[RAG] could not load guide index version {version}: {e!r}; keeping {_live.version}")
+        return
+    with _live_lock:
+        old, _live = _live, fresh
+    print(f"[RAG] guide index {old.version if old else None} -> {version}")
+
+def reload_index(wait: bool = False) -> None:
+    """Check CURRENT now and, if it names a new version, load it in the background and swap it in."""
+    global _reloader
+    path, version = resolve_index_dir()
+    with _live_lock:
+        if (_live is None or version in (_live.version, _failed_version)
+                or (_reloader is not None and _reloader.is_alive())):
+            thread = _reloader if wait else None
+        else:
+            thread = _reloader = threading.Thread(target=_swap, args=(path, version), name="guide-index-reload",
+                                                  daemon=True)
+            thread.start()
+    if thread is not None and wait:
+        thread.join()
+
+def current_index() -> IndexVersion:
+    """The live index version; at most every GUIDE_RELOAD_INTERVAL seconds this also looks for a newer one."""
+    global _live, _checked_at
+    if _live is None:
+        with _live_lock:
+            if _live is None:
+                _live = IndexVersion(*resolve_index_dir())
+                _checked_at = time.monotonic()
+    if GUIDE_RELOAD_INTERVAL > 0 and time.monotonic() - _checked_at >= GUIDE_RELOAD_INTERVAL:
+        _checked_at = time.monotonic()
+        reload_index()
+    return _live
+
+def get_store():
+    """The live guide vector store."""
+    return current_index().store()
+
+def get_city_store(city: str):
+    """The live shard holding only `city`'s guides, or None if there is none."""
+    return current_index().city_store(city)
+
+def get_lexical():
+    """The live BM25 index, or None for an index built without it."""
+    return current_index().lexical()
+
+def warmup() -> None:
+    """Load the indexes now instead of on the first retrieve_tips call (for servers that want it eager)."""
+    current_index().warm()
+
+def embedding_cache_stats() -> dict:
+    v = _live
+    cache = getattr(v.embeddings, "cache", None) if v is not None else None
+    return cache.snapshot() if cache is not None else {}
+
+def _search_store(v: IndexVersion, city: Optional[str]):
+    store = v.city_store(city) if city else None
+    if city and store is None:
+        print(f"[RAG] no guide shard for city={city!r}; searching all guides")
+    return store if store is not None else v.store()
+
+def _dense_search(v: IndexVersion, query: str, k: int, city: Optional[str]) -> List[str]:
     # similarity_search takes a query string, Converts it into a vector using the embedding model
     # Searches the FAISS index for the most similar stored document vectors.
     # Returns the top-k matching documents. ( k is the number of most relevant documents to return.)
-
-    docs = _store.similarity_search(query, k=k)  # FAISS index searches through the stored vector embeddings and returns the top k most similar documents (or chunk)
-    print(f"[RAG] retrieve_tips: {query} (k={k}) -> {len(docs)} hits")
+    docs = _search_store(v, city).similarity_search(query, k=k)
     return [d.page_content for d in docs]
 
+def _dense_search_batch(v: IndexVersion, queries: List[str], k: int, cities: List[Optional[str]]) -> List[List[str]]:
+    """Top-k passages per query: one embedding request for all queries, one FAISS search per index touched."""
+    import numpy as np
+
+    embed = getattr(v.embeddings, "embed_queries", v.embeddings.embed_documents)
+    vectors = np.asarray(embed(queries), dtype=np.float32)
+    groups: Dict[int, tuple] = {}  # id(store) -> (store, query positions); queries on the same shard share a search
+    for i, city in enumerate(cities):
+        store = _search_store(v, city)
+        groups.setdefault(id(store), (store, []))[1].append(i)
+    out: List[List[str]] = [[] for _ in queries]
+    for store, positions in groups.values():
+        if hasattr(store, "similarity_search_by_vectors"):
+            results = store.similarity_search_by_vectors(vectors[positions], k=k)
+        else:  # old pickle-format index: LangChain FAISS has no batched search
+            results = [store.similarity_search_by_vector(vectors[i].tolist(), k=k) for i in positions]
+        for i, docs in zip(positions, results):
+            out[i] = [d.page_content for d in docs]
+    return out
+
+def _lexical_search(v: IndexVersion, query: str, k: int, city: Optional[str]) -> List[str]:
+    index = v.lexical()
+    slug = city_slug(city) if city else None
+    cities = [slug] if slug and slug in index.cities else None  # unknown city: search all, like dense
+    return [index.texts[doc] for doc, _ in index.search(query, k=k, cities=cities)]
 
+def _search_mode(v: IndexVersion, mode: Optional[str]) -> str:
+    mode = (mode or GUIDE_SEARCH_MODE).lower()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {SEARCH_MODES}, got {mode!r}")
+    if mode != "dense" and v.lexical() is None:
+        print("[RAG] index has no BM25 data (rebuild with scripts/build_guide_index.py); using dense search")
+        mode = "dense"
+    return mode
+
+def _dedupe(rankings: List[List[str]], k: int) -> List[List[str]]:
+    """
+    Up to k passages per ranking, none repeated across rankings. A passage goes to the ranking
+    that places it highest; rankings tied on it share such passages (the one holding fewer so
+    far wins). Once a ranking has k, its other passages backfill the rankings with room left.
+    """
+    seen, out = set(), [[] for _ in rankings]
+    for rank in range(max(map(len, rankings), default=0)):
+        tier = [i for i, ranking in enumerate(rankings) if rank < len(ranking)]
+        for i in sorted(tier, key=lambda i: len(out[i])):  # stable: equal counts keep request order
+            passage = rankings[i][rank]
+            if passage not in seen and len(out[i]) < k:
+                seen.add(passage)
+                out[i].append(passage)
+    return out
+
+# Retriever Tool
+def retrieve_tips(query: str, k: int = 5, city: Optional[str] = None, mode: Optional[str] = None) -> List[str]:
+    """
+    Search the LOCAL travel guides (not the web). Return short passages with insider tips.
+    Always pass the city name if the user asks about a specific city (e.g., Paris, Kyoto):
+    set `city` to search only that city's guides, and mention it in the query too.
+    Use this for hidden gems, dining, neighborhoods, and day-by-day planning.
+    mode: "lexical" for exact names (a museum, street, market; fastest), "dense" for
+    descriptive questions, "hybrid" to combine both. Defaults to the server setting.
+    """
+    v = current_index()
+    mode = _search_mode(v, mode)
+    if mode == "lexical":
+        passages = _lexical_search(v, query, k, city)
+    elif mode == "hybrid":
+        # each side over-fetches, then reciprocal-rank fusion picks the k passages ranked well by both
+        fetch = max(20, 4 * k)
+        passages = rrf_fuse([_dense_search(v, query, fetch, city), _lexical_search(v, query, fetch, city)], k)
+    else:
+        passages = _dense_search(v, query, k, city)
+    print(f"[RAG] retrieve_tips: {query} (k={k}, city={city}, mode={mode}) -> {len(passages)} hits")
+    return passages
+
+def retrieve_tips_batch(queries: List[str], k: int = 5, cities: Optional[List[Optional[str]]] = None,
+                        mode: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Search the LOCAL travel guides for several topics/cities in ONE call (e.g. food in Rome,
+    museums in Paris, parks in London for one itinerary). Prefer this over repeated retrieve_tips.
+    - queries: one search per entry, e.g. ["best food Rome", "museums Paris", "parks London"].
+    - cities: optional, same length as queries; the city each query is about (null for none).
+    - k: passages per query. A passage is returned only once, under the query that ranks it best
+      (or the next best if that query already has k).
+    mode: as for retrieve_tips.
+    Returns {query: [passages]} in request order; a query with a city is keyed "query (city)".
+    """
+    cities = list(cities or [])
+    if len(cities) > len(queries):
+        raise ValueError("cities must not be longer than queries")
+    cities += [None] * (len(queries) - len(cities))
+    # identical (query, city) pairs are searched once
+    pairs = list(dict.fromkeys(zip(queries, cities)))
+    if not pairs:
+        return {}
+    qs, cs = [q for q, _ in pairs], [c for _, c in pairs]
+    v = current_index()
+    mode = _search_mode(v, mode)
+    fetch = 2 * k  # headroom for passages that rank better under another query
+    if mode == "lexical":
+        rankings = [_lexical_search(v, q, fetch, c) for q, c in pairs]
+    elif mode == "hybrid":
+        wide = max(20, 4 * k)
+        dense = _dense_search_batch(v, qs, wide, cs)
+        rankings = [rrf_fuse([d, _lexical_search(v, q, wide, c)], fetch) for d, (q, c) in zip(dense, pairs)]
+    else:
+        rankings = _dense_search_batch(v, qs, fetch, cs)
+    results = _dedupe(rankings, k)
+    print(f"[RAG] retrieve_tips_batch: {len(pairs)} queries (k={k}, mode={mode}) -> "
+          f"{sum(len(r) for r in results)} distinct hits")
+    return {(q if c is None else f"{q} ({c})"): r for (q, c), r in zip(pairs, results)}
@@ -0,0 +1,196 @@
+# tools/guide_store.py
+# Pickle-free on-disk format for the guide index, opened with mmap so that every worker
+# process shares the same page-cache pages instead of holding its own heap copy:
+#   index.faiss                 FAISS index (read with IO_FLAG_MMAP_IFC: vectors stay in the file)
+#   vectors.f32                 raw float32 vectors, only for approximate (IVF/HNSW/PQ) indexes,
+#                               whose own copy may be lossy or not reconstructible
+#   passages.bin / passages.off UTF-8 passage texts back to back + uint64 offsets (n + 1)
+#   metadata.bin / metadata.off one JSON object per passage ({"id": ..., "city": ..., ...})
+#   store.json                  {"format", "count", "dim", "model", "index", "search"}; written last
+# Row i of every file is FAISS id i. Written by scripts/build_guide_index.py, converted from
+# the old LangChain index.pkl by scripts/migrate_guide_index.py, read by tools/guide_api.py.
+import json
+import math
+import mmap
+import os
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+STORE_FORMAT = 1
+STORE_FILE = "store.json"
+FAISS_FILE = "index.faiss"
+VECTORS_FILE = "vectors.f32"
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+LEGACY_PICKLE = "index.pkl"
+
+def is_store(index_dir: str) -> bool:
+    return os.path.exists(os.path.join(index_dir, STORE_FILE))
+
+def _replace(tmp: str) -> None:
+    os.replace(tmp, tmp[:-len(".tmp")])
+
+# ---------- columns ----------
+def _write_column(index_dir: str, name: str, values: Sequence[str]) -> None:
+    """`values` as one UTF-8 blob (<name>.bin) plus n + 1 uint64 offsets (<name>.off)."""
+    offsets = np.zeros(len(values) + 1, dtype="<u8")
+    blob_path = os.path.join(index_dir, f"{name}.bin.tmp")
+    with open(blob_path, "wb") as f:
+        for i, value in enumerate(values):
+            data = value.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    off_path = os.path.join(index_dir, f"{name}.off.tmp")
+    offsets.tofile(off_path)
+    _replace(blob_path)
+    _replace(off_path)
+
+class _Column:
+    """Read-only view of a column written by _write_column; nothing is decoded until indexed."""
+
+    def __init__(self, index_dir: str, name: str):
+        self.offsets = np.memmap(os.path.join(index_dir, f"{name}.off"), dtype="<u8", mode="r")
+        with open(os.path.join(index_dir, f"{name}.bin"), "rb") as f:
+            # mmap refuses empty files; an index with no passages has nothing to read anyway
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+# ---------- index ----------
+def index_spec(index_type: str = "flat", n: int = 0, nlist: int = 0, hnsw_m: int = 32, pq_m: int = 0) -> str:
+    """
+    faiss.index_factory string for `n` vectors: "flat" (exact), "ivf" (nlist inverted lists,
+    ~4*sqrt(n) by default) or "hnsw" (graph with hnsw_m links per node), each storing PQ codes of
+    pq_m bytes instead of float32 when pq_m > 0. Any other value is used as a factory string as is.
+    """
+    pq = f"PQ{pq_m}" if pq_m else ""
+    kind = index_type.lower()
+    if kind == "flat":
+        return pq or "Flat"
+    if kind == "ivf":
+        if not nlist and n < 2 * 39:
+            return pq or "Flat"  # a single inverted list is just a slower flat index
+        nlist = nlist or max(1, min(int(4 * math.sqrt(n)), n // 39))  # faiss wants >= 39 training points per list
+        return f"IVF{nlist},{pq or 'Flat'}"
+    if kind == "hnsw":
+        return f"HNSW{hnsw_m}" + (f"_{pq}" if pq else "")
+    return index_type
+
+def build_index(vectors: np.ndarray, spec: str):
+    """(trained and filled index, spec actually used); too few vectors to train `spec` falls back to Flat."""
+    n, dim = vectors.shape
+    if spec != "Flat" and n:
+        index = faiss.index_factory(dim, spec)  # L2, as LangChain's FAISS.from_embeddings used
+        try:
+            index.train(vectors)
+            index.add(vectors)
+            return index, spec
+        except RuntimeError:  # e.g. fewer vectors than IVF lists or PQ centroids (256 per sub-quantizer)
+            print(f"[guide_store] {n} vectors are too few to train {spec}; using Flat")
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    return index, "Flat"
+
+def set_search_params(index, params: Dict[str, int]) -> None:
+    """Apply query-time knobs (nprobe for IVF, efSearch for HNSW); ones the index does not have are skipped."""
+    space = faiss.ParameterSpace()
+    for name, value in params.items():
+        try:
+            space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass
+
+def _read_faiss(path: str):
+    # flat indexes can be searched straight from the mapping; other types fall back to a heap copy
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+class GuideStore:
+    """
+    Memory-mapped guide index with the part of the LangChain FAISS interface retrieve_tips uses
+    (similarity_search, similarity_search_by_vector, .index, .embeddings), plus a batched search.
+    """
+
+    def __init__(self, index_dir: str, embeddings=None, search_params: Optional[Dict[str, int]] = None):
+        with open(os.path.join(index_dir, STORE_FILE)) as f:
+            self.header = json.load(f)
+        if self.header.get("format") != STORE_FORMAT:
+            raise ValueError(f"{index_dir}: unsupported guide store format {self.header.get('format')!r}")
+        self.index_dir = index_dir
+        self.embeddings = embeddings
+        self.model: str = self.header["model"]
+        self.index = _read_faiss(os.path.join(index_dir, FAISS_FILE))
+        # search settings saved by the builder, overridden per process (GUIDE_NPROBE / GUIDE_EF_SEARCH)
+        set_search_params(self.index, {**self.header.get("search", {}), **(search_params or {})})
+        self.passages = _Column(index_dir, "passages")
+        self.metadata = _Column(index_dir, "metadata")
+        if not (self.index.ntotal == len(self.passages) == len(self.metadata) == self.header["count"]):
+            raise ValueError(f"{index_dir}: index, passages and metadata disagree on the row count")
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def document(self, i: int) -> Document:
+        meta = json.loads(self.metadata[i])
+        return Document(id=meta.pop("id", None), page_content=self.passages[i], metadata=meta)
+
+    def vectors(self) -> np.ndarray:
+        """Every stored vector, row i = passage i (a copy; for rebuilding shards, not for queries)."""
+        path = os.path.join(self.index_dir, VECTORS_FILE)
+        if os.path.exists(path):
+            return np.fromfile(path, dtype=np.float32).reshape(-1, self.index.d)
+        return self.index.reconstruct_n(0, self.index.ntotal) if self.index.ntotal else \
+            np.zeros((0, self.index.d), np.float32)
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 4) -> List[List[Document]]:
+        """One FAISS search over a (queries x dim) matrix; top-k documents per row."""
+        _, rows = self.index.search(np.asarray(embeddings, dtype=np.float32).reshape(-1, self.index.d), k)
+        return [[self.document(int(i)) for i in row if i >= 0] for row in rows]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k)[0]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+    @staticmethod
+    def write(index_dir: str, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[dict],
+              vectors: np.ndarray, model: str, dim: Optional[int] = None, index_type: str = "flat",
+              index_params: Optional[dict] = None, search: Optional[Dict[str, int]] = None) -> str:
+        """
+        Write (or replace) a store; returns the index spec used. store.json goes last, so a
+        half-written one fails the row-count check. index_params: nlist/hnsw_m/pq_m of index_spec.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), -1) if len(ids) else \
+            np.zeros((0, dim or 1), np.float32)
+        index, spec = build_index(vectors, index_spec(index_type, len(ids), **(index_params or {})))
+        faiss.write_index(index, os.path.join(index_dir, FAISS_FILE + ".tmp"))
+        _replace(os.path.join(index_dir, FAISS_FILE + ".tmp"))
+        raw = os.path.join(index_dir, VECTORS_FILE)
+        if spec == "Flat":
+            if os.path.exists(raw):
+                os.remove(raw)
+        else:
+            vectors.tofile(raw + ".tmp")
+            _replace(raw + ".tmp")
+        _write_column(index_dir, "passages", texts)
+        _write_column(index_dir, "metadata",
+                      [json.dumps({"id": i, **m}, ensure_ascii=False) for i, m in zip(ids, metadatas)])
+        header = {"format": STORE_FORMAT, "count": len(ids), "dim": int(vectors.shape[1]), "model": model,
+                  "index": spec, "search": search or {}}
+        with open(os.path.join(index_dir, STORE_FILE + ".tmp"), "w") as f:
+            json.dump(header, f)
+        _replace(os.path.join(index_dir, STORE_FILE + ".tmp"))
+        legacy = os.path.join(index_dir, LEGACY_PICKLE)
+        if os.path.exists(legacy):
+            os.remove(legacy)  # superseded; guide_api would otherwise ignore it anyway
+        return spec
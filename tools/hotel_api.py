@@ -1,8 +1,10 @@
 # tools/hotel_api.py
+import asyncio
 import os
+import threading
 import time
-import requests
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import date, datetime, timedelta
 
 try:
@@ -10,51 +12,116 @@ try:
 except ImportError:
     load_dotenv = None
 
-# ------------------ Amadeus token cache ------------------
-_TOKEN: Dict[str, Any] = {"access_token": None, "expires_at": 0.0}
+from tools.amadeus_client import get_async_client, get_client
+from tools.location_cache import CITY, get_location_cache
+from tools.models import HotelOffer, TopK, num
 
+# ------------------ Amadeus token ------------------
 def get_amadeus_access_token() -> str:
-    """Get (and cache) an Amadeus OAuth token. Reuses until expiry."""
-    now = time.time()
-    if _TOKEN["access_token"] and now < _TOKEN["expires_at"]:
-        return _TOKEN["access_token"]
-
-    client_id = os.getenv("AMADEUS_CLIENT_ID")
-    client_secret = os.getenv("AMADEUS_CLIENT_SECRET")
-    if not client_id or not client_secret:
-        raise ValueError("AMADEUS_CLIENT_ID and AMADEUS_CLIENT_SECRET must be set.")
-
-    url = "https://test.api.amadeus.com/v1/security/oauth2/token"
-    data = {"grant_type": "client_credentials", "client_id": client_id, "client_secret": client_secret}
-    resp = requests.post(url, data=data, timeout=20)
-    resp.raise_for_status()
-    payload = resp.json()
-    _TOKEN["access_token"] = payload["access_token"]
-    _TOKEN["expires_at"] = now + float(payload.get("expires_in", 1800)) - 60  # refresh 1m early
-    return _TOKEN["access_token"]
+    """Get the shared, cached Amadeus OAuth token (see tools/amadeus_client.py)."""
+    return get_client().access_token()
+
+async def aget_amadeus_access_token() -> str:
+    return await get_async_client().access_token()
 
 # ------------------ Helpers ------------------
+LOCATIONS_PATH = "/v1/reference-data/locations"
+HOTELS_BY_CITY_PATH = "/v1/reference-data/locations/hotels/by-city"
+HOTEL_OFFERS_PATH = "/v3/shopping/hotel-offers"
+
+def _cached_city_code(c: str) -> Optional[str]:
+    if len(c) == 3 and c.isalpha():
+        return c.upper()
+    return get_location_cache().lookup(CITY, c)
+
+def _city_code_from(c: str, payload: Dict[str, Any]) -> Optional[str]:
+    data = payload.get("data", [])
+    code = data[0].get("iataCode") if data else None
+    if code:
+        get_location_cache().store(CITY, c, code)
+    return code
+
 def resolve_city_code(city_or_code: str, access_token: str) -> Optional[str]:
     """Accepts city NAME ('New York') or IATA CODE ('NYC'). Returns 3-letter IATA code."""
     c = (city_or_code or "").strip()
-    if len(c) == 3 and c.isalpha():
-        return c.upper()
-    url = "https://test.api.amadeus.com/v1/reference-data/locations"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"subType": "CITY", "keyword": c}
-    r = requests.get(url, headers=headers, params=params, timeout=20)
+    code = _cached_city_code(c)
+    if code:
+        return code
+    params = {"subType": CITY, "keyword": c}
+    r = get_client().get(LOCATIONS_PATH, params=params, token=access_token)
     r.raise_for_status()
-    data = r.json().get("data", [])
-    return data[0].get("iataCode") if data else None
+    return _city_code_from(c, r.json())
 
-def get_hotel_ids(city_code: str, access_token: str) -> list:
-    url = "https://test.api.amadeus.com/v1/reference-data/locations/hotels/by-city"
-    headers = {"Authorization": f"Bearer {access_token}"}
+async def aresolve_city_code(city_or_code: str, access_token: str) -> Optional[str]:
+    """Async variant of resolve_city_code."""
+    c = (city_or_code or "").strip()
+    code = _cached_city_code(c)
+    if code:
+        return code
+    params = {"subType": CITY, "keyword": c}
+    r = await get_async_client().get(LOCATIONS_PATH, params=params, token=access_token)
+    r.raise_for_status()
+    return _city_code_from(c, r.json())
+
+# (city_code, ratings) -> (expires_at, hotel_ids); the by-city list changes rarely
+HOTEL_IDS_TTL = float(os.getenv("HOTEL_IDS_TTL", 6 * 3600))
+_HOTEL_IDS: Dict[Tuple[str, Optional[str]], Tuple[float, List[str]]] = {}
+_HOTEL_IDS_LOCK = threading.Lock()
+
+# hotel-offers fan-out: IDs per request, parallel requests, overall budget (seconds)
+HOTEL_OFFERS_CHUNK = int(os.getenv("HOTEL_OFFERS_CHUNK", 20))
+HOTEL_OFFERS_WORKERS = int(os.getenv("HOTEL_OFFERS_WORKERS", 4))
+HOTEL_SEARCH_DEADLINE = float(os.getenv("HOTEL_SEARCH_DEADLINE", 20))
+
+def parse_hotel_class(hotel_class: Optional[str]) -> Optional[str]:
+    """'4-star' -> '4', '4 or 5 star' -> '4,5'; the form the by-city `ratings` param expects."""
+    if not hotel_class:
+        return None
+    stars = sorted({ch for ch in hotel_class if ch in "12345"})
+    return ",".join(stars) or None
+
+def _cached_hotel_ids(key: Tuple[str, Optional[str]]) -> Optional[List[str]]:
+    with _HOTEL_IDS_LOCK:
+        hit = _HOTEL_IDS.get(key)
+    if hit and time.time() < hit[0]:
+        return list(hit[1])
+    return None
+
+def _hotel_ids_from(key: Tuple[str, Optional[str]], payload: Dict[str, Any]) -> List[str]:
+    ids = [hotel["hotelId"] for hotel in payload.get("data", [])]
+    with _HOTEL_IDS_LOCK:
+        _HOTEL_IDS[key] = (time.time() + HOTEL_IDS_TTL, ids)
+    return list(ids)
+
+def _hotel_ids_params(city_code: str, ratings: Optional[str]) -> Dict[str, Any]:
     params = {"cityCode": city_code}
-    response = requests.get(url, headers=headers, params=params, timeout=20)
+    if ratings:
+        params["ratings"] = ratings
+    return params
+
+def get_hotel_ids(city_code: str, access_token: str, ratings: Optional[str] = None) -> list:
+    """
+    Hotel IDs in a city, optionally only those with the given star `ratings` ("4" or "4,5").
+    Cached per (city_code, ratings) for HOTEL_IDS_TTL seconds.
+    """
+    key = (city_code.upper(), ratings)
+    ids = _cached_hotel_ids(key)
+    if ids is not None:
+        return ids
+    response = get_client().get(HOTELS_BY_CITY_PATH, params=_hotel_ids_params(city_code, ratings), token=access_token)
     response.raise_for_status()
-    data = response.json()
-    return [hotel["hotelId"] for hotel in data.get("data", [])]
+    return _hotel_ids_from(key, response.json())
+
+async def aget_hotel_ids(city_code: str, access_token: str, ratings: Optional[str] = None) -> list:
+    """Async variant of get_hotel_ids (shares its cache)."""
+    key = (city_code.upper(), ratings)
+    ids = _cached_hotel_ids(key)
+    if ids is not None:
+        return ids
+    response = await get_async_client().get(HOTELS_BY_CITY_PATH, params=_hotel_ids_params(city_code, ratings),
+                                            token=access_token)
+    response.raise_for_status()
+    return _hotel_ids_from(key, response.json())
 
 def _ensure_future_dates(checkin: str, checkout: str) -> tuple[str, str]:
     today = date.today()
@@ -72,6 +139,97 @@ def _ensure_future_dates(checkin: str, checkout: str) -> tuple[str, str]:
         co = ci + timedelta(days=2)
     return ci.isoformat(), co.isoformat()
 
+def _offer_params(checkin: str, checkout: str, adults: int, room_quantity: int, currency: str) -> Dict[str, Any]:
+    return {
+        "checkInDate": checkin,
+        "checkOutDate": checkout,
+        "adults": adults,
+        "roomQuantity": room_quantity,
+        "currency": currency,
+        "bestRateOnly": "true",
+    }
+
+def _chunked(hotel_ids: List[str]) -> List[List[str]]:
+    return [hotel_ids[i:i + HOTEL_OFFERS_CHUNK] for i in range(0, len(hotel_ids), HOTEL_OFFERS_CHUNK)]
+
+def _chunk_timeout(deadline: float) -> float:
+    return max(1.0, min(30.0, deadline - time.monotonic()))
+
+def _check_offers(resp) -> Dict[str, Any]:
+    if resp.status_code == 400:
+        print("Amadeus API error:", resp.text)
+    resp.raise_for_status()
+    return resp.json()
+
+def _fetch_offers_chunk(hotel_ids: List[str], params: Dict[str, Any], token: str, deadline: float) -> Dict[str, Any]:
+    """One /v3/shopping/hotel-offers call for up to HOTEL_OFFERS_CHUNK hotel IDs."""
+    resp = get_client().get(HOTEL_OFFERS_PATH, params={**params, "hotelIds": ",".join(hotel_ids)},
+                            token=token, timeout=_chunk_timeout(deadline))
+    return _check_offers(resp)
+
+async def _afetch_offers_chunk(hotel_ids: List[str], params: Dict[str, Any], token: str, deadline: float,
+                               sem: asyncio.Semaphore) -> Dict[str, Any]:
+    async with sem:
+        resp = await get_async_client().get(HOTEL_OFFERS_PATH, params={**params, "hotelIds": ",".join(hotel_ids)},
+                                            token=token, timeout=_chunk_timeout(deadline))
+    return _check_offers(resp)
+
+class _TopByPrice:
+    """
+    Merges hotel-offer payloads as chunks arrive, keeping the `n` cheapest offers.
+    Offers are filtered (max_price / stars) and checked against the current top-n
+    while being read, so only offers that make the cut become HotelOffer objects.
+    """
+
+    def __init__(self, n: int, max_price: Optional[float] = None, ratings: Optional[str] = None):
+        self.max_price = float(max_price) if max_price is not None else None
+        self.want = {int(r) for r in ratings.split(",")} if ratings else None
+        self.chunks_done = 0
+        self.errors: List[Exception] = []
+        self._top: TopK[HotelOffer] = TopK(n)
+
+    def merge(self, payload: Dict[str, Any]) -> None:
+        self.chunks_done += 1
+        for item in payload.get("data", []):
+            h = item.get("hotel", {}) or {}
+            rating = h.get("rating")  # often a string like "4" or "5"
+            stars = int(rating) if rating and str(rating).isdigit() else None
+            # offers may still carry a rating that disagrees with the by-city list
+            if self.want and stars not in self.want:
+                continue
+            for off in item.get("offers", []) or []:
+                price = off.get("price", {}) or {}
+                price_str = price.get("total")
+                price_num = num(price_str)
+                # --------- apply optional filters from prefs ---------
+                if self.max_price is not None and (price_num is None or price_num > self.max_price):
+                    continue
+                if not self._top.would_accept(price_num):
+                    continue
+                addr = h.get("address", {}) or {}
+                room = off.get("room", {}) or {}
+                self._top.push(price_num, HotelOffer(
+                    name=h.get("name"),
+                    address=addr.get("lines", []),
+                    city=addr.get("cityName"),
+                    stars=stars,
+                    price=price_str,
+                    price_num=price_num,
+                    currency=price.get("currency"),
+                    check_in=off.get("checkInDate"),
+                    check_out=off.get("checkOutDate"),
+                    room=room.get("typeEstimated", {}),
+                    description=room.get("description", {}).get("text"),
+                    booking_link=(off.get("urls", {}) or {}).get("booking"),
+                ))
+
+    def finish(self, n_chunks: int) -> List[Dict[str, Any]]:
+        if self.errors:
+            print(f"[hotel_api] {len(self.errors)}/{n_chunks} hotel-offer chunks failed: {self.errors[0]}")
+            if not self.chunks_done:
+                raise self.errors[0]
+        return [h.to_dict() for h in self._top.sorted()]
+
 # ------------------ Main tool ------------------
 def search_hotels(
     city: str,
@@ -82,6 +240,7 @@ def search_hotels(
     adults: int = 1,
     room_quantity: int = 1,
     currency: str = "USD",
+    max_results: int = 20,
 ) -> List[Dict[str, Any]]:
     """
     Find hotels for a city and date range using the Amadeus Hotel Offers API.
@@ -92,9 +251,9 @@ def search_hotels(
     - ALWAYS include known user preferences if available:
         • hotel_class: e.g., "4-star" / "5-star"
         • max_price: numeric upper bound in the given currency (e.g., 2000)
-    - adults, room_quantity, currency are optional.
+    - adults, room_quantity, currency, max_results are optional.
 
-    Returns a list of hotels with fields:
+    Returns up to max_results of the cheapest matching hotels (sorted by price) with fields:
       name, address, city, stars (if provided by API), price, price_num, currency,
       checkInDate, checkOutDate, room, description, bookingLink
     """
@@ -109,68 +268,85 @@ def search_hotels(
         print(f"[hotel_api] Could not resolve city code for {city!r}")
         return []
 
-    hotel_ids = get_hotel_ids(city_code, token)
+    # star filter applied server-side, so the offer lookup only targets hotels that can match
+    ratings = parse_hotel_class(hotel_class)
+    hotel_ids = get_hotel_ids(city_code, token, ratings=ratings)
     if not hotel_ids:
         print("[hotel_api] No hotel IDs found for this city.")
         return []
 
-    url = "https://test.api.amadeus.com/v3/shopping/hotel-offers"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {
-        "hotelIds": ",".join(hotel_ids[:20]),
-        "checkInDate": checkin,
-        "checkOutDate": checkout,
-        "adults": adults,
-        "roomQuantity": room_quantity,
-        "currency": currency,
-        "bestRateOnly": "true",
-    }
-    resp = requests.get(url, headers=headers, params=params, timeout=30)
-    if resp.status_code == 400:
-        print("Amadeus API error:", resp.text)
-    resp.raise_for_status()
+    params = _offer_params(checkin, checkout, adults, room_quantity, currency)
+    top = _TopByPrice(max_results, max_price=max_price, ratings=ratings)
+    chunks = _chunked(hotel_ids)
+    deadline = time.monotonic() + HOTEL_SEARCH_DEADLINE
 
-    results: List[Dict[str, Any]] = []
-    for item in resp.json().get("data", []):
-        h = item.get("hotel", {}) or {}
-        rating = h.get("rating")  # often a string like "4" or "5"
-        offers = item.get("offers", []) or []
-        for off in offers:
-            price_str = (off.get("price", {}) or {}).get("total")
-            price_num = None
+    # --------- fan out over all hotel IDs, merge as chunks arrive ---------
+    pool = ThreadPoolExecutor(max_workers=min(HOTEL_OFFERS_WORKERS, len(chunks)))
+    futures = [pool.submit(_fetch_offers_chunk, chunk, params, token, deadline) for chunk in chunks]
+    try:
+        for fut in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
             try:
-                price_num = float(price_str) if price_str is not None else None
-            except Exception:
-                pass
-
-            results.append({
-                "name": h.get("name"),
-                "address": (h.get("address", {}) or {}).get("lines", []),
-                "city": (h.get("address", {}) or {}).get("cityName"),
-                "stars": int(rating) if rating and str(rating).isdigit() else None,
-                "price": price_str,
-                "price_num": price_num,
-                "currency": (off.get("price", {}) or {}).get("currency"),
-                "checkInDate": off.get("checkInDate"),
-                "checkOutDate": off.get("checkOutDate"),
-                "room": (off.get("room", {}) or {}).get("typeEstimated", {}),
-                "description": (off.get("room", {}) or {}).get("description", {}).get("text"),
-                "bookingLink": (off.get("urls", {}) or {}).get("booking"),
-            })
-
-    # --------- apply optional filters from prefs ---------
-    if max_price is not None:
-        results = [r for r in results if (r.get("price_num") is not None and r["price_num"] <= float(max_price))]
-    if hotel_class:
-        # accept "4-star" format or just "4"
-        want = "".join(ch for ch in hotel_class if ch.isdigit())
-        if want:
-            results = [r for r in results if r.get("stars") and str(r["stars"]) == want]
-
-    # sort by price if available
-    results.sort(key=lambda r: (r.get("price_num") is None, r.get("price_num", 0.0)))
-
-    return results
+                top.merge(fut.result())
+            except Exception as e:
+                top.errors.append(e)
+    except FuturesTimeout:
+        print(f"[hotel_api] deadline hit after {top.chunks_done}/{len(chunks)} chunks; returning partial results")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return top.finish(len(chunks))
+
+async def asearch_hotels(
+    city: str,
+    checkin: str,
+    checkout: str,
+    hotel_class: Optional[str] = None,
+    max_price: Optional[float] = None,
+    adults: int = 1,
+    room_quantity: int = 1,
+    currency: str = "USD",
+    max_results: int = 20,
+) -> List[Dict[str, Any]]:
+    """Async variant of search_hotels (same arguments and result) on the shared httpx pool."""
+    print(f"[hotel_api] (async) city={city!r} checkin={checkin} checkout={checkout} "
+          f"hotel_class={hotel_class} max_price={max_price}")
+
+    checkin, checkout = _ensure_future_dates(checkin, checkout)
+    token = await aget_amadeus_access_token()
+
+    city_code = await aresolve_city_code(city, token)
+    if not city_code:
+        print(f"[hotel_api] Could not resolve city code for {city!r}")
+        return []
+
+    ratings = parse_hotel_class(hotel_class)
+    hotel_ids = await aget_hotel_ids(city_code, token, ratings=ratings)
+    if not hotel_ids:
+        print("[hotel_api] No hotel IDs found for this city.")
+        return []
+
+    params = _offer_params(checkin, checkout, adults, room_quantity, currency)
+    top = _TopByPrice(max_results, max_price=max_price, ratings=ratings)
+    chunks = _chunked(hotel_ids)
+    deadline = time.monotonic() + HOTEL_SEARCH_DEADLINE
+
+    sem = asyncio.Semaphore(HOTEL_OFFERS_WORKERS)
+    tasks = [asyncio.ensure_future(_afetch_offers_chunk(chunk, params, token, deadline, sem)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=max(0.0, deadline - time.monotonic())):
+            try:
+                top.merge(await next_done)
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                top.errors.append(e)
+    except asyncio.TimeoutError:
+        print(f"[hotel_api] deadline hit after {top.chunks_done}/{len(chunks)} chunks; returning partial results")
+    finally:
+        for t in tasks:
+            t.cancel()
+
+    return top.finish(len(chunks))
 
 if __name__ == "__main__":
     if load_dotenv:
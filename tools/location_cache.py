@@ -0,0 +1,140 @@
+# tools/location_cache.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+_ROOT = os.path.dirname(os.path.dirname(__file__))
+DEFAULT_DB_PATH = os.path.join(_ROOT, "data", "location_cache.sqlite3")
+DEFAULT_SEED_PATH = os.path.join(_ROOT, "data", "iata_seed.json")
+
+# Amadeus `subType` values we resolve against
+CITY = "CITY"
+CITY_OR_AIRPORT = "CITY,AIRPORT"
+
+def normalize_name(term: str) -> str:
+    """'  São Paulo ' -> 'sao paulo', 'New-York' -> 'new york'."""
+    t = unicodedata.normalize("NFKD", term or "")
+    t = "".join(ch for ch in t if not unicodedata.combining(ch)).casefold()
+    t = re.sub(r"[^\w]+", " ", t)
+    return " ".join(t.split())
+
+class LocationCache:
+    """
+    Name -> IATA code resolution cache, checked before calling /v1/reference-data/locations.
+
+    Lookup order: in-memory LRU, bundled seed table (data/iata_seed.json), then the
+    persisted SQLite table that survives restarts. Misses are left to the caller,
+    who stores the API answer back here.
+    """
+
+    def __init__(self, db_path: Optional[str] = DEFAULT_DB_PATH, seed_path: Optional[str] = DEFAULT_SEED_PATH,
+                 maxsize: int = 2048):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self.stats: Counter = Counter()
+        self._lru: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._seed = self._load_seed(seed_path)
+
+    @staticmethod
+    def _load_seed(path: Optional[str]) -> Dict[str, Dict[str, str]]:
+        if not path or not os.path.exists(path):
+            return {CITY: {}, CITY_OR_AIRPORT: {}}
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        cities = {normalize_name(k): v.upper() for k, v in raw.get("cities", {}).items()}
+        airports = {normalize_name(k): v.upper() for k, v in raw.get("airports", {}).items()}
+        # cities resolve under both subTypes; airport names only when airports are allowed
+        return {CITY: cities, CITY_OR_AIRPORT: {**cities, **airports}}
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS locations ("
+                " sub_type TEXT NOT NULL, name TEXT NOT NULL, iata_code TEXT NOT NULL,"
+                " PRIMARY KEY (sub_type, name))"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: tuple, code: str) -> None:
+        self._lru[key] = code
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def lookup(self, sub_type: str, term: str) -> Optional[str]:
+        name = normalize_name(term)
+        key = (sub_type, name)
+        with self._lock:
+            code = self._lru.get(key)
+            if code:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return code
+            code = self._seed.get(sub_type, {}).get(name)
+            if code:
+                self.stats["seed_hits"] += 1
+                self._remember(key, code)
+                return code
+            db = self._conn()
+            row = db.execute("SELECT iata_code FROM locations WHERE sub_type = ? AND name = ?",
+                             key).fetchone() if db else None
+            if row:
+                self.stats["disk_hits"] += 1
+                self._remember(key, row[0])
+                return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, sub_type: str, term: str, code: str) -> None:
+        key = (sub_type, normalize_name(term))
+        code = code.upper()
+        with self._lock:
+            self._remember(key, code)
+            db = self._conn()
+            if db:
+                db.execute("INSERT OR REPLACE INTO locations (sub_type, name, iata_code) VALUES (?, ?, ?)",
+                           (*key, code))
+                db.commit()
+            self.stats["stores"] += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            s = dict(self.stats)
+        hits = s.get("memory_hits", 0) + s.get("seed_hits", 0) + s.get("disk_hits", 0)
+        total = hits + s.get("misses", 0)
+        s["hit_rate"] = round(hits / total, 4) if total else 0.0
+        return s
+
+_CACHE: Optional[LocationCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_location_cache() -> LocationCache:
+    """
+    Process-wide cache. IATA_CACHE_PATH overrides the SQLite file ("" keeps it in memory only);
+    IATA_SEED_PATH overrides the seed table ("" disables it).
+    """
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = LocationCache(
+                    db_path=os.getenv("IATA_CACHE_PATH", DEFAULT_DB_PATH),
+                    seed_path=os.getenv("IATA_SEED_PATH", DEFAULT_SEED_PATH),
+                )
+    return _CACHE
+
+def location_cache_stats() -> Dict[str, float]:
+    """Hit/miss counters for the shared cache (memory/seed/disk hits, misses, stores, hit_rate)."""
+    return get_location_cache().snapshot()
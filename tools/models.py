@@ -0,0 +1,147 @@
+# tools/models.py
+# Compact result models for the flight/hotel tools. Parsing builds these (one slotted object
+# per offer/segment instead of nested dicts); tools convert to the documented dict shape
+# with to_dict() only at the boundary.
+import heapq
+from dataclasses import dataclass
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+def num(x) -> Optional[float]:
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+@dataclass(slots=True)
+class Segment:
+    origin: Optional[str]
+    destination: Optional[str]
+    dep_time: Optional[str]
+    arr_time: Optional[str]
+    carrier: Optional[str]
+    carrier_code: Optional[str]
+    number: Optional[str]
+    duration: Optional[str]
+
+    @classmethod
+    def parse(cls, seg: Dict[str, Any], carriers: Dict[str, str]) -> "Segment":
+        dep = seg.get("departure", {}) or {}
+        arr = seg.get("arrival", {}) or {}
+        code = seg.get("carrierCode")
+        return cls(dep.get("iataCode"), arr.get("iataCode"), dep.get("at"), arr.get("at"),
+                   carriers.get(code, code), code, seg.get("number"), seg.get("duration"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "from": self.origin,
+            "to":   self.destination,
+            "dep_time": self.dep_time,
+            "arr_time": self.arr_time,
+            "carrier": self.carrier,
+            "carrierCode": self.carrier_code,
+            "number": self.number,
+            "duration": self.duration,
+        }
+
+@dataclass(slots=True)
+class FlightOffer:
+    price: Optional[str]
+    price_num: Optional[float]
+    currency: Optional[str]
+    outbound: Tuple[Segment, ...]
+    inbound: Tuple[Segment, ...]
+    one_way: bool
+
+    @property
+    def stops_outbound(self) -> int:
+        return max(0, len(self.outbound) - 1)
+
+    @property
+    def stops_return(self) -> int:
+        return max(0, len(self.inbound) - 1)
+
+    def carrier_codes(self):
+        for s in self.outbound:
+            yield s.carrier_code
+        for s in self.inbound:
+            yield s.carrier_code
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "price": self.price,
+            "price_num": self.price_num,
+            "currency": self.currency,
+            "one_way": self.one_way,
+            "outbound": [s.to_dict() for s in self.outbound],
+            "return": [s.to_dict() for s in self.inbound],
+            "stops_outbound": self.stops_outbound,
+            "stops_return": self.stops_return,
+        }
+
+@dataclass(slots=True)
+class HotelOffer:
+    name: Optional[str]
+    address: List[str]
+    city: Optional[str]
+    stars: Optional[int]
+    price: Optional[str]
+    price_num: Optional[float]
+    currency: Optional[str]
+    check_in: Optional[str]
+    check_out: Optional[str]
+    room: Dict[str, Any]
+    description: Optional[str]
+    booking_link: Optional[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "address": self.address,
+            "city": self.city,
+            "stars": self.stars,
+            "price": self.price,
+            "price_num": self.price_num,
+            "currency": self.currency,
+            "checkInDate": self.check_in,
+            "checkOutDate": self.check_out,
+            "room": self.room,
+            "description": self.description,
+            "bookingLink": self.booking_link,
+        }
+
+class TopK(Generic[T]):
+    """
+    The k cheapest items pushed so far, kept in a bounded heap (unpriced items rank last,
+    ties keep arrival order). `would_accept` lets a parser skip building an item that
+    cannot make the cut.
+    """
+
+    def __init__(self, k: int):
+        self.k = max(1, k)
+        self._heap: List[Tuple[int, float, int, T]] = []  # max-heap via negated rank
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @staticmethod
+    def _rank(price: Optional[float], seq: int) -> Tuple[int, float, int]:
+        return (-(price is None), -(price or 0.0), -seq)
+
+    def would_accept(self, price: Optional[float]) -> bool:
+        if len(self._heap) < self.k:
+            return True
+        return self._rank(price, self._seq) > self._heap[0][:3]
+
+    def push(self, price: Optional[float], item: T) -> None:
+        entry = (*self._rank(price, self._seq), item)
+        self._seq += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:3] > self._heap[0][:3]:
+            heapq.heapreplace(self._heap, entry)
+
+    def sorted(self) -> List[T]:
+        return [e[-1] for e in sorted(self._heap, key=lambda e: e[:3], reverse=True)]
@@ -0,0 +1,273 @@
+# tools/price_watch.py
+# Price alerts: subscribers register flight/hotel watches with a price threshold, and one
+# scheduler polls Amadeus per *distinct* query per interval, not per watch. Watches on the
+# same route/dates (or city/dates) share one upstream call made with filters covering all of
+# them; each watch then filters that result locally and is notified only when its best price
+# crosses its threshold. A stricter member left with no row among the shared call's cheapest
+# results gets one follow-up call per distinct filter set, so it is never reported "above" just
+# because looser fares crowded its own out.
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.flight_api import fetch_offers, get_amadeus_access_token, resolve_loc_code
+from tools.flight_cache import OfferFilters, offer_key
+from tools.hotel_api import parse_hotel_class, resolve_city_code, search_hotels
+
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", 900))
+# rows fetched per coalesced poll; broad enough that every member watch finds its cheapest match
+WATCH_FLIGHT_RESULTS = int(os.getenv("WATCH_FLIGHT_RESULTS", 50))
+WATCH_HOTEL_RESULTS = int(os.getenv("WATCH_HOTEL_RESULTS", 100))
+
+GroupKey = Tuple[Any, ...]
+
+@dataclass
+class Watch:
+    id: int
+    subscriber: str
+    kind: str                     # "flight" | "hotel"
+    group: GroupKey               # watches with the same group share one upstream poll
+    threshold: float
+    flight_filters: Optional[OfferFilters] = None
+    stars: Optional[frozenset] = None
+    query: Dict[str, Any] = field(default_factory=dict)
+    best: Optional[float] = None  # best price at the last poll
+    below: bool = False           # was `best` at or under the threshold
+
+@dataclass
+class Notification:
+    watch_id: int
+    subscriber: str
+    kind: str
+    direction: str                # "below": price dropped to/under threshold, "above": rose back over it
+    price: Optional[float]
+    threshold: float
+    query: Dict[str, Any]
+    offer: Optional[Dict[str, Any]]
+
+class PriceWatcher:
+    """
+    Registry of watches plus the polling loop. poll_once() polls every distinct group once;
+    start()/stop() run it every `interval` seconds on a daemon thread. Notifications go to
+    `notify` (default: print).
+    """
+
+    def __init__(self, interval: float = WATCH_INTERVAL, notify: Optional[Callable[[Notification], None]] = None):
+        self.interval = interval
+        self.notify = notify or (lambda n: print(f"[price_watch] {n}"))
+        self.stats: Counter = Counter()
+        self._watches: Dict[int, Watch] = {}
+        self._groups: Dict[GroupKey, List[int]] = {}
+        self._snapshots: Dict[GroupKey, Tuple] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- registration ----------
+    def _add(self, watch: Watch) -> int:
+        with self._lock:
+            self._watches[watch.id] = watch
+            self._groups.setdefault(watch.group, []).append(watch.id)
+        return watch.id
+
+    def add_flight_watch(
+        self,
+        subscriber: str,
+        origin: str,
+        destination: str,
+        date_from: str,
+        threshold: float,
+        date_to: Optional[str] = None,
+        nonstop_only: bool = False,
+        cabin: Optional[str] = None,
+        carriers: Optional[List[str]] = None,
+        adults: int = 1,
+        currency: str = "USD",
+    ) -> int:
+        """Watch the cheapest matching offer on a route/date; names are resolved to IATA codes once here."""
+        token = get_amadeus_access_token()
+        orig, dest = resolve_loc_code(origin, token), resolve_loc_code(destination, token)
+        if not orig or not dest:
+            raise ValueError(f"Could not resolve codes: origin={origin!r}->{orig}, destination={destination!r}->{dest}")
+        key = offer_key(orig, dest, date_from, date_to, cabin, adults, currency)
+        return self._add(Watch(
+            id=next(self._ids), subscriber=subscriber, kind="flight", group=("flight", key),
+            threshold=float(threshold), flight_filters=OfferFilters.of(None, nonstop_only, carriers, 1),
+            query={"origin": orig, "destination": dest, "date_from": date_from, "date_to": date_to,
+                   "nonstop_only": nonstop_only, "cabin": cabin, "carriers": carriers},
+        ))
+
+    def add_hotel_watch(
+        self,
+        subscriber: str,
+        city: str,
+        checkin: str,
+        checkout: str,
+        threshold: float,
+        hotel_class: Optional[str] = None,
+        adults: int = 1,
+        room_quantity: int = 1,
+        currency: str = "USD",
+    ) -> int:
+        """Watch the cheapest matching hotel offer in a city for a stay."""
+        city_code = resolve_city_code(city, get_amadeus_access_token())
+        if not city_code:
+            raise ValueError(f"Could not resolve city code for {city!r}")
+        ratings = parse_hotel_class(hotel_class)
+        return self._add(Watch(
+            id=next(self._ids), subscriber=subscriber, kind="hotel",
+            group=("hotel", city_code, checkin, checkout, adults, room_quantity, currency.upper()),
+            threshold=float(threshold), stars=frozenset(int(r) for r in ratings.split(",")) if ratings else None,
+            query={"city": city_code, "checkin": checkin, "checkout": checkout, "hotel_class": hotel_class},
+        ))
+
+    def remove(self, watch_id: int) -> None:
+        with self._lock:
+            watch = self._watches.pop(watch_id, None)
+            if watch is None:
+                return
+            members = self._groups[watch.group]
+            members.remove(watch_id)
+            if not members:
+                del self._groups[watch.group]
+                self._snapshots.pop(watch.group, None)
+
+    # ---------- polling ----------
+    @staticmethod
+    def _unmatched(rows: List[Dict[str, Any]], watches: List[Watch], key: Callable[[Watch], Any]) -> Dict[Any, List[Watch]]:
+        """Members with no row in `rows`, grouped by `key` (their own filters)."""
+        matched = {i for r in rows for i in r["_matches"]}
+        groups: Dict[Any, List[Watch]] = {}
+        for w in watches:
+            if w.id not in matched:
+                groups.setdefault(key(w), []).append(w)
+        return groups
+
+    @staticmethod
+    def _flight_rows(offers, watches: List[Watch]) -> List[Dict[str, Any]]:
+        rows = []
+        for o in offers:
+            row = o.to_dict()
+            row["_matches"] = [w.id for w in watches if w.flight_filters.matches(o)]
+            rows.append(row)
+        return rows
+
+    def _poll_flights(self, group: GroupKey, watches: List[Watch]) -> List[Dict[str, Any]]:
+        # one query whose filters cover every member's: nonstop only if all want it,
+        # carriers restricted only if every member restricts them
+        nonstop = all(w.flight_filters.nonstop_only for w in watches)
+        carrier_sets = [w.flight_filters.carriers for w in watches]
+        carriers = None if any(c is None for c in carrier_sets) else frozenset().union(*carrier_sets)
+        token = get_amadeus_access_token()
+        rows = self._flight_rows(fetch_offers(group[1], OfferFilters(None, nonstop, carriers, WATCH_FLIGHT_RESULTS),
+                                              token), watches)
+        # a stricter member (nonstop, one carrier) may match none of the loosest query's cheapest
+        # rows although it has fares: re-query once per distinct filter set left without a match
+        key = lambda w: (w.flight_filters.nonstop_only, w.flight_filters.carriers)
+        for (own_nonstop, own_carriers), members in self._unmatched(rows, watches, key).items():
+            if (own_nonstop, own_carriers) == (nonstop, carriers):
+                continue  # that was the query just made: there really is no fare
+            own = OfferFilters(None, own_nonstop, own_carriers, WATCH_FLIGHT_RESULTS)
+            rows += self._flight_rows(fetch_offers(group[1], own, token), members)
+        return rows
+
+    @staticmethod
+    def _hotel_class(stars: Optional[frozenset]) -> Optional[str]:
+        return ",".join(str(s) for s in sorted(stars)) + "-star" if stars else None
+
+    def _poll_hotels(self, group: GroupKey, watches: List[Watch]) -> List[Dict[str, Any]]:
+        _, city_code, checkin, checkout, adults, rooms, currency = group
+        star_sets = [w.stars for w in watches]
+        stars = None if any(s is None for s in star_sets) else frozenset().union(*star_sets)
+
+        def search(star_filter: Optional[frozenset], members: List[Watch]) -> List[Dict[str, Any]]:
+            rows = search_hotels(city_code, checkin, checkout, hotel_class=self._hotel_class(star_filter),
+                                 adults=adults, room_quantity=rooms, currency=currency,
+                                 max_results=WATCH_HOTEL_RESULTS)
+            for row in rows:
+                row["_matches"] = [w.id for w in members if w.stars is None or row.get("stars") in w.stars]
+            return rows
+
+        rows = search(stars, watches)
+        # same as flights: cheaper hotels of other classes can crowd out a member's own class
+        for own_stars, members in self._unmatched(rows, watches, lambda w: w.stars).items():
+            if own_stars is not None and own_stars != stars:
+                rows += search(own_stars, members)
+        return rows
+
+    @staticmethod
+    def _fingerprint(rows: List[Dict[str, Any]]) -> Tuple:
+        return tuple((r.get("price"), tuple(r["_matches"])) for r in rows)
+
+    def _evaluate(self, watch: Watch, rows: List[Dict[str, Any]]) -> Optional[Notification]:
+        best_row = next((r for r in rows if watch.id in r["_matches"] and r.get("price_num") is not None), None)
+        best = best_row["price_num"] if best_row else None
+        below = best is not None and best <= watch.threshold
+        crossed = below != watch.below
+        watch.best, watch.below = best, below
+        if not crossed:
+            return None
+        offer = {k: v for k, v in best_row.items() if k != "_matches"} if best_row else None
+        return Notification(watch.id, watch.subscriber, watch.kind, "below" if below else "above",
+                            best, watch.threshold, watch.query, offer)
+
+    def poll_once(self) -> List[Notification]:
+        """Poll each distinct group once; return (and send) the threshold-crossing notifications."""
+        with self._lock:
+            groups = {g: [self._watches[i] for i in ids] for g, ids in self._groups.items()}
+        sent: List[Notification] = []
+        for group, watches in groups.items():
+            try:
+                rows = (self._poll_flights if group[0] == "flight" else self._poll_hotels)(group, watches)
+            except Exception as e:
+                self.stats["poll_errors"] += 1
+                print(f"[price_watch] poll failed for {group}: {e}")
+                continue
+            self.stats["polls"] += 1
+            fingerprint = self._fingerprint(rows)
+            with self._lock:
+                unchanged = self._snapshots.get(group) == fingerprint
+                self._snapshots[group] = fingerprint
+            if unchanged:
+                self.stats["unchanged"] += 1
+                continue
+            for watch in watches:
+                note = self._evaluate(watch, rows)
+                if note is not None:
+                    sent.append(note)
+        self.stats["notifications"] += len(sent)
+        for note in sent:
+            try:
+                self.notify(note)
+            except Exception as e:
+                print(f"[price_watch] notify failed for watch {note.watch_id}: {e}")
+        return sent
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "watches": len(self._watches), "groups": len(self._groups)}
+
+    # ---------- scheduler ----------
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.poll_once()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self) -> "PriceWatcher":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="price-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,206 @@
+# tools/replay.py
+# Record/replay transport for the Amadeus clients, so tools and benchmarks can run offline.
+#
+#   AMADEUS_REPLAY_MODE=record  real calls go through and every request->response pair is saved
+#   AMADEUS_REPLAY_MODE=replay  calls are answered from the saved pairs; nothing touches the network
+#   AMADEUS_REPLAY_DIR          where pairs live (default data/amadeus_replay)
+#   AMADEUS_REPLAY_LATENCY      seconds added to every replayed response (default 0)
+#   AMADEUS_REPLAY_JITTER       +/- uniform jitter on top of that (default 0)
+#
+# In replay mode AmadeusClient defaults to ResiliencePolicy.unlimited(): no rate-limit sleeps and
+# no retries of recorded 429/5xx answers, so a replay is as fast and repeatable as the cassette.
+#
+# Pairs are keyed on the normalized request: method, path and sorted query/form params, minus
+# credentials and the Authorization header. Each pair is one JSON file under <dir>/<endpoint>/.
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_REPLAY_DIR = Path(__file__).resolve().parent.parent / "data" / "amadeus_replay"
+
+# never written to disk, never part of the key
+_SECRET_FIELDS = {"client_id", "client_secret"}
+# recorded tokens are replaced by this, so a cassette never holds a live credential
+REPLAY_TOKEN = "replay-token"
+_KEPT_HEADERS = ("Content-Type", "Retry-After")
+
+class ReplayMissError(LookupError):
+    """Replay mode got a request that was never recorded."""
+
+def replay_mode() -> Optional[str]:
+    mode = (os.getenv("AMADEUS_REPLAY_MODE") or "").strip().lower()
+    if mode in ("", "off", "0"):
+        return None
+    if mode not in ("record", "replay"):
+        raise ValueError(f"AMADEUS_REPLAY_MODE must be 'record' or 'replay', got {mode!r}")
+    return mode
+
+def normalize_request(method: str, url: str, body: Optional[bytes] = None) -> Dict[str, Any]:
+    parts = urlsplit(url)
+    params: List[Tuple[str, str]] = parse_qsl(parts.query, keep_blank_values=True)
+    if body:
+        text = body.decode() if isinstance(body, bytes) else str(body)
+        params += parse_qsl(text, keep_blank_values=True)
+    params = sorted((k, v) for k, v in params if k not in _SECRET_FIELDS)
+    return {"method": method.upper(), "path": parts.path, "params": params}
+
+def request_key(req: Dict[str, Any]) -> str:
+    raw = json.dumps([req["method"], req["path"], req["params"]], separators=(",", ":"))
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+class Cassette:
+    """A directory of recorded request->response pairs (read lazily, written atomically)."""
+
+    def __init__(self, root: Optional[str] = None, latency: float = 0.0, jitter: float = 0.0):
+        self.root = Path(root or os.getenv("AMADEUS_REPLAY_DIR") or DEFAULT_REPLAY_DIR)
+        self.latency = latency
+        self.jitter = jitter
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Cassette":
+        return cls(latency=float(os.getenv("AMADEUS_REPLAY_LATENCY", 0)),
+                   jitter=float(os.getenv("AMADEUS_REPLAY_JITTER", 0)))
+
+    def _path(self, req: Dict[str, Any]) -> Path:
+        endpoint = req["path"].strip("/").replace("/", "_") or "root"
+        return self.root / endpoint / f"{req['method'].lower()}_{request_key(req)}.json"
+
+    def delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def lookup(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        path = self._path(req)
+        key = str(path)
+        with self._lock:
+            pair = self._cache.get(key)
+        if pair is None:
+            try:
+                with open(path) as f:
+                    pair = json.load(f)
+            except FileNotFoundError:
+                raise ReplayMissError(f"no recorded response for {req['method']} {req['path']} "
+                                      f"{dict(req['params'])} (looked in {path})") from None
+            with self._lock:
+                self._cache[key] = pair
+        return pair["response"]
+
+    def record(self, req: Dict[str, Any], status: int, headers, content: bytes) -> None:
+        try:
+            body: Any = json.loads(content) if content else None
+        except ValueError:
+            body = content.decode(errors="replace")
+        if isinstance(body, dict) and "access_token" in body:
+            body = {**body, "access_token": REPLAY_TOKEN}
+        pair = {
+            "request": req,
+            "response": {
+                "status": status,
+                "headers": {h: headers[h] for h in _KEPT_HEADERS if h in headers},
+                "body": body,
+            },
+        }
+        path = self._path(req)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(pair, f, separators=(",", ":"))
+        os.replace(tmp, path)
+        with self._lock:
+            self._cache[str(path)] = pair
+
+def _content(response: Dict[str, Any]) -> bytes:
+    body = response["body"]
+    if body is None:
+        return b""
+    return body.encode() if isinstance(body, str) else json.dumps(body).encode()
+
+# ---------- requests ----------
+class ReplayAdapter(HTTPAdapter):
+    """HTTPAdapter that records real responses, or serves recorded ones, per `mode`."""
+
+    def __init__(self, mode: str, cassette: Cassette, **kwargs):
+        self.mode = mode
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        req = normalize_request(request.method, request.url, request.body)
+        if self.mode == "record":
+            resp = super().send(request, **kwargs)
+            self.cassette.record(req, resp.status_code, resp.headers, resp.content)
+            return resp
+        recorded = self.cassette.lookup(req)
+        delay = self.cassette.delay()
+        if delay:
+            time.sleep(delay)
+        resp = requests.Response()
+        resp.status_code = recorded["status"]
+        resp.headers = CaseInsensitiveDict(recorded["headers"])
+        resp._content = _content(recorded)
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "Replayed"
+        resp.encoding = "utf-8"
+        return resp
+
+def http_adapter(pool_maxsize: int) -> HTTPAdapter:
+    """The adapter AmadeusClient mounts: a plain pooled one unless AMADEUS_REPLAY_MODE is set."""
+    mode = replay_mode()
+    if mode is None:
+        return HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    print(f"[replay] {mode} mode (sync client)")
+    return ReplayAdapter(mode, Cassette.from_env(), pool_connections=4, pool_maxsize=pool_maxsize)
+
+# ---------- httpx ----------
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """httpx counterpart of ReplayAdapter for AsyncAmadeusClient."""
+
+    def __init__(self, mode: str, cassette: Cassette, limits: httpx.Limits):
+        self.mode = mode
+        self.cassette = cassette
+        self._inner = httpx.AsyncHTTPTransport(limits=limits) if mode == "record" else None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        req = normalize_request(request.method, str(request.url), body)
+        if self._inner is not None:
+            resp = await self._inner.handle_async_request(request)
+            content = await resp.aread()
+            self.cassette.record(req, resp.status_code, resp.headers, content)
+            headers = [(k, v) for k, v in resp.headers.multi_items()
+                       if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+            return httpx.Response(resp.status_code, headers=headers, content=content, request=request)
+        recorded = self.cassette.lookup(req)
+        delay = self.cassette.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(recorded["status"], headers=recorded["headers"],
+                              content=_content(recorded), request=request)
+
+    async def aclose(self) -> None:
+        if self._inner is not None:
+            await self._inner.aclose()
+
+def async_transport(limits: httpx.Limits) -> Optional[httpx.AsyncBaseTransport]:
+    """Transport for AsyncAmadeusClient, or None for httpx's default when not recording/replaying."""
+    mode = replay_mode()
+    if mode is None:
+        return None
+    print(f"[replay] {mode} mode (async client)")
+    return ReplayTransport(mode, Cassette.from_env(), limits)
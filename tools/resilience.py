@@ -0,0 +1,230 @@
+# tools/resilience.py
+# Rate limiting, retry-with-backoff and circuit breaking for the Amadeus clients.
+# The decisions live here; AmadeusClient / AsyncAmadeusClient only do the sleeping.
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Amadeus while the circuit breaker is open."""
+
+# ---------- Rate limiting ----------
+class RateLimiter:
+    """
+    Token bucket allowing `rate` acquisitions per second, with bursts of up to `burst`.
+
+    Adaptive (AIMD): penalize() (on a 429) halves the current rate down to `min_rate`, at most
+    once per second so a burst of concurrent 429s counts as one signal; reward() (on a
+    success) adds back a tenth of the configured rate.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, min_rate: Optional[float] = None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate if min_rate is not None else max(0.5, rate / 8))
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._penalized_at = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token; return how long the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def penalize(self) -> None:
+        if self.max_rate <= 0:
+            return  # unlimited
+        with self._lock:
+            now = time.monotonic()
+            if now - self._penalized_at < 1.0:
+                return
+            self._penalized_at = now
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def reward(self) -> None:
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+def parse_rate_limits(spec: Optional[str]) -> Dict[str, float]:
+    """'default=10,/v2/shopping/flight-offers=5' -> {"default": 10.0, "/v2/shopping/flight-offers": 5.0}"""
+    limits: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            limits[k.strip()] = float(v)
+    return limits
+
+class EndpointLimits:
+    """One RateLimiter per endpoint path; paths without their own rate share the default one."""
+
+    # Amadeus self-service test environment: 10 TPS per user, flight search is the heavy one
+    DEFAULTS = {"default": 10.0, "/v2/shopping/flight-offers": 5.0}
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        self.rates = {**self.DEFAULTS, **(rates or {})}
+        self._limiters: Dict[str, RateLimiter] = {"default": RateLimiter(self.rates["default"])}
+        self._lock = threading.Lock()
+
+    def for_path(self, path: str) -> RateLimiter:
+        if path not in self.rates:
+            return self._limiters["default"]
+        with self._lock:
+            if path not in self._limiters:
+                self._limiters[path] = RateLimiter(self.rates[path])
+            return self._limiters[path]
+
+# ---------- Circuit breaker ----------
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive upstream failures (5xx / connection errors),
+    fails fast for `cooldown` seconds, then lets a single trial call through
+    (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self._opened_at < self.cooldown else "half-open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_flight:
+                raise CircuitOpenError("Amadeus API circuit is open after repeated failures; try again shortly.")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """The call ended without a verdict (cancelled, or a non-upstream error): free the half-open slot."""
+        with self._lock:
+            self._trial_in_flight = False
+
+# ---------- Retry policy ----------
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After as delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class ResiliencePolicy:
+    """Shared rate limits, retry/backoff rules and circuit breaker for one upstream."""
+
+    def __init__(
+        self,
+        limits: Optional[EndpointLimits] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 30.0,
+    ):
+        self.limits = limits or EndpointLimits()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    @classmethod
+    def from_env(cls) -> "ResiliencePolicy":
+        return cls(
+            limits=EndpointLimits(parse_rate_limits(os.getenv("AMADEUS_RATE_LIMITS"))),
+            breaker=CircuitBreaker(threshold=int(os.getenv("AMADEUS_BREAKER_THRESHOLD", 5)),
+                                   cooldown=float(os.getenv("AMADEUS_BREAKER_COOLDOWN", 30))),
+            max_retries=int(os.getenv("AMADEUS_MAX_RETRIES", 3)),
+        )
+
+    @classmethod
+    def unlimited(cls) -> "ResiliencePolicy":
+        """No client-side rate limit, no retries, breaker effectively off (replayed responses)."""
+        return cls(limits=EndpointLimits({path: 0.0 for path in EndpointLimits.DEFAULTS}),
+                   breaker=CircuitBreaker(threshold=10 ** 9), max_retries=0)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def before_attempt(self, path: str) -> float:
+        """Fail fast if the circuit is open; otherwise seconds to wait for a rate-limit slot."""
+        self.breaker.before_call()
+        return self.limits.for_path(path).reserve()
+
+    def after_response(self, path: str, attempt: int, status: int, retry_after: Optional[str]) -> Optional[float]:
+        """None: hand the response to the caller. A number: sleep that long, then retry."""
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        limiter = self.limits.for_path(path)
+        if status == 429:
+            limiter.penalize()
+        elif status < 400:
+            limiter.reward()
+        if status not in RETRY_STATUSES or attempt >= self.max_retries:
+            return None
+        hinted = retry_after_seconds(retry_after)
+        if hinted is not None:
+            return min(hinted, self.max_retry_after)
+        return self.backoff(attempt)
+
+    def abandon_attempt(self) -> None:
+        """An attempt that passed before_attempt() ended some other way (cancellation, replay miss, ...)."""
+        self.breaker.release_trial()
+
+    def after_error(self, attempt: int) -> Optional[float]:
+        """After a connection error/timeout: None to re-raise, or seconds to wait before retrying."""
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+        return self.backoff(attempt)